@@ -0,0 +1,368 @@
+"""
+Declarative synchronization of network and service elements. The desired
+state is provided as a set of elements with the attributes that should be
+enforced. The current state is obtained with a single listing request per
+element type and the listed elements are retrieved concurrently. A
+minimal plan of create, update and delete actions is then computed and
+applied concurrently in dependency order; groups are created or updated
+after their members and deleted before them.
+
+Attributes are provided using the element json keys, for example
+'address' for a host or 'ipv4_network' for a network. Only the attributes
+provided are compared and modified, all other attributes of an existing
+element are left as is. Group members are provided in 'element' and
+can be an href, an element, a tuple of (type, name) or the name of
+another element in the desired set or on the SMC.
+
+Sync hosts and a group::
+
+    from smc.actions.sync import ElementSync
+
+    sync = ElementSync()
+    sync.add('host', 'web-1', address='10.0.0.1')
+    sync.add('host', 'web-2', address='10.0.0.2')
+    sync.add('network', 'web-net', ipv4_network='10.0.0.0/24')
+    sync.add('group', 'webservers', element=['web-1', 'web-2'])
+
+    for action in sync.plan():
+        print(action)
+    for result in sync.apply():
+        if not result.ok:
+            print(result.item, result.exception)
+
+The sync keeps the element inventory between runs. By default plan()
+revalidates every known element with a conditional GET on its ETag, so
+elements modified outside of the sync are detected at the cost of one
+request per element; unchanged elements are not transferred again. With
+plan(revalidate=False) a run only costs the listing requests, but only
+elements added or removed since the last run are seen. Elements modified
+by the sync are retrieved again on the next run. To keep the inventory
+across processes, provide an inventory loaded from disk::
+
+    inventory = ElementInventory.load('inventory.json')
+    sync = ElementSync(inventory=inventory)
+    ....
+    inventory.save('inventory.json')
+
+Elements of the synchronized types that are not in the desired set are
+only deleted if prune=True.
+"""
+import logging
+from collections import namedtuple
+import smc.elements.network  # @UnusedImport
+import smc.elements.service  # @UnusedImport
+import smc.elements.group  # @UnusedImport
+import smc.actions.search as search
+from smc.base.model import ElementCreator, prepared_request
+from smc.base.resource import Registry
+from smc.elements.inventory import ElementInventory
+from smc.api.pool import concurrent_map, DEFAULT_WORKERS
+from smc.api.exceptions import ModificationFailed, DeleteElementFailed,\
+    ElementNotFound
+
+logger = logging.getLogger(__name__)
+
+#: Element types with members in the 'element' attribute
+GROUP_TYPES = ('group', 'service_group', 'tcp_service_group',
+               'udp_service_group', 'ip_service_group')
+
+class SyncAction(namedtuple('SyncAction', 'action typeof name href attributes')):
+    """
+    Single action in a sync plan.
+
+    :ivar str action: one of 'create', 'update' or 'delete'
+    :ivar str typeof: element type
+    :ivar str name: element name
+    :ivar str href: href of the existing element, None for create
+    :ivar dict attributes: desired attributes, None for delete
+    """
+    __slots__ = ()
+
+    def __str__(self):
+        return '{0} {1} {2}'.format(self.action, self.typeof, self.name)
+
+def _equal(current, desired):
+    if not current and not desired: #None, '' and [] are equivalent
+        return True
+    if isinstance(desired, list) and isinstance(current, list):
+        try:
+            return sorted(current) == sorted(desired)
+        except TypeError:
+            return current == desired
+    return current == desired
+
+class ElementSync(object):
+    """
+    Synchronize a desired set of elements to the SMC.
+
+    :param ElementInventory inventory: inventory holding the current state.
+           If not provided, one is created for the synchronized types
+    :param bool prune: delete elements of the synchronized types that are
+           not in the desired set (default: False)
+    :param int max_workers: maximum number of concurrent requests
+    """
+    def __init__(self, inventory=None, prune=False, max_workers=DEFAULT_WORKERS):
+        self.inventory = inventory
+        self.prune = prune
+        self.max_workers = max_workers
+        self._desired = {} # (typeof, name) -> attributes
+
+    def add(self, typeof, name, **attributes):
+        """
+        Add an element to the desired state. Adding the same element again
+        replaces the previous attributes.
+
+        :param str typeof: element type, i.e. 'host', 'tcp_service', 'group'
+        :param str name: name of element
+        :param attributes: element json attributes to enforce
+        :raises ValueError: element type is not supported
+        :return: None
+        """
+        if getattr(Registry[typeof], 'typeof', None) != typeof:
+            raise ValueError('Unsupported element type: {}'.format(typeof))
+        self._desired[(typeof, name)] = attributes
+
+    def extend(self, elements):
+        """
+        Add many elements to the desired state. Each element is a dict
+        with 'typeof' and 'name' keys and the remaining keys as attributes.
+
+        :param list elements: list of dict
+        :raises ValueError: element type is not supported
+        :return: None
+        """
+        for element in elements:
+            attributes = dict(element)
+            self.add(attributes.pop('typeof'), attributes.pop('name'),
+                     **attributes)
+
+    @property
+    def types(self):
+        """
+        Element types synchronized, based on the desired state
+
+        :return: list str
+        """
+        return sorted(set(typeof for typeof, _ in self._desired))
+
+    def _current(self):
+        """
+        Index of existing elements by (typeof, name) -> Meta
+        """
+        return dict(((meta.type, meta.name), meta)
+                    for meta in self.inventory.meta()
+                    if meta.type in self.types)
+
+    def _resolve(self, member, known):
+        """
+        Resolve a group member to href. Returns None if the member is in
+        the desired set but does not exist yet.
+        """
+        if hasattr(member, 'href'):
+            return member.href
+        if isinstance(member, (tuple, list)):
+            key = tuple(member)
+        elif member.startswith('http'):
+            return member
+        else:
+            keys = [key for key in set(known) | set(self._desired)
+                    if key[1] == member]
+            if len(keys) > 1:
+                raise ElementNotFound('Group member: {} is not unique by name, '
+                                      'use (type, name)'.format(member))
+            key = keys[0] if keys else (None, member)
+        if key in known:
+            return known[key]
+        if key in self._desired:
+            return None
+        #Not a synchronized type, search the SMC
+        href = search.element_href_use_filter(key[1], key[0]) if key[0] \
+            else search.element_href(key[1])
+        if not href:
+            raise ElementNotFound('Group member: {} not found'.format(member))
+        known[key] = href
+        return href
+
+    def _resolved(self, typeof, attributes, known):
+        """
+        Desired attributes with group members resolved to href. Returns
+        None if a member does not exist yet.
+        """
+        resolved = dict(attributes)
+        if typeof in GROUP_TYPES and 'element' in attributes:
+            members = [self._resolve(member, known)
+                       for member in attributes['element'] or []]
+            if None in members:
+                return None
+            resolved['element'] = members
+        return resolved
+
+    def _refresh(self, revalidate=True):
+        if self.inventory is None:
+            self.inventory = ElementInventory(self.types, self.max_workers)
+        self.inventory.refresh(self.types, revalidate=revalidate)
+
+    def plan(self, revalidate=True):
+        """
+        Refresh the current state and compute the actions required to
+        reach the desired state. System elements are never modified.
+
+        :param bool revalidate: revalidate elements already in the inventory
+               by ETag (default: True). If False, only additions and removals
+               are detected, see
+               :py:meth:`smc.elements.inventory.ElementInventory.refresh`
+        :raises: :py:class:`smc.api.exceptions.FetchElementFailed`: listing failed
+        :raises: :py:class:`smc.api.exceptions.ElementNotFound`: group member
+                 could not be resolved
+        :return: list :class:`SyncAction`
+        """
+        self._refresh(revalidate)
+
+        current = self._current()
+        known = dict((key, meta.href) for key, meta in current.items())
+        actions = []
+        for key in sorted(self._desired):
+            typeof, name = key
+            attributes = self._desired[key]
+            meta = current.get(key)
+            if meta is None:
+                actions.append(SyncAction('create', typeof, name, None, attributes))
+                continue
+            if meta.href in self.inventory.errors:
+                logger.error('Skipping element that could not be retrieved: %s', name)
+                continue
+            data = self.inventory.json(meta.href)
+            if data.get('system'):
+                continue
+            resolved = self._resolved(typeof, attributes, known)
+            if resolved is None or any(not _equal(data.get(k), v)
+                                       for k, v in resolved.items()):
+                actions.append(SyncAction('update', typeof, name, meta.href,
+                                          attributes))
+
+        if self.prune:
+            for key in sorted(current):
+                meta = current[key]
+                if key in self._desired:
+                    continue
+                if not self.inventory.json(meta.href).get('system'):
+                    actions.append(SyncAction('delete', meta.type, meta.name,
+                                              meta.href, None))
+        return actions
+
+    def _levels(self, actions, members):
+        """
+        Group actions by dependency level. Non group elements are level 0,
+        a group is one level above the highest group it contains among the
+        actions.
+
+        :param members: callable returning the member keys of an action
+        :raises ValueError: groups contain each other
+        :return: list of list SyncAction, lowest level first
+        """
+        by_key = dict(((a.typeof, a.name), a) for a in actions)
+        by_href = dict((a.href, a) for a in actions if a.href)
+        levels = {}
+
+        def level(action, path=()):
+            key = (action.typeof, action.name)
+            if key in levels:
+                return levels[key]
+            if key in path:
+                raise ValueError('Group membership loop found: {}'.format(
+                    ', '.join(name for _, name in path + (key,))))
+            value = 0
+            if action.typeof in GROUP_TYPES:
+                for member in members(action):
+                    dependency = by_key.get(member) or by_href.get(member)
+                    if dependency is not None and dependency is not action:
+                        value = max(value, level(dependency, path + (key,)) + 1)
+            levels[key] = value
+            return value
+
+        ordered = {}
+        for action in actions:
+            ordered.setdefault(level(action), []).append(action)
+        return [ordered[i] for i in sorted(ordered)]
+
+    def _desired_members(self, action):
+        members = []
+        for member in (action.attributes or {}).get('element') or []:
+            if hasattr(member, 'href'):
+                members.append(member.href)
+            elif isinstance(member, (tuple, list)):
+                members.append(tuple(member))
+            elif not member.startswith('http'):
+                members.extend(key for key in self._desired if key[1] == member)
+            else:
+                members.append(member)
+        return members
+
+    def _current_members(self, action):
+        if action.href in self.inventory:
+            return self.inventory.json(action.href).get('element') or []
+        return []
+
+    def apply(self, actions=None):
+        """
+        Apply a plan. Creates and updates run concurrently, one dependency
+        level at a time, followed by deletes in reverse dependency order.
+        A failed action does not stop the remaining actions; a group that
+        depends on a member that failed to be created will fail.
+
+        :param list actions: plan from :meth:`plan`. If not provided, a
+               plan is computed first. If no inventory is available yet,
+               the current state is retrieved first
+        :return: list :py:class:`smc.api.pool.PoolResult` with the
+                 :class:`SyncAction` as item and href as value
+        """
+        if actions is None:
+            actions = self.plan()
+        elif self.inventory is None:
+            self._refresh()
+
+        known = dict((key, meta.href) for key, meta in self._current().items())
+
+        def write(action):
+            attributes = self._resolved(action.typeof, action.attributes, known)
+            if attributes is None:
+                raise ElementNotFound('Members for group: {} have not been '
+                                      'created'.format(action.name))
+            if action.action == 'create':
+                attributes.update(name=action.name)
+                return ElementCreator(Registry[action.typeof], attributes)
+            data = dict(self.inventory.json(action.href))
+            data.update(attributes)
+            prepared_request(ModificationFailed,
+                             href=action.href,
+                             json=data,
+                             etag=self.inventory.etag(action.href)).update()
+            return action.href
+
+        def delete(action):
+            prepared_request(DeleteElementFailed,
+                             href=action.href).delete()
+            return action.href
+
+        results = []
+        writes = [a for a in actions if a.action != 'delete']
+        for level in self._levels(writes, self._desired_members):
+            for result in concurrent_map(write, level, self.max_workers):
+                if result.ok:
+                    known[(result.item.typeof, result.item.name)] = result.value
+                results.append(result)
+
+        deletes = [a for a in actions if a.action == 'delete']
+        for level in reversed(self._levels(deletes, self._current_members)):
+            results.extend(concurrent_map(delete, level, self.max_workers))
+
+        for result in results:
+            if result.ok:
+                self.inventory.invalidate(result.value)
+            else:
+                logger.error('Sync failed to %s', result.item)
+        return results
+
+    def __repr__(self):
+        return '{0}(elements={1})'.format(self.__class__.__name__,
+                                          len(self._desired))
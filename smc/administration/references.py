@@ -0,0 +1,227 @@
+"""
+Reference graph used to answer 'where used' type questions for many
+elements without a round trip to the SMC for each query.
+
+References are collected once, concurrently, using the SMC
+references_by_element entry point and stored as an adjacency index.
+Queries such as direct references, transitive dependents and orphaned
+elements are then answered locally. The graph can be saved to disk and
+loaded later to avoid re-collecting references between runs.
+
+Collect references for all hosts and find hosts not referenced anywhere::
+
+    from smc.administration.references import ReferenceGraph
+    from smc.elements.collection import describe_host
+
+    graph = ReferenceGraph()
+    graph.collect(describe_host())
+    for orphan in graph.orphans():
+        print(orphan.name, orphan.href)
+
+Impact analysis before deleting an element::
+
+    for element in graph.dependents(Host('myhost')):
+        print(element)
+
+Save and reload a snapshot::
+
+    graph.save('references.json')
+    graph = ReferenceGraph.load('references.json')
+"""
+import json
+import logging
+from smc.base.model import Meta
+from smc.api.pool import concurrent_map, DEFAULT_WORKERS
+from smc.api.exceptions import FetchElementFailed
+import smc.actions.search as search
+
+logger = logging.getLogger(__name__)
+
+def _meta(element):
+    """
+    Normalize element input to Meta. Element can be an instance of
+    :py:class:`smc.base.model.ElementBase`, Meta, a dict with href/name/type
+    or the href as str.
+    """
+    if isinstance(element, Meta):
+        return element
+    if isinstance(element, dict):
+        return Meta(href=element.get('href'),
+                    name=element.get('name'),
+                    type=element.get('type'))
+    if hasattr(element, 'href'):
+        meta = getattr(element, 'meta', None)
+        return Meta(href=element.href,
+                    name=element.name,
+                    type=meta.type if meta else getattr(element, 'typeof', None))
+    return Meta(href=element)
+
+def _href(element):
+    return _meta(element).href
+
+def _fetch_references(href):
+    """
+    Fetch direct references for a single element href
+
+    :raises: FetchElementFailed
+    :return: list of dict with href, name, type
+    """
+    result = search.element_references_as_smcresult(href)
+    if result.msg:
+        raise FetchElementFailed(result.msg)
+    return result.json if result.json else []
+
+class ReferenceGraph(object):
+    """
+    Adjacency index of element references. An edge is stored from
+    the referenced element to each element that references it (where
+    used). Only elements that have been collected have complete edges;
+    elements only seen as referrers are known by meta data only.
+
+    :ivar dict errors: href -> exception for elements that failed collection
+    """
+    def __init__(self):
+        self._used_by = {} # href -> set of referrer hrefs
+        self._elements = {} # href -> Meta
+        self.errors = {}
+
+    def collect(self, elements, max_workers=DEFAULT_WORKERS):
+        """
+        Collect references for the elements provided. Requests are sent
+        concurrently. Elements previously collected are refreshed.
+        Failures are recorded in :attr:`errors` and do not abort the
+        remaining collection.
+
+        :param list elements: elements as Element, Meta or href
+        :param int max_workers: maximum number of concurrent requests
+        :return: self
+        """
+        metas = [_meta(element) for element in elements]
+        for meta in metas:
+            self._add_element(meta)
+
+        for result in concurrent_map(_fetch_references,
+                                     [meta.href for meta in metas],
+                                     max_workers):
+            if not result.ok:
+                logger.error('Failed collecting references for: %s, %s',
+                             result.item, result.exception)
+                self.errors[result.item] = result.exception
+                continue
+            self.errors.pop(result.item, None)
+            referrers = set()
+            for reference in result.value:
+                meta = _meta(reference)
+                self._add_element(meta)
+                referrers.add(meta.href)
+            self._used_by[result.item] = referrers
+        return self
+
+    def _add_element(self, meta):
+        known = self._elements.get(meta.href)
+        if known is None or (known.name is None and meta.name is not None):
+            self._elements[meta.href] = meta
+
+    @property
+    def collected(self):
+        """
+        Elements that references have been collected for
+
+        :return: list Meta
+        """
+        return [self._elements[href] for href in self._used_by]
+
+    def __contains__(self, element):
+        return _href(element) in self._used_by
+
+    def __len__(self):
+        return len(self._used_by)
+
+    def where_used(self, element):
+        """
+        Elements directly referencing the given element.
+
+        :param element: Element, Meta or href
+        :raises: KeyError if references were not collected for element
+        :return: list Meta
+        """
+        return [self._elements[href]
+                for href in self._used_by[_href(element)]]
+
+    def dependents(self, element):
+        """
+        All elements that directly or indirectly reference the given
+        element. For example, a host in a group that is used in a policy
+        will return both the group and the policy. Indirect references
+        are only followed through elements that have been collected.
+
+        :param element: Element, Meta or href
+        :raises: KeyError if references were not collected for element
+        :return: list Meta
+        """
+        start = _href(element)
+        seen = set()
+        pending = list(self._used_by[start])
+        while pending:
+            href = pending.pop()
+            if href in seen or href == start:
+                continue
+            seen.add(href)
+            pending.extend(self._used_by.get(href, ()))
+        return [self._elements[href] for href in seen]
+
+    def orphans(self):
+        """
+        Collected elements that are not referenced by any other element.
+
+        :return: list Meta
+        """
+        return [self._elements[href]
+                for href, referrers in self._used_by.items()
+                if not referrers]
+
+    def is_used(self, element):
+        """
+        Whether the element is referenced by any other element
+
+        :param element: Element, Meta or href
+        :raises: KeyError if references were not collected for element
+        :rtype: bool
+        """
+        return bool(self._used_by[_href(element)])
+
+    def save(self, filename):
+        """
+        Save the graph as a json snapshot to disk.
+
+        :param str filename: name of file
+        :raises: IOError
+        :return: None
+        """
+        snapshot = {'elements': [[meta.href, meta.name, meta.type]
+                                 for meta in self._elements.values()],
+                    'used_by': dict((href, sorted(referrers))
+                                    for href, referrers in self._used_by.items())}
+        with open(filename, 'w') as f:
+            json.dump(snapshot, f)
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Load a graph from a snapshot created with :meth:`save`.
+
+        :param str filename: name of file
+        :raises: IOError, ValueError
+        :return: :class:`ReferenceGraph`
+        """
+        with open(filename) as f:
+            snapshot = json.load(f)
+        graph = cls()
+        for href, name, typeof in snapshot.get('elements', []):
+            graph._elements[href] = Meta(href=href, name=name, type=typeof)
+        for href, referrers in snapshot.get('used_by', {}).items():
+            graph._used_by[href] = set(referrers)
+        return graph
+
+    def __repr__(self):
+        return '{0}(collected={1})'.format(self.__class__.__name__, len(self))
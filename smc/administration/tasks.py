@@ -1,15 +1,29 @@
 import time
 import re
+import heapq
+import logging
+import threading
+import itertools
 from smc.base.model import prepared_request
 import smc.actions.search as search
 from smc.base.util import find_link_by_name
+from smc.api.pool import concurrent_map, DEFAULT_WORKERS
 from smc.api.exceptions import TaskRunFailed, ActionCommandFailed
 
+try:
+    import queue
+except ImportError: #py2
+    import Queue as queue  # @UnresolvedImport
+
+logger = logging.getLogger(__name__)
+
 clean_html = re.compile(r'<.*?>')
 
-def task_history():
+def task_history(max_workers=DEFAULT_WORKERS):
     """
-    Get all tasks stored by the SMC 
+    Get all tasks stored by the SMC. Task details are retrieved 
+    concurrently. To follow the history over time, use :class:`TaskHistory`
+    which only retrieves new and running tasks on each refresh.
     
     Example of aborting an existing task by follower link::
     
@@ -22,28 +36,144 @@ def task_history():
         for task in task_history():
             if task.in_progress:
                 task.abort()
-        
+    
+    :param int max_workers: maximum number of concurrent requests
     :return: :py:class:`~Task`
     """
-    task_href = search.element_entry_point('task_progress')
-    return [Task(**search.element_by_href_as_json(task.get('href'))) 
-            for task in search.element_by_href_as_json(task_href)]
+    return TaskHistory(max_workers=max_workers).refresh().tasks()
 
 def task_status(follower):
     """        
-    Return the task specified.
+    Return the task specified. The task is retrieved directly from the
+    follower link.
     
     Return specific task::
     
         task = task_status('http://......')
     
     :param str follower: task follower link
-    :return: :py:class:`~Task`
+    :return: :py:class:`~Task`, or None if the task does not exist
+    """
+    task = search.element_by_href_as_json(follower)
+    if task:
+        return Task(**task)
+
+class TaskHistory(object):
+    """
+    Incremental view of the SMC task history. The task listing is 
+    retrieved on each refresh, but task details are only retrieved for
+    tasks that are new or were still in progress on the previous refresh;
+    completed tasks do not change and are kept. Details are retrieved
+    concurrently, one page at a time.
+    
+    Check the history periodically for failed tasks::
+    
+        history = TaskHistory()
+        while True:
+            for task in history.refresh().tasks(state='failed'):
+                print(task.follower, task.last_message)
+            time.sleep(60)
+    
+    Process tasks page by page as they are retrieved, stopping early if 
+    required::
+    
+        for task in history.iter_tasks(typeof='upload_policy'):
+            ....
+    
+    :param int max_workers: maximum number of concurrent requests
+    :param int page_size: number of task details retrieved per page
     """
-    for task in task_history():
-        if task.follower == follower:
-            return task
+    #: Task states accepted by the state filter
+    STATES = ('in_progress', 'succeeded', 'failed')
+    
+    def __init__(self, max_workers=DEFAULT_WORKERS, page_size=100):
+        self.max_workers = max_workers
+        self.page_size = page_size
+        self._tasks = {} # href -> Task
+        self._order = [] # href in listing order
+    
+    @staticmethod
+    def _matches(task, state=None, typeof=None):
+        if typeof is not None and task.type != typeof:
+            return False
+        if state == 'in_progress':
+            return bool(task.in_progress)
+        elif state == 'succeeded':
+            return bool(task.success)
+        elif state == 'failed':
+            return not task.in_progress and not task.success
+        return True
+    
+    def _fetch(self, href):
+        task = search.element_by_href_as_json(href)
+        if task is None:
+            raise TaskRunFailed('Failed retrieving task: {}'.format(href))
+        return Task(**task)
+    
+    def iter_tasks(self, state=None, typeof=None):
+        """
+        Retrieve the task listing and yield tasks, retrieving details of
+        new and running tasks one page at a time. Tasks that could not be
+        retrieved are skipped.
+        
+        :param str state: optional filter, one of 'in_progress', 'succeeded'
+               or 'failed'
+        :param str typeof: optional filter on task type
+        :raises ValueError: invalid state
+        :return: generator :py:class:`~Task`
+        """
+        if state is not None and state not in self.STATES:
+            raise ValueError('Invalid task state: {}, valid states: {}'
+                             .format(state, self.STATES))
+        task_href = search.element_entry_point('task_progress')
+        listing = [task.get('href') 
+                   for task in search.element_by_href_as_json(task_href) or []]
+        listed = set(listing)
+        for href in list(self._tasks):
+            if href not in listed:
+                del self._tasks[href]
+        self._order = listing
+        
+        for i in range(0, len(listing), self.page_size):
+            page = listing[i:i + self.page_size]
+            stale = [href for href in page
+                     if href not in self._tasks or self._tasks[href].in_progress]
+            for result in concurrent_map(self._fetch, stale, self.max_workers):
+                if result.ok:
+                    self._tasks[result.item] = result.value
+                else:
+                    logger.error('%s', result.exception)
+            for href in page:
+                task = self._tasks.get(href)
+                if task is not None and self._matches(task, state, typeof):
+                    yield task
     
+    def refresh(self):
+        """
+        Refresh the task history
+        
+        :return: self
+        """
+        for _ in self.iter_tasks():
+            pass
+        return self
+    
+    def tasks(self, state=None, typeof=None):
+        """
+        Tasks from the last refresh, in listing order
+        
+        :param str state: optional filter, one of 'in_progress', 'succeeded'
+               or 'failed'
+        :param str typeof: optional filter on task type
+        :return: list :py:class:`~Task`
+        """
+        return [self._tasks[href] for href in self._order
+                if href in self._tasks and 
+                self._matches(self._tasks[href], state, typeof)]
+    
+    def __len__(self):
+        return len(self._tasks)
+
 class Task(object):
     """
     Task representation. This is generic and the format is used for 
@@ -161,13 +291,14 @@ def task_handler(task, wait_for_finish=False,
     :param Task task: py:class:`smc.administration.tasks.Task`
     :param boolean wait_for_finish: whether to wait for it to finish or not
     :param boolean display_msg: whether to return display messages or not
-    :param int sleep: sleep interval
+    :param int sleep: maximum interval between polls of the task
     :param str filename: name of file for TaskDownload. Only for operations that
            would allow for content to be downloaded from the SMC
     
     If wait_for_finish is False, the generator will yield the follower 
     href only. If true, will return messages as they arrive and location 
-    to the result after complete.
+    to the result after complete. The task is followed by the shared 
+    :py:func:`task_poller`.
     To obtain messages as they arrive, call generator::
     
         engine = Engine('myfw')
@@ -175,21 +306,270 @@ def task_handler(task, wait_for_finish=False,
             print msg
     """
     if wait_for_finish:
-        #first task will not have a last_message attribute
-        last_msg = ''
+        messages = queue.Queue()
+        if display_msg and task.last_message:
+            messages.put(task.last_message)
+        future = task_poller().submit(task, filename=filename,
+                                      max_interval=sleep,
+                                      on_progress=lambda t: messages.put(t.last_message))
+        future.add_done_callback(lambda f: messages.put(None))
         while True:
-            if display_msg:
-                if task.last_message != last_msg and \
-                    task.last_message is not None:
-                    yield re.sub(clean_html,'', task.last_message)
-                    last_msg = task.last_message
-            if task.success:
-                if filename: #download file
-                    yield TaskDownload(task.result, filename).run()
-                break
-            elif not task.in_progress and not task.success:
+            message = messages.get()
+            if message is None:
                 break
-            time.sleep(sleep)
-            task()
+            if display_msg:
+                yield re.sub(clean_html,'', message)
+        exception = future.exception()
+        #Polling or download failed. A task that ran and failed is reported
+        #through its messages only
+        if exception is not None and (task.success or task.in_progress):
+            raise exception
+        if task.success and filename:
+            yield None
     else:
         yield task.follower
+
+class TaskFuture(object):
+    """
+    Pending result of a task followed by a :class:`TaskPoller`. 
+    
+    :ivar Task task: the task, updated on each poll
+    """
+    def __init__(self, task):
+        self.task = task
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._exception = None
+        self._callbacks = []
+    
+    def done(self):
+        """
+        Whether the task has completed
+        
+        :rtype: bool
+        """
+        return self._done.is_set()
+    
+    def result(self, timeout=None):
+        """
+        Wait for the task to complete and return it.
+        
+        :param int timeout: seconds to wait, None to wait indefinitely
+        :raises: :py:class:`smc.api.exceptions.TaskRunFailed`: task failed,
+                 download failed or timeout waiting
+        :return: :class:`Task`
+        """
+        exception = self.exception(timeout)
+        if exception is not None:
+            raise exception
+        return self.task
+    
+    def exception(self, timeout=None):
+        """
+        Wait for the task to complete and return the failure, if any.
+        
+        :param int timeout: seconds to wait, None to wait indefinitely
+        :raises: :py:class:`smc.api.exceptions.TaskRunFailed`: timeout waiting
+        :return: exception or None
+        """
+        if not self._done.wait(timeout):
+            raise TaskRunFailed('Timed out waiting for task: {}'
+                                .format(self.task.follower))
+        return self._exception
+    
+    def add_done_callback(self, callback):
+        """
+        Call callback with this future once the task completes. If the
+        task is already complete, callback is called immediately.
+        
+        :param callback: callable taking the :class:`TaskFuture`
+        :return: None
+        """
+        with self._lock:
+            if not self.done():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+    
+    def _set(self, exception=None):
+        with self._lock:
+            self._exception = exception
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception as e:
+                logger.error('Task callback failed: %s', e)
+
+    def __repr__(self):
+        return '{0}(follower={1},done={2})'.format(self.__class__.__name__,
+                                                   self.task.follower, self.done())
+
+class TaskPoller(object):
+    """
+    Follow many asynchronous tasks from a single scheduling thread. 
+    Each task is polled with an adaptive interval: it starts at 
+    min_interval and grows by backoff each time a poll shows no change,
+    up to max_interval. A change of progress or message resets the 
+    interval, so short tasks complete quickly and long running tasks
+    are polled less often. Tasks that are due at the same time are
+    polled concurrently.
+    
+    Follow the tasks returned by asynchronous operations::
+    
+        poller = task_poller()
+        futures = [poller.submit(next(engine.refresh(wait_for_finish=False)))
+                   for engine in engines]
+        for future in futures:
+            task = future.result()
+    
+    Tasks that produce a file, such as export, are downloaded once 
+    complete if a filename is provided::
+    
+        poller.submit(next(element.export(filename='x.zip')), 
+                      filename='x.zip', callback=done)
+    
+    The scheduling thread is started on demand and exits when there are
+    no more tasks to follow.
+    
+    :param float min_interval: seconds before the first poll of a task
+    :param float max_interval: maximum seconds between polls of a task
+    :param float backoff: interval multiplier when a task has not changed
+    :param int max_workers: maximum number of concurrent polls
+    :param int max_errors: consecutive failures retrieving a task before 
+           it is considered failed
+    """
+    def __init__(self, min_interval=0.5, max_interval=10, backoff=1.5,
+                 max_workers=DEFAULT_WORKERS, max_errors=3):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.max_workers = max_workers
+        self.max_errors = max_errors
+        self._heap = [] # (due, sequence, entry)
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+    
+    def submit(self, task, filename=None, callback=None, on_progress=None,
+               max_interval=None):
+        """
+        Follow a task until it completes.
+        
+        :param task: :class:`Task` or follower href
+        :param str filename: download the task result to this file once the
+               task succeeds
+        :param callback: callable taking the :class:`TaskFuture`, called
+               when the task completes
+        :param on_progress: callable taking the :class:`Task`, called from the
+               poller thread when the task message changes
+        :param float max_interval: override the maximum poll interval
+        :return: :class:`TaskFuture`
+        """
+        if not isinstance(task, Task):
+            task = Task(follower=task)
+        future = TaskFuture(task)
+        if callback is not None:
+            future.add_done_callback(callback)
+        entry = {'future': future,
+                 'filename': filename,
+                 'on_progress': on_progress,
+                 'max_interval': max_interval or self.max_interval,
+                 'interval': self.min_interval,
+                 'state': (task.progress, task.last_message),
+                 'errors': 0}
+        with self._lock:
+            self._schedule(entry, self.min_interval)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+        self._wakeup.set()
+        return future
+    
+    @property
+    def pending(self):
+        """
+        Number of tasks being followed
+        
+        :rtype: int
+        """
+        with self._lock:
+            return len(self._heap)
+    
+    def _schedule(self, entry, delay):
+        heapq.heappush(self._heap, (time.time() + delay, 
+                                    next(self._counter), entry))
+    
+    def _poll(self, entry):
+        """
+        Poll a single task and download the result if complete. Returns
+        True if the task changed.
+        """
+        task = entry['future'].task
+        task()
+        state = (task.progress, task.last_message)
+        changed = state != entry['state']
+        entry['state'] = state
+        if changed and task.last_message and entry['on_progress']:
+            entry['on_progress'](task)
+        if task.success and entry['filename']:
+            TaskDownload(task.result, entry['filename']).run()
+        return changed
+    
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._heap:
+                    self._thread = None
+                    return
+                now = time.time()
+                due = []
+                while self._heap and self._heap[0][0] <= now:
+                    due.append(heapq.heappop(self._heap)[2])
+                wait = self._heap[0][0] - now if not due else 0
+                self._wakeup.clear()
+            if not due:
+                self._wakeup.wait(wait)
+                continue
+            for result in concurrent_map(self._poll, due, self.max_workers):
+                entry = result.item
+                future = entry['future']
+                task = future.task
+                if not result.ok:
+                    entry['errors'] += 1
+                    if task.success or entry['errors'] >= self.max_errors:
+                        future._set(result.exception if task.success else
+                                    TaskRunFailed('Failed retrieving task: {}, {}'
+                                                  .format(task.follower, result.exception)))
+                        continue
+                elif task.success:
+                    future._set()
+                    continue
+                elif not task.in_progress:
+                    future._set(TaskRunFailed(re.sub(clean_html, '', 
+                                                     task.last_message or 'Task failed')))
+                    continue
+                else:
+                    entry['errors'] = 0
+                    entry['interval'] = self.min_interval if result.value else \
+                        min(entry['interval'] * self.backoff, entry['max_interval'])
+                with self._lock:
+                    self._schedule(entry, entry['interval'])
+
+_poller = None
+_poller_lock = threading.Lock()
+
+def task_poller():
+    """
+    Shared :class:`TaskPoller` used to follow tasks
+    
+    :return: :class:`TaskPoller`
+    """
+    global _poller
+    with _poller_lock:
+        if _poller is None:
+            _poller = TaskPoller()
+        return _poller
@@ -67,6 +67,11 @@ class SMCRequest(_RequestHandler):
     :param dict params: query string parameters
     :param str filename: name of file for download, optional for create
     :param str etag: etag of element, required for update 
+    :param int timeout: timeout in seconds for GET, overrides the session
+           timeout
+    :param bool resume: for file downloads, resume from a partial file
+    :param progress: for file downloads, callable called with the bytes
+           written and total size
     """
     def __init__(self, href=None, json=None, params=None, filename=None,
                  etag=None, **kwargs):
@@ -0,0 +1,127 @@
+"""
+Bounded thread pool used to issue independent requests to the SMC
+concurrently. The SMC API is request/response based and many operations
+(fetching references, hydrating elements, polling tasks) are made up of
+a large number of small and independent calls. Running these on a small
+number of worker threads sharing the login session removes most of the
+latency without changing the behavior of the individual calls.
+
+Run a function over a set of items and obtain the results in order::
+
+    from smc.api.pool import concurrent_map
+
+    for result in concurrent_map(search.element_references, hrefs):
+        if result.ok:
+            print(result.item, result.value)
+        else:
+            print(result.item, result.exception)
+
+Results can also be consumed as they complete, which is useful for
+progress reporting::
+
+    for result in imap_unordered(fetch, hrefs, max_workers=4):
+        ....
+
+Exceptions raised within the function are not propagated, they are
+returned on the :class:`PoolResult` so a single failure does not
+abort the remaining work.
+"""
+import threading
+import logging
+from collections import namedtuple
+
+try:
+    import queue
+except ImportError: #py2
+    import Queue as queue  # @UnresolvedImport
+
+logger = logging.getLogger(__name__)
+
+#: Default number of worker threads. Keep this modest, the SMC server
+#: processes requests for a single session with limited parallelism.
+DEFAULT_WORKERS = 8
+
+class PoolResult(namedtuple('PoolResult', 'item value exception')):
+    """
+    Result of running a function against a single item.
+
+    :ivar item: the input item
+    :ivar value: return value of the function, or None on failure
+    :ivar exception: exception raised by the function, or None
+    """
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        """
+        Whether the function completed without raising
+
+        :rtype: bool
+        """
+        return self.exception is None
+
+def imap_unordered(function, iterable, max_workers=DEFAULT_WORKERS):
+    """
+    Run function against each item using a bounded number of worker
+    threads and yield a :class:`PoolResult` as each one completes.
+    If the generator is closed before all results are consumed, items
+    that have not yet been started are skipped.
+
+    :param function: callable taking a single item
+    :param iterable: items to process
+    :param int max_workers: maximum number of concurrent workers
+    :return: generator :class:`PoolResult`
+    """
+    items = list(iterable)
+    if not items:
+        return
+
+    work = queue.Queue()
+    for item in items:
+        work.put(item)
+
+    done = queue.Queue()
+    stop = threading.Event()
+
+    def worker():
+        while not stop.is_set():
+            try:
+                item = work.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                done.put(PoolResult(item, function(item), None))
+            except Exception as e:
+                logger.debug('Pool function failed for item: %s, %s', item, e)
+                done.put(PoolResult(item, None, e))
+
+    workers = []
+    for _ in range(max(1, min(max_workers, len(items)))):
+        t = threading.Thread(target=worker)
+        t.daemon = True
+        t.start()
+        workers.append(t)
+
+    try:
+        for _ in range(len(items)):
+            yield done.get()
+    finally:
+        stop.set()
+
+def concurrent_map(function, iterable, max_workers=DEFAULT_WORKERS):
+    """
+    Run function against each item concurrently and return the results
+    in the same order as the input.
+
+    :param function: callable taking a single item
+    :param iterable: items to process
+    :param int max_workers: maximum number of concurrent workers
+    :return: list :class:`PoolResult`
+    """
+    items = list(iterable)
+    indexed = {}
+    for result in imap_unordered(lambda pair: function(pair[1]),
+                                 enumerate(items), max_workers):
+        index, item = result.item
+        indexed[index] = PoolResult(item, result.value, result.exception)
+    return [indexed[i] for i in range(len(items))]
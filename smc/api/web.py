@@ -8,12 +8,16 @@ https://urllib3.readthedocs.io/en/latest/user-guide.html#ssl
 """
 import os.path
 import collections
+import threading
 import requests
 import logging
 from smc.api.exceptions import SMCOperationFailure, SMCConnectionError
 
 logger = logging.getLogger(__name__)
 
+#: Size of chunks written to disk for file downloads
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
 class SMCAPIConnection(object):
     """
     Represents the ReST methods used to perform operations against the
@@ -50,11 +54,12 @@ class SMCAPIConnection(object):
                     response = self.session.get(request.href, 
                                                 params=request.params,
                                                 headers=request.headers, 
-                                                timeout=self.timeout)
+                                                timeout=getattr(request, 'timeout', None)
+                                                or self.timeout)
                     response.encoding = 'utf-8'
                     
                     logger.debug(vars(response))
-                    counters.update(read=1)
+                    _count(read=1)
                     
                     if response.status_code not in (200, 304):
                         raise SMCOperationFailure(response)
@@ -72,7 +77,7 @@ class SMCAPIConnection(object):
                     response.encoding = 'utf-8'
                     
                     logger.debug(vars(response))
-                    counters.update(create=1)
+                    _count(create=1)
                     
                     if response.status_code not in (200, 201, 202):
                         # 202 is asynchronous response with follower link
@@ -89,7 +94,7 @@ class SMCAPIConnection(object):
                                                 headers=request.headers)
                     
                     logger.debug(vars(response))
-                    counters.update(update=1)
+                    _count(update=1)
                        
                     if response.status_code != 200:
                         raise SMCOperationFailure(response)
@@ -98,7 +103,7 @@ class SMCAPIConnection(object):
                     response = self.session.delete(request.href)
                     response.encoding = 'utf-8'
                     
-                    counters.update(delete=1)
+                    _count(delete=1)
                     
                     if response.status_code not in (200, 204):
                         raise SMCOperationFailure(response)
@@ -120,34 +125,101 @@ class SMCAPIConnection(object):
    
     def file_download(self, request):
         """
-        Called when GET request specifies a filename to retrieve.
+        Called when GET request specifies a filename to retrieve. The
+        response is streamed to the file in chunks so memory use does not
+        depend on the size of the file.
+        
+        If the request sets resume, data is written to <filename>.part which
+        is renamed to filename once complete. The ETag or Last-Modified of
+        the response is saved with the partial file. If a partial file exists
+        from an interrupted download, only the remaining data is requested,
+        using If-Range so the server returns the whole file if it changed.
+        A partial file that cannot be validated is discarded and the download
+        restarts.
+        A progress callable on the request is called after each chunk with
+        the bytes written and the total size, or None if unknown.
         """
         logger.debug(vars(request))
-        response = self.session.get(request.href, 
-                                    params=request.params, 
-                                    headers=request.headers, 
-                                    stream=True)
+        path = os.path.abspath(request.filename)
+        resume = getattr(request, 'resume', False)
+        progress = getattr(request, 'progress', None)
+        target = path + '.part' if resume else path
+        validator_file = target + '.validator'
         
-        if response.status_code == 200:
-            logger.debug("Streaming to file... Content length: {}"
-                         .format(len(response.content)))
-            try:
-                path = os.path.abspath(request.filename)
-                logger.debug("Operation: {}, saving to file: {}"
-                             .format(request.href, path))
-                with open(path, "wb") as handle:
-                    for chunk in response.iter_content(chunk_size=1024):
-                        if chunk:
-                            handle.write(chunk)
-                            handle.flush()
-            except IOError as e:
-                raise IOError('Error attempting to save to file: {}'.format(e))
-
-            result = SMCResult(response)
-            result.content = path
-            return result
-        else:
+        offset, validator = 0, None
+        if resume and os.path.exists(target):
+            if os.path.exists(validator_file):
+                with open(validator_file) as f:
+                    validator = f.read().strip() or None
+            if validator:
+                offset = os.path.getsize(target)
+            else: #Partial file from an unknown response
+                _discard(target, validator_file)
+        
+        while True:
+            headers = dict(request.headers or {})
+            if offset:
+                headers['Range'] = 'bytes={}-'.format(offset)
+                headers['If-Range'] = validator
+            response = self.session.get(request.href, 
+                                        params=request.params, 
+                                        headers=headers, 
+                                        stream=True,
+                                        timeout=getattr(request, 'timeout', None))
+            if offset and (response.status_code == 416 or
+                           (response.status_code == 206 and
+                            _range_start(response) != offset)):
+                logger.debug('Partial download of {} is not valid, restarting'
+                             .format(request.href))
+                response.close()
+                _discard(target, validator_file)
+                offset = 0
+                continue
+            break
+        
+        if response.status_code not in (200, 206):
             raise SMCOperationFailure(response)
+        if response.status_code == 200:
+            offset = 0
+        length = response.headers.get('content-length')
+        total = offset + int(length) if length else None
+        logger.debug("Operation: {}, saving to file: {}, offset: {}, total: {}"
+                     .format(request.href, path, offset, total))
+        if resume and not offset:
+            validator = response.headers.get('ETag') or \
+                response.headers.get('Last-Modified')
+            if validator:
+                with open(validator_file, 'w') as f:
+                    f.write(validator)
+            elif os.path.exists(validator_file):
+                os.remove(validator_file)
+        written = offset
+        try:
+            with open(target, "ab" if offset else "wb") as handle:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    if chunk:
+                        handle.write(chunk)
+                        written += len(chunk)
+                        if progress is not None:
+                            progress(written, total)
+        except IOError as e:
+            raise IOError('Error downloading to file: {}'.format(e))
+        finally:
+            response.close()
+        
+        if resume:
+            if os.path.exists(path):
+                os.remove(path)
+            os.rename(target, path)
+            if os.path.exists(validator_file):
+                os.remove(validator_file)
+        # The body was consumed by streaming, only use the status and headers
+        result = SMCResult()
+        result.code = response.status_code
+        result.href = response.headers.get('location')
+        result.etag = response.headers.get('ETag')
+        result.content = path
+        return result
     
     def file_upload(self, request):
         """ 
@@ -167,6 +239,22 @@ class SMCAPIConnection(object):
     
         raise SMCOperationFailure(response)
    
+def _discard(*filenames):
+    for filename in filenames:
+        if os.path.exists(filename):
+            os.remove(filename)
+
+def _range_start(response):
+    """
+    First byte position of a 206 response from the Content-Range header,
+    i.e. 'bytes 100-199/200', None if missing or invalid
+    """
+    content_range = response.headers.get('content-range', '')
+    try:
+        return int(content_range.split()[1].split('-')[0])
+    except (IndexError, ValueError):
+        return None
+
 class SMCResult(object):
     """
     SMCResult will store the return data for operations performed against the
@@ -221,6 +309,15 @@ class SMCResult(object):
             sb.append("{key}='{value}'".format(key=key, value=self.__dict__[key]))
         return ', '.join(sb)
 
+def _count(**kwargs):
+    """
+    Increment call counters. Requests may be sent from multiple
+    threads, see :py:mod:`smc.api.pool`.
+    """
+    with _counters_lock:
+        counters.update(**kwargs)
+
+_counters_lock = threading.Lock()
 counters = collections.Counter({'read': 0, 
                                 'create': 0, 
                                 'update': 0, 
@@ -42,6 +42,8 @@ Element class relationship::
 Classes that do not require state on retrieved json or provide basic 
 container functionality may inherit from object.
 """
+import threading
+from contextlib import contextmanager
 from collections import namedtuple
 import functools
 import smc.core
@@ -55,6 +57,7 @@ from .util import bytes_to_unicode, unicode_to_bytes, find_link_by_name
 from .mixins import UnicodeMixin
 from smc.base.resource import with_metaclass, Registry
 from smc.base.util import find_type_from_self
+from smc.api.pool import concurrent_map, DEFAULT_WORKERS
 
 def exception(function):
     """
@@ -80,16 +83,85 @@ def prepared_request(*exception, **kwargs):
     """ 
     return SMCRequest(**kwargs)
 
-def ElementCreator(cls):
+_creator = threading.local()
+
+@contextmanager
+def return_elements():
     """
-    Helper method for create classmethods. Returns the href if
-    creation is successful
+    Context manager to have create classmethods return the new element
+    instead of the href. The element is built from the Location header
+    of the create response and has its meta data populated, so using
+    it does not require searching for the element by name. If the SMC
+    returned the element json with the response it is cached, otherwise
+    it is retrieved with a single GET on first access::
+    
+        with return_elements():
+            host = Host.create('myhost', '1.1.1.1')
+            host.modify_attribute(comment='web server')
+    
+    The setting applies to the current thread only.
+    """
+    previous = getattr(_creator, 'as_element', False)
+    _creator.as_element = True
+    try:
+        yield
+    finally:
+        _creator.as_element = previous
+
+def returns_elements():
     """
+    Whether create classmethods should return the new element, see
+    :func:`return_elements`.
+    
+    :rtype: bool
+    """
+    return getattr(_creator, 'as_element', False)
+
+def _create(cls, json):
     result = SMCRequest(href=search.element_entry_point(cls.typeof), 
-                        json=cls.json).create()
+                        json=json).create()
     if result.msg:
         raise CreateElementFailed(result.msg)
-    return result.href
+    return result
+
+def ElementCreator(cls, json=None):
+    """
+    Helper method for create classmethods. Returns the href if
+    creation is successful. The json should be built locally within
+    the create method and passed in rather than set on the class, so
+    elements of the same type can be created from multiple threads.
+    Within :func:`return_elements`, the new element is returned instead.
+    
+    :param cls: element class, requires the typeof attribute
+    :param dict json: json for the new element
+    :raises: CreateElementFailed
+    :return: str href of new element
+    """
+    if json is None: #Backwards compatibility
+        json = cls.json
+    if returns_elements():
+        return CreatedElement(cls, json)
+    return _create(cls, json).href
+
+def CreatedElement(cls, json):
+    """
+    Helper method for create classmethods that return the new element.
+    The element is built from the create response without searching
+    for it by name.
+    
+    :param cls: element class, requires the typeof attribute
+    :param dict json: json for the new element
+    :raises: CreateElementFailed
+    :return: instance of cls
+    """
+    result = _create(cls, json)
+    element = cls(name=json.get('name'),
+                  meta=Meta(href=result.href,
+                            name=json.get('name'),
+                            type=cls.typeof))
+    if isinstance(result.json, dict) and result.json.get('link'):
+        element.add_cache(result.json, result.etag)
+    return element
 
 def ElementFactory(href):
     """
@@ -321,6 +393,35 @@ class Element(ElementBase):
         """
         return ElementFactory(href)
     
+    @classmethod
+    def create_many(cls, rows, max_workers=DEFAULT_WORKERS):
+        """
+        Create many elements of this type concurrently. Each row is a dict
+        of keyword arguments for the classes create method. A failure 
+        creating one element does not stop the remaining rows from being
+        created; check each result for errors::
+        
+            rows = [{'name': 'host-1', 'address': '1.1.1.1'},
+                    {'name': 'host-2', 'address': '1.1.1.2'}]
+            for result in Host.create_many(rows, max_workers=8):
+                if result.ok:
+                    print(result.value.name, result.value.href)
+                else:
+                    print(result.item, result.exception)
+        
+        :param list rows: list of dict, keyword arguments for create
+        :param int max_workers: maximum number of concurrent requests
+        :return: list :py:class:`smc.api.pool.PoolResult` in row order, with
+                 value set to the created element
+        """
+        def create(row):
+            with return_elements():
+                result = cls.create(**row)
+            if isinstance(result, ElementBase):
+                return result
+            return ElementFactory(result)
+        return concurrent_map(create, rows, max_workers)
+    
     @property
     def name(self):
         """
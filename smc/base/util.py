@@ -74,4 +74,79 @@ def bytes_to_unicode(s, encoding='utf-8', errors='replace'):
     if compat.PY3:
         return str(s,'utf-8') if isinstance(s, bytes) else s
     else:
-        return s if isinstance(s, unicode) else s.decode(encoding, errors)  # @UndefinedVariable
\ No newline at end of file
+        return s if isinstance(s, unicode) else s.decode(encoding, errors)  # @UndefinedVariable
+
+def ip_to_int(address):
+    """
+    Convert an IPv4 or IPv6 address to its integer value. Used when
+    addresses need to be compared or indexed numerically.
+
+    :param str address: ip address, i.e. 1.1.1.1 or 2001:db8::1
+    :raises: ValueError if the address is not valid
+    :return: tuple (version, int)
+    """
+    import socket
+    import binascii
+    version, family = (6, socket.AF_INET6) if ':' in address \
+        else (4, socket.AF_INET)
+    try:
+        packed = socket.inet_pton(family, address.strip())
+    except (socket.error, UnicodeEncodeError):
+        raise ValueError('Invalid IP address: {}'.format(address))
+    return version, int(binascii.hexlify(packed), 16)
+
+def int_to_ip(version, value):
+    """
+    Convert the integer value of an address back to string format.
+
+    :param int version: 4 or 6
+    :param int value: integer value of address
+    :return: str ip address
+    """
+    import socket
+    import binascii
+    width = 8 if version == 4 else 32
+    packed = binascii.unhexlify('{0:0{1}x}'.format(value, width))
+    return socket.inet_ntop(socket.AF_INET if version == 4 
+                            else socket.AF_INET6, packed)
+
+def network_to_range(network):
+    """
+    Convert a network in cidr format (or address/netmask format for IPv4) 
+    to the first and last integer address in the network. An address 
+    without a prefix is treated as a host.
+    
+    :param str network: network, i.e. 1.1.1.0/24, 1.1.1.0/255.255.255.0
+    :raises: ValueError if the network is not valid
+    :return: tuple (version, start, end)
+    """
+    address, _, prefix = network.partition('/')
+    version, value = ip_to_int(address)
+    bits = 32 if version == 4 else 128
+    if not prefix:
+        prefix = bits
+    elif '.' in prefix: #Netmask
+        prefix = bin(ip_to_int(prefix)[1]).count('1')
+    else:
+        prefix = int(prefix)
+    if not 0 <= prefix <= bits:
+        raise ValueError('Invalid network prefix: {}'.format(network))
+    hostmask = (1 << (bits - prefix)) - 1
+    start = value & ~hostmask
+    return version, start, start | hostmask
+
+def range_to_ints(iprange):
+    """
+    Convert an address range in format 1.1.1.1-1.1.1.10 to the first
+    and last integer address.
+    
+    :param str iprange: ip range, addresses separated by '-'
+    :raises: ValueError if the range is not valid
+    :return: tuple (version, start, end)
+    """
+    first, _, last = iprange.partition('-')
+    version, start = ip_to_int(first)
+    end_version, end = ip_to_int(last) if last else (version, start)
+    if version != end_version or end < start:
+        raise ValueError('Invalid IP range: {}'.format(iprange))
+    return version, start, end
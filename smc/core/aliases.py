@@ -0,0 +1,275 @@
+"""
+Bulk resolution of alias values across engines.
+
+An alias has a value per engine. Resolving each alias on each engine
+separately requires a request per alias and engine pair. Instead, the
+resolved aliases of each engine are retrieved in a single request per
+engine, concurrently across engines, and alias names are retrieved once
+for each distinct alias and kept in a cache shared by all engines and
+subsequent resolutions.
+
+The result is an :class:`AliasMatrix` of aliases by engines::
+
+    from smc.core.aliases import AliasResolver
+
+    resolver = AliasResolver(max_workers=8)
+    matrix = resolver.resolve(aliases=['$$ Interface ID 0.ip',
+                                       '$$ Interface ID 1.ip'])
+    print(matrix.value('$$ Interface ID 0.ip', 'fw1'))
+    print(matrix.row('$$ Interface ID 0.ip'))
+
+    # Which engines resolve an alias to this address
+    for alias, engine in matrix.lookup('10.0.0.1'):
+        print(alias, engine)
+"""
+import logging
+from array import array
+import smc.actions.search as search
+from smc.base.model import prepared_request
+from smc.base.util import find_link_by_name, network_to_range, ip_to_int
+from smc.api.pool import concurrent_map, DEFAULT_WORKERS
+from smc.api.exceptions import FetchElementFailed, UnsupportedEntryPoint
+
+logger = logging.getLogger(__name__)
+
+def resolve_names(hrefs, cache=None, max_workers=DEFAULT_WORKERS):
+    """
+    Names of elements by href, retrieving those not already in the cache
+    concurrently.
+
+    :param hrefs: element hrefs
+    :param dict cache: href -> name, updated with the retrieved names
+    :param int max_workers: maximum number of concurrent requests
+    :return: dict href -> name, name is None if it could not be retrieved
+    """
+    cache = {} if cache is None else cache
+    missing = set(href for href in hrefs if href and href not in cache)
+    for result in concurrent_map(search.element_name_by_href, missing,
+                                 max_workers):
+        if result.ok:
+            cache[result.item] = result.value
+        else:
+            logger.error('Failed retrieving name of element: %s, %s',
+                         result.item, result.exception)
+    return cache
+
+def _ranges(value):
+    """
+    Address range of a resolved value, None if the value is not an
+    address, network or address range
+    """
+    try:
+        if '-' in value:
+            first, last = value.split('-', 1)
+            version, start = ip_to_int(first.strip())
+            return version, start, ip_to_int(last.strip())[1]
+        return network_to_range(value)
+    except (ValueError, AttributeError):
+        return None
+
+class AliasMatrix(object):
+    """
+    Resolved values of aliases by engines. Each distinct set of values is
+    stored once and each alias and engine pair refers to it by index, so
+    the matrix is compact even for many engines resolving aliases to the
+    same values.
+
+    :ivar list aliases: names of aliases, in the order of the rows
+    :ivar list engines: names of engines, in the order of the columns
+    :ivar dict errors: engine name -> exception for engines that could not
+          be resolved
+    """
+    def __init__(self, aliases, engines, errors=None):
+        self.aliases = list(aliases)
+        self.engines = list(engines)
+        self.errors = errors or {}
+        self._alias_index = dict((name, i) for i, name in enumerate(self.aliases))
+        self._engine_index = dict((name, i) for i, name in enumerate(self.engines))
+        self._cells = array('l', [-1]) * (len(self.aliases) * len(self.engines))
+        self._codes = {}
+        self._values = [] # code -> tuple of values
+        self._reverse = None
+
+    def _cell(self, alias, engine):
+        return self._alias_index[alias] * len(self.engines) + \
+            self._engine_index[engine]
+
+    def set(self, alias, engine, values):
+        """
+        Set the resolved values of an alias on an engine.
+
+        :param str alias: name of alias
+        :param str engine: name of engine
+        :param list values: resolved values
+        :raises: KeyError if the alias or engine is not part of the matrix
+        :return: None
+        """
+        values = tuple(values or ())
+        code = self._codes.get(values)
+        if code is None:
+            code = self._codes[values] = len(self._values)
+            self._values.append(values)
+        self._cells[self._cell(alias, engine)] = code
+        self._reverse = None
+
+    def value(self, alias, engine):
+        """
+        Resolved values of an alias on an engine.
+
+        :param str alias: name of alias
+        :param str engine: name of engine
+        :raises: KeyError if the alias or engine is not part of the matrix
+        :return: tuple of values, None if the alias is not resolved on
+                 the engine
+        """
+        code = self._cells[self._cell(alias, engine)]
+        return self._values[code] if code >= 0 else None
+
+    def row(self, alias):
+        """
+        Resolved values of an alias on each engine
+
+        :return: dict engine name -> tuple of values
+        """
+        start = self._alias_index[alias] * len(self.engines)
+        return dict((engine, self._values[self._cells[start + i]])
+                    for i, engine in enumerate(self.engines)
+                    if self._cells[start + i] >= 0)
+
+    def column(self, engine):
+        """
+        Resolved values of each alias on an engine
+
+        :return: dict alias name -> tuple of values
+        """
+        index, size = self._engine_index[engine], len(self.engines)
+        return dict((alias, self._values[self._cells[i * size + index]])
+                    for i, alias in enumerate(self.aliases)
+                    if self._cells[i * size + index] >= 0)
+
+    def _reverse_index(self):
+        """
+        Value codes by address. Single addresses are indexed directly,
+        networks and ranges are kept in a list to be matched by containment.
+        """
+        if self._reverse is None:
+            addresses, ranges = {}, []
+            for code, values in enumerate(self._values):
+                for value in values:
+                    iprange = _ranges(value)
+                    if iprange is None:
+                        continue
+                    if iprange[1] == iprange[2]:
+                        addresses.setdefault(iprange[:2], set()).add(code)
+                    else:
+                        ranges.append((iprange, code))
+            cells = {}
+            for position, code in enumerate(self._cells):
+                if code >= 0:
+                    cells.setdefault(code, array('l')).append(position)
+            self._reverse = (addresses, ranges, cells)
+        return self._reverse
+
+    def lookup(self, address):
+        """
+        Aliases and engines where the alias resolves to the address, or to
+        a network or range containing the address.
+
+        :param str address: IPv4 or IPv6 address
+        :raises: ValueError if address is not a valid address
+        :return: list tuple (alias name, engine name)
+        """
+        version, value = ip_to_int(address)
+        addresses, ranges, cells = self._reverse_index()
+        codes = set(addresses.get((version, value), ()))
+        codes.update(code for (v, start, end), code in ranges
+                     if v == version and start <= value <= end)
+        size = len(self.engines)
+        return sorted((self.aliases[position // size], self.engines[position % size])
+                      for code in codes for position in cells.get(code, ()))
+
+    def __iter__(self):
+        """
+        :return: generator tuple (alias name, engine name, values) for
+                 each resolved alias and engine pair
+        """
+        size = len(self.engines)
+        for position, code in enumerate(self._cells):
+            if code >= 0:
+                yield (self.aliases[position // size],
+                       self.engines[position % size], self._values[code])
+
+    def __len__(self):
+        return sum(1 for code in self._cells if code >= 0)
+
+    def __repr__(self):
+        return '{0}(aliases={1},engines={2})'.format(
+            self.__class__.__name__, len(self.aliases), len(self.engines))
+
+class AliasResolver(object):
+    """
+    Resolve aliases on many engines concurrently. Alias names are cached
+    by href for the lifetime of the resolver.
+
+    :param int max_workers: maximum number of concurrent requests
+    """
+    def __init__(self, max_workers=DEFAULT_WORKERS):
+        self.max_workers = max_workers
+        self.names = {} # alias href -> name
+
+    def _engines(self, engines=None):
+        href = search.element_entry_point('engine_clusters')
+        if not href:
+            raise UnsupportedEntryPoint('Entry point: engine_clusters not found '
+                                        'in this version of the SMC API')
+        listing = prepared_request(FetchElementFailed, href=href).read().json or []
+        if engines is not None:
+            names = set(getattr(engine, 'name', engine) for engine in engines)
+            listing = [engine for engine in listing if engine.get('name') in names]
+        return listing
+
+    def _resolving(self, engine):
+        links = prepared_request(FetchElementFailed,
+                                 href=engine.get('href')).read().json.get('link')
+        return prepared_request(FetchElementFailed,
+                                href=find_link_by_name('alias_resolving', links)
+                                ).read().json or []
+
+    def resolve(self, engines=None, aliases=None):
+        """
+        Resolve aliases on engines.
+
+        :param list engines: engine names or :py:class:`smc.core.engine.Engine`,
+               all engines by default
+        :param list aliases: names of aliases to include, all aliases
+               resolved on the engines by default
+        :raises: :py:class:`smc.api.exceptions.FetchElementFailed`: failed
+                 listing engines
+        :return: :class:`AliasMatrix`
+        """
+        listing = self._engines(engines)
+        resolved, errors = [], {}
+        for result in concurrent_map(self._resolving, listing, self.max_workers):
+            name = result.item.get('name')
+            if result.ok:
+                resolved.append((name, result.value))
+            else:
+                errors[name] = result.exception
+                logger.error('Failed resolving aliases for engine: %s, %s',
+                             name, result.exception)
+
+        names = resolve_names((alias.get('alias_ref')
+                               for _, data in resolved for alias in data),
+                              self.names, self.max_workers)
+        if aliases is None:
+            aliases = sorted(set(names.get(alias.get('alias_ref'))
+                                 for _, data in resolved for alias in data) -
+                             set([None]))
+        matrix = AliasMatrix(aliases, [name for name, _ in resolved], errors)
+        wanted = set(aliases)
+        for engine, data in resolved:
+            for alias in data:
+                name = names.get(alias.get('alias_ref'))
+                if name in wanted:
+                    matrix.set(name, engine, alias.get('resolved_value'))
+        return matrix
@@ -0,0 +1,324 @@
+"""
+Streaming blacklist ingestion for feeding blacklist entries from an event
+source, such as an IDS, to many engines.
+
+Entries are submitted to a bounded in-memory queue and collected into
+batches over a short time window. Within a batch, duplicate entries are
+merged keeping the longest duration, and entries whose source network is
+contained in another entry for the same destination with an equal or
+longer duration are dropped. An entry that was already sent to an engine
+is not sent again while at least half of its duration remains.
+
+Each batch is sent to all target engines concurrently. While a batch is
+being sent no new batch is started, so when the engines cannot keep up
+the queue fills; :meth:`BlacklistFeeder.submit` then either waits for
+room in the queue or drops the entry, depending on ``block``::
+
+    from smc.core.blacklist import BlacklistFeeder
+
+    with BlacklistFeeder(['fw1', 'fw2'], window=2, max_queue=10000) as feeder:
+        for event in events:
+            feeder.submit(event.src + '/32', '0.0.0.0/0', duration=3600)
+            ...
+        print(feeder.metrics)
+
+If engines are not provided, entries are sent to the global blacklist of
+all engines using :py:meth:`smc.administration.system.System.blacklist`.
+"""
+import time
+import logging
+import threading
+from collections import namedtuple
+from smc.core.engine import Engine
+from smc.elements.other import prepare_blacklist
+from smc.base.model import prepared_request
+from smc.base.util import network_to_range
+from smc.api.pool import concurrent_map, imap_unordered, DEFAULT_WORKERS
+from smc.api.exceptions import EngineCommandFailed, ActionCommandFailed
+
+try:
+    import queue
+except ImportError: #py2
+    import Queue as queue  # @UnresolvedImport
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+class BlacklistMetrics(namedtuple('BlacklistMetrics',
+                                  'received dropped coalesced suppressed sent '
+                                  'failed batches queued elapsed')):
+    """
+    Counters of a :class:`BlacklistFeeder`. Sent and failed count
+    requests, that is one per entry and engine.
+
+    :ivar int received: entries accepted into the queue
+    :ivar int dropped: entries rejected because the queue was full
+    :ivar int coalesced: entries merged into another entry of a batch
+    :ivar int suppressed: entries not sent as they are still active on
+          the engine
+    :ivar int sent: entries sent successfully
+    :ivar int failed: entries that failed to be sent
+    :ivar int batches: number of batches sent
+    :ivar int queued: entries currently waiting in the queue
+    :ivar float elapsed: seconds since the feeder was started
+    """
+    __slots__ = ()
+
+    @property
+    def rate(self):
+        """
+        Entries sent per second
+
+        :rtype: float
+        """
+        return self.sent / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def drop_rate(self):
+        """
+        Fraction of submitted entries that were dropped
+
+        :rtype: float
+        """
+        submitted = self.received + self.dropped
+        return self.dropped / float(submitted) if submitted else 0.0
+
+def coalesce(entries):
+    """
+    Merge duplicate and overlapping blacklist entries. Entries with the same
+    source and destination keep the longest duration. An entry is removed
+    if its source is contained in the source of another entry with the
+    same destination and an equal or longer duration.
+
+    :param list entries: tuple (src, dst, duration)
+    :raises: ValueError if a source or destination is not a valid network
+    :return: dict (src range, dst range) -> (src, dst, duration), where a
+             range is the (version, start, end) of the network
+    """
+    merged = {}
+    for src, dst, duration in entries:
+        key = (network_to_range(src), network_to_range(dst))
+        current = merged.get(key)
+        if current is None or duration > current[2]:
+            merged[key] = (src, dst, duration)
+
+    # Sort by destination, then by source with enclosing networks first.
+    # Networks are either nested or disjoint, so the networks containing
+    # an entry are the ones on the stack that have not ended before it.
+    result = {}
+    stack = [] # (dst range, src version, src end, max duration)
+    for key in sorted(merged, key=lambda k: (k[1], k[0][0], k[0][1], -k[0][2])):
+        (version, start, end), dst = key
+        duration = merged[key][2]
+        while stack and (stack[-1][0] != dst or stack[-1][1] != version or
+                         stack[-1][2] < start):
+            stack.pop()
+        if stack and stack[-1][3] >= duration:
+            continue
+        longest = max(duration, stack[-1][3]) if stack else duration
+        stack.append((dst, version, end, longest))
+        result[key] = merged[key]
+    return result
+
+class BlacklistFeeder(object):
+    """
+    Bounded queue of blacklist entries sent to engines in coalesced batches.
+
+    :param list engines: engine names or :py:class:`smc.core.engine.Engine`,
+           if None entries are added to the global blacklist
+    :param float window: seconds entries are collected before a batch is sent
+    :param int max_queue: maximum number of entries waiting in the queue
+    :param int max_workers: maximum number of concurrent requests
+    :param bool block: when the queue is full, wait for room in the queue
+           instead of dropping the entry
+    :param float timeout: seconds to wait for room when block is True, None
+           to wait indefinitely
+    :ivar dict unavailable: engine name -> reason for engines that have no
+          blacklist link and are not sent entries
+    """
+    def __init__(self, engines=None, window=2.0, max_queue=10000,
+                 max_workers=DEFAULT_WORKERS, block=False, timeout=None):
+        self.engines = None if engines is None else \
+            [engine if isinstance(engine, Engine) else Engine(engine)
+             for engine in engines]
+        self.window = window
+        self.max_workers = max_workers
+        self.block = block
+        self.timeout = timeout
+        self.unavailable = {}
+        self._queue = queue.Queue(max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopping = False # stop marker queued for the thread
+        self._targets = None # [(name, href, exception class)]
+        self._active = {} # (href, key) -> expiry time
+        self._counters = dict.fromkeys(('received', 'dropped', 'coalesced',
+                                        'suppressed', 'sent', 'failed',
+                                        'batches'), 0)
+        self._started = None
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    def _resolve(self):
+        """
+        Blacklist link of each target
+        """
+        if self.engines is None:
+            from smc.administration.system import System
+            return [('System', System()._link('blacklist'), ActionCommandFailed)]
+        targets = []
+        for result in concurrent_map(lambda engine: engine._link('blacklist'),
+                                     self.engines, self.max_workers):
+            if result.ok:
+                targets.append((result.item.name, result.value, EngineCommandFailed))
+            else:
+                self.unavailable[result.item.name] = str(result.exception)
+                logger.error('Engine: %s will not receive blacklist entries, %s',
+                             result.item.name, result.exception)
+        return targets
+
+    def start(self):
+        """
+        Resolve the target engines and start sending batches. Called
+        automatically when used as a context manager.
+
+        :return: self
+        """
+        if self._thread is None:
+            self._targets = self._resolve()
+            self._started = time.time()
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+        return self
+
+    def submit(self, src, dst, duration=3600):
+        """
+        Queue a blacklist entry. Use the cidr netmask at the end of src and
+        dst, such as 1.1.1.1/32.
+
+        :param str src: source of the entry
+        :param str dst: destination of the entry
+        :param int duration: how long to blacklist in seconds
+        :raises: ValueError if src or dst is not a valid network
+        :return: True if queued, False if dropped because the queue is full
+        :rtype: bool
+        """
+        network_to_range(src)
+        network_to_range(dst)
+        try:
+            self._queue.put((src, dst, duration), self.block, self.timeout)
+        except queue.Full:
+            self._count('dropped')
+            return False
+        self._count('received')
+        return True
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            item = self._queue.get()
+            deadline = time.time() + self.window
+            while item is not _STOP:
+                batch.append(item)
+                try:
+                    item = self._queue.get(timeout=max(0, deadline - time.time()))
+                except queue.Empty:
+                    break
+            stopping = item is _STOP
+            if batch:
+                try:
+                    self._send(batch)
+                except Exception as e:
+                    logger.error('Failed sending blacklist batch: %s', e)
+
+    def _send(self, batch):
+        now = time.time()
+        entries = coalesce(batch)
+        self._count('coalesced', len(batch) - len(entries))
+        self._active = dict((key, expiry) for key, expiry in self._active.items()
+                            if expiry > now)
+        requests = []
+        for key, entry in entries.items():
+            for target in self._targets:
+                # Refresh an entry only once half of its duration has passed
+                if self._active.get((target[1], key), 0) - now >= entry[2] / 2.0:
+                    self._count('suppressed')
+                else:
+                    requests.append((target, key, entry))
+
+        def post(request):
+            (_, href, exception), _, (src, dst, duration) = request
+            prepared_request(exception, href=href,
+                             json=prepare_blacklist(src, dst, duration)).create()
+
+        for result in imap_unordered(post, requests, self.max_workers):
+            (name, href, _), key, entry = result.item
+            if result.ok:
+                self._active[(href, key)] = now + entry[2]
+                self._count('sent')
+            else:
+                self._count('failed')
+                logger.error('Failed adding blacklist entry: %s -> %s on %s, %s',
+                             entry[0], entry[1], name, result.exception)
+        self._count('batches')
+
+    def stop(self, timeout=None):
+        """
+        Send the entries remaining in the queue and stop. Entries submitted
+        after stop are queued but not sent. If the queue is full, waiting for
+        room to queue the stop counts against the timeout. If the queue has
+        no room in time, or the remaining entries are not sent in time, the
+        feeder keeps running and stop can be called again.
+
+        :param float timeout: seconds to wait for the remaining entries to be
+               sent, None to wait indefinitely
+        :return: None
+        """
+        if self._thread is not None:
+            deadline = None if timeout is None else time.time() + timeout
+            if not self._stopping:
+                try:
+                    self._queue.put(_STOP, timeout=timeout)
+                except queue.Full:
+                    logger.warning('Blacklist feeder not stopped, the queue is '
+                                   'still full after %s seconds', timeout)
+                    return
+                self._stopping = True
+            self._thread.join(None if deadline is None else
+                              max(0, deadline - time.time()))
+            if self._thread.is_alive():
+                logger.warning('Blacklist feeder still sending remaining entries '
+                               'after %s seconds', timeout)
+                return
+            self._thread = None
+            self._stopping = False
+
+    @property
+    def metrics(self):
+        """
+        Current counters
+
+        :rtype: BlacklistMetrics
+        """
+        with self._lock:
+            counters = dict(self._counters)
+        return BlacklistMetrics(queued=self._queue.qsize(),
+                                elapsed=time.time() - self._started
+                                if self._started else 0.0,
+                                **counters)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def __repr__(self):
+        return '{0}(engines={1},window={2})'.format(
+            self.__class__.__name__,
+            'global' if self.engines is None else len(self.engines), self.window)
@@ -0,0 +1,296 @@
+"""
+Crawler to collect the configuration of all engines and their linked
+resources (nodes, interfaces, routing, antispoofing and internal gateway)
+into a local store.
+
+Engines are crawled concurrently with a bounded number of workers. Each
+engine is written to the store as soon as it is crawled; the store is
+also the checkpoint. When the crawler is run again against the same store,
+each engine is retrieved conditionally with the ETag that was stored and
+engines that have not changed are skipped. An engine that fails to be
+crawled is not written and is retried on the next run, so an interrupted
+or partially failed run can be resumed by running it again.
+
+Crawl into a JSONL file, one engine per line::
+
+    from smc.core.crawler import EngineCrawler, JSONLStore
+
+    store = JSONLStore('engines.jsonl')
+    result = EngineCrawler(store, max_workers=8).run()
+    print(result.crawled, result.unchanged, result.errors)
+
+    for record in store.records():
+        print(record['name'], len(record['interfaces']))
+
+Crawl into SQLite. Engines are stored in the ``engines`` table and each
+resource item (each node, each interface, etc) in the ``engine_resources``
+table::
+
+    store = SQLiteStore('engines.db')
+    EngineCrawler(store).run()
+"""
+import os
+import time
+import json
+import logging
+import sqlite3
+from collections import namedtuple
+import smc.actions.search as search
+from smc.base.model import Meta, prepared_request
+from smc.base.util import find_link_by_name
+from smc.api.pool import imap_unordered, DEFAULT_WORKERS
+from smc.api.exceptions import FetchElementFailed, ResourceNotFound,\
+    UnsupportedEntryPoint
+
+logger = logging.getLogger(__name__)
+
+#: Engine linked resources crawled by default
+RESOURCES = ('nodes', 'interfaces', 'routing', 'antispoofing', 'internal_gateway')
+
+class CrawlResult(namedtuple('CrawlResult', 'crawled unchanged removed errors')):
+    """
+    Summary of a crawler run.
+
+    :ivar int crawled: number of engines crawled and written
+    :ivar int unchanged: number of engines skipped as unchanged
+    :ivar list removed: hrefs of engines no longer on the SMC
+    :ivar dict errors: href -> exception for engines that failed
+    """
+    __slots__ = ()
+
+class JSONLStore(object):
+    """
+    Store crawled engines in a file with one json record per line. Records
+    are appended; the last record for an engine is the current one. Engines
+    that were removed from the SMC are recorded with 'deleted': True.
+
+    :param str filename: name of file
+    """
+    def __init__(self, filename):
+        self.filename = filename
+
+    def _read(self):
+        if not os.path.exists(self.filename):
+            return
+        with open(self.filename) as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError: #Incomplete line from an interrupted run
+                    continue
+
+    def records(self):
+        """
+        Current record for each engine
+
+        :return: list dict
+        """
+        records = {}
+        for record in self._read():
+            if record.get('deleted'):
+                records.pop(record.get('href'), None)
+            else:
+                records[record.get('href')] = record
+        return list(records.values())
+
+    def checkpoints(self):
+        """
+        ETag of each stored engine
+
+        :return: dict href -> etag
+        """
+        return dict((record.get('href'), record.get('etag'))
+                    for record in self.records())
+
+    def write(self, record):
+        with open(self.filename, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+    def remove(self, href):
+        self.write({'href': href, 'deleted': True})
+
+    def close(self):
+        pass
+
+class SQLiteStore(object):
+    """
+    Store crawled engines in a SQLite database. The ``engines`` table has
+    one row per engine with the engine json, and ``engine_resources`` one
+    row per resource item with the engine href, resource name and position.
+
+    :param str filename: name of database file
+    """
+    def __init__(self, filename):
+        self.connection = sqlite3.connect(filename)
+        with self.connection:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS engines (href TEXT PRIMARY KEY, '
+                'name TEXT, type TEXT, etag TEXT, crawled_at REAL, data TEXT)')
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS engine_resources (engine_href TEXT, '
+                'resource TEXT, position INTEGER, data TEXT)')
+            self.connection.execute(
+                'CREATE INDEX IF NOT EXISTS engine_resources_href '
+                'ON engine_resources (engine_href)')
+
+    def records(self):
+        """
+        Current record for each engine, in the same format as
+        :meth:`JSONLStore.records`
+
+        :return: list dict
+        """
+        records = {}
+        for href, name, typeof, etag, crawled_at, data in self.connection.execute(
+                'SELECT href, name, type, etag, crawled_at, data FROM engines'):
+            records[href] = {'href': href, 'name': name, 'type': typeof,
+                             'etag': etag, 'crawled_at': crawled_at,
+                             'engine': json.loads(data)}
+        for href, resource, data in self.connection.execute(
+                'SELECT engine_href, resource, data FROM engine_resources '
+                'ORDER BY engine_href, resource, position'):
+            if href not in records:
+                continue
+            value = json.loads(data)
+            if resource.endswith('[]'):
+                records[href].setdefault(resource[:-2], []).append(value)
+            else:
+                records[href][resource] = value
+        return list(records.values())
+
+    def checkpoints(self):
+        return dict(self.connection.execute('SELECT href, etag FROM engines'))
+
+    def write(self, record):
+        rows = []
+        for resource, value in record.items():
+            if resource in ('href', 'name', 'type', 'etag', 'crawled_at', 'engine'):
+                continue
+            if isinstance(value, list):
+                rows.extend((record['href'], resource + '[]', position, json.dumps(item))
+                            for position, item in enumerate(value))
+            else:
+                rows.append((record['href'], resource, 0, json.dumps(value)))
+        with self.connection:
+            self.connection.execute('DELETE FROM engine_resources WHERE engine_href = ?',
+                                    (record['href'],))
+            self.connection.execute(
+                'INSERT OR REPLACE INTO engines VALUES (?, ?, ?, ?, ?, ?)',
+                (record['href'], record['name'], record['type'], record['etag'],
+                 record['crawled_at'], json.dumps(record['engine'])))
+            self.connection.executemany(
+                'INSERT INTO engine_resources VALUES (?, ?, ?, ?)', rows)
+
+    def remove(self, href):
+        with self.connection:
+            self.connection.execute('DELETE FROM engine_resources WHERE engine_href = ?',
+                                    (href,))
+            self.connection.execute('DELETE FROM engines WHERE href = ?', (href,))
+
+    def close(self):
+        self.connection.close()
+
+def _read(href):
+    return prepared_request(FetchElementFailed, href=href).read().json
+
+def _is_reference(item):
+    return isinstance(item, dict) and 'href' in item and \
+        set(item).issubset(('href', 'name', 'type'))
+
+class EngineCrawler(object):
+    """
+    Crawl engines and their linked resources into a store.
+
+    :param store: :class:`JSONLStore` or :class:`SQLiteStore`
+    :param list resources: engine link names to crawl, default :data:`RESOURCES`
+    :param int max_workers: maximum number of engines crawled concurrently
+    """
+    def __init__(self, store, resources=RESOURCES, max_workers=DEFAULT_WORKERS):
+        self.store = store
+        self.resources = resources
+        self.max_workers = max_workers
+
+    def _list(self):
+        href = search.element_entry_point('engine_clusters')
+        if not href:
+            raise UnsupportedEntryPoint('Entry point: engine_clusters not found '
+                                        'in this version of the SMC API')
+        return [Meta(href=engine.get('href'), name=engine.get('name'),
+                     type=engine.get('type'))
+                for engine in prepared_request(FetchElementFailed,
+                                               href=href).read().json or []]
+
+    def _resource(self, links, name):
+        """
+        Retrieve a linked resource. Lists of references, such as nodes
+        or interfaces, are expanded by retrieving each referenced element.
+        """
+        try:
+            href = find_link_by_name(name, links)
+        except ResourceNotFound: #Not supported by this engine type
+            return None
+        data = _read(href)
+        if isinstance(data, list):
+            return [_read(item['href']) if _is_reference(item) else item
+                    for item in data]
+        return data
+
+    def _crawl(self, meta, etag=None):
+        """
+        Crawl a single engine. Returns None if the engine is unchanged
+        since the stored ETag.
+        """
+        headers = {'Etag': etag} if etag else {}
+        result = prepared_request(FetchElementFailed,
+                                  href=meta.href,
+                                  headers=headers).read()
+        if etag and result.code == 304:
+            return None
+        record = {'href': meta.href,
+                  'name': meta.name,
+                  'type': meta.type,
+                  'etag': result.etag,
+                  'crawled_at': time.time(),
+                  'engine': result.json}
+        links = result.json.get('link', [])
+        for name in self.resources:
+            record[name] = self._resource(links, name)
+        return record
+
+    def run(self, engines=None):
+        """
+        Crawl engines. Engines are written to the store as they complete.
+
+        :param list engines: optional list of engine names to crawl,
+               otherwise all engines are crawled. Engines are only
+               removed from the store when all engines are crawled
+        :raises: :py:class:`smc.api.exceptions.FetchElementFailed`: failed
+                 listing engines
+        :return: :class:`CrawlResult`
+        """
+        listing = self._list()
+        if engines is not None:
+            listing = [meta for meta in listing if meta.name in engines]
+        checkpoints = self.store.checkpoints()
+
+        crawled, unchanged, errors = 0, 0, {}
+        for result in imap_unordered(
+                lambda meta: self._crawl(meta, checkpoints.get(meta.href)),
+                listing, self.max_workers):
+            if not result.ok:
+                logger.error('Failed crawling engine: %s, %s',
+                             result.item.name, result.exception)
+                errors[result.item.href] = result.exception
+            elif result.value is None:
+                unchanged += 1
+            else:
+                self.store.write(result.value)
+                crawled += 1
+
+        removed = []
+        if engines is None:
+            listed = set(meta.href for meta in listing)
+            removed = [href for href in checkpoints if href not in listed]
+            for href in removed:
+                self.store.remove(href)
+        return CrawlResult(crawled, unchanged, removed, errors)
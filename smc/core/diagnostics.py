@@ -0,0 +1,293 @@
+"""
+Enable or disable diagnostics (debugging) on many engine nodes at once.
+
+The diagnostics available on a node depend on the node type and software
+version. The diagnostic catalog is retrieved from one node of each node
+type and version and cached, and the enable or disable request is then
+sent to all nodes concurrently. Only the requested diagnostics are sent,
+other diagnostic settings of the nodes are not changed::
+
+    from smc.core.diagnostics import FleetDiagnostics
+
+    diagnostics = FleetDiagnostics(['fw1', 'fw2', 'cluster1'], max_workers=20)
+    for result in diagnostics.enable(['Packet filter', 'Protocol Agent']):
+        print(result)
+    ...
+    diagnostics.disable(['Packet filter', 'Protocol Agent'])
+
+The engine nodes and catalogs are kept for the lifetime of the instance;
+call :meth:`FleetDiagnostics.refresh` after engines are changed or
+upgraded.
+
+SG Info archives can be collected from all nodes of a set of engines
+concurrently with :func:`collect_sginfo`. Each archive is streamed to its
+own file. With resume, an interrupted collection continues partial
+downloads when run again, if the SMC reports the archives are unchanged::
+
+    from smc.core.diagnostics import collect_sginfo
+
+    def progress(node, written, total):
+        print(node, written, total)
+
+    for result in collect_sginfo(['cluster1'], '/tmp/sginfo', progress=progress,
+                                 resume=True):
+        print(result)
+"""
+import os
+import re
+import copy
+import logging
+import threading
+from collections import namedtuple
+from smc.compat import string_types
+from smc.core.engine import Engine
+from smc.core.node import Diagnostic
+from smc.api.pool import concurrent_map, imap_unordered, DEFAULT_WORKERS
+from smc.api.exceptions import NodeCommandFailed
+
+logger = logging.getLogger(__name__)
+
+class DiagnosticResult(namedtuple('DiagnosticResult', 'engine node diagnostics error')):
+    """
+    Result of sending diagnostics to a node.
+
+    :ivar str engine: name of engine
+    :ivar str node: name of node, None if the engine nodes could not be
+          retrieved
+    :ivar list diagnostics: names of diagnostics sent
+    :ivar str error: reason for failure, None if successful
+    """
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        """
+        Whether the diagnostics were sent
+
+        :rtype: bool
+        """
+        return self.error is None
+
+    def __str__(self):
+        return '{0}/{1}: {2}'.format(self.engine, self.node or '',
+                                     self.error or 'ok')
+
+class FleetDiagnostics(object):
+    """
+    Diagnostic settings for the nodes of a set of engines.
+
+    :param list engines: engine names or :py:class:`smc.core.engine.Engine`
+    :param int max_workers: maximum number of concurrent requests
+    """
+    def __init__(self, engines, max_workers=DEFAULT_WORKERS):
+        self.engines = [engine if isinstance(engine, Engine) else Engine(engine)
+                        for engine in engines]
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._nodes = None # [(engine name, node, catalog key)]
+        self._errors = [] # DiagnosticResult for nodes without status
+        self._catalogs = {} # (node type, version) -> {name: diagnostic}
+
+    def _engine_nodes(self, engine):
+        nodes, errors = [], []
+        for node in engine.nodes:
+            try:
+                nodes.append((engine.name, node, (node.type, node.status().version)))
+            except Exception as e:
+                errors.append(DiagnosticResult(engine.name, node.name, [], str(e)))
+        return nodes, errors
+
+    def _topology(self):
+        with self._lock:
+            if self._nodes is None:
+                nodes, errors = [], []
+                for result in concurrent_map(self._engine_nodes, self.engines,
+                                             self.max_workers):
+                    if result.ok:
+                        nodes.extend(result.value[0])
+                        errors.extend(result.value[1])
+                    else:
+                        errors.append(DiagnosticResult(result.item.name, None, [],
+                                                       str(result.exception)))
+                self._nodes, self._errors = nodes, errors
+            return self._nodes, self._errors
+
+    def _load_catalog(self, node):
+        return dict((diagnostic.name.lower(), diagnostic.diagnostic)
+                    for diagnostic in node.diagnostic())
+
+    def catalogs(self):
+        """
+        Diagnostic catalog of each node type and version in the engine set.
+        Catalogs are retrieved once, from the first node of each type and
+        version.
+
+        :return: dict (node type, version) -> list of diagnostic names
+        """
+        nodes, _ = self._topology()
+        missing = {}
+        for _, node, key in nodes:
+            if key not in self._catalogs:
+                missing.setdefault(key, node)
+        for result in concurrent_map(lambda key: self._load_catalog(missing[key]),
+                                     list(missing), self.max_workers):
+            if result.ok:
+                self._catalogs[result.item] = result.value
+            else:
+                logger.error('Failed retrieving diagnostics for node: %s, %s',
+                             missing[result.item].name, result.exception)
+        return dict((key, sorted(diagnostic['name'] for diagnostic in catalog.values()))
+                    for key, catalog in self._catalogs.items() if catalog)
+
+    def _send(self, node, key, names, enabled):
+        catalog = self._catalogs.get(key)
+        if not catalog:
+            raise NodeCommandFailed('Diagnostics could not be retrieved for node '
+                                    'type: {}, version: {}'.format(*key))
+        missing = [name for name in names if name.lower() not in catalog]
+        if missing:
+            raise NodeCommandFailed('Diagnostics not available on this node: {}'
+                                    .format(', '.join(missing)))
+        diagnostics = []
+        for name in names:
+            diagnostic = Diagnostic(copy.deepcopy(catalog[name.lower()]))
+            if enabled:
+                diagnostic.enable()
+            else:
+                diagnostic.disable()
+            diagnostics.append(diagnostic)
+        node.send_diagnostic(diagnostics)
+
+    def set(self, names, enabled):
+        """
+        Enable or disable diagnostics on all nodes.
+
+        :param list names: names of diagnostics, case insensitive. A single
+               name can be given as a string
+        :param bool enabled: enable or disable the diagnostics
+        :return: list :class:`DiagnosticResult`, one per node
+        """
+        if isinstance(names, string_types):
+            names = [names]
+        self.catalogs()
+        nodes, errors = self._topology()
+        results = list(errors)
+        for result in concurrent_map(lambda item: self._send(item[1], item[2],
+                                                             names, enabled),
+                                     nodes, self.max_workers):
+            engine, node, _ = result.item
+            if result.ok:
+                results.append(DiagnosticResult(engine, node.name, list(names), None))
+            else:
+                logger.error('Failed sending diagnostics to node: %s, %s',
+                             node.name, result.exception)
+                results.append(DiagnosticResult(engine, node.name, [],
+                                                str(result.exception)))
+        return results
+
+    def enable(self, names):
+        """
+        Enable diagnostics on all nodes.
+
+        :param list names: names of diagnostics, case insensitive, or a
+               single name as a string
+        :return: list :class:`DiagnosticResult`
+        """
+        return self.set(names, True)
+
+    def disable(self, names):
+        """
+        Disable diagnostics on all nodes.
+
+        :param list names: names of diagnostics, case insensitive, or a
+               single name as a string
+        :return: list :class:`DiagnosticResult`
+        """
+        return self.set(names, False)
+
+    def refresh(self):
+        """
+        Discard the cached engine nodes and diagnostic catalogs.
+
+        :return: None
+        """
+        with self._lock:
+            self._nodes = None
+            self._errors = []
+            self._catalogs = {}
+
+    def __repr__(self):
+        return '{0}(engines={1})'.format(self.__class__.__name__, len(self.engines))
+
+class SginfoResult(namedtuple('SginfoResult', 'engine node filename error')):
+    """
+    Result of collecting SG Info from a node.
+
+    :ivar str engine: name of engine
+    :ivar str node: name of node, None if the engine nodes could not be
+          retrieved
+    :ivar str filename: path of the archive, None if it failed
+    :ivar str error: reason for failure, None if successful
+    """
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __str__(self):
+        return '{0}/{1}: {2}'.format(self.engine, self.node or '',
+                                     self.error or self.filename)
+
+def collect_sginfo(engines, directory, include_core_files=False,
+                   include_slapcat_output=False, progress=None, resume=False,
+                   max_workers=DEFAULT_WORKERS):
+    """
+    Collect SG Info from every node of the engines concurrently. Archives
+    are saved in directory as <engine>-<node>.gz.
+
+    :param list engines: engine names or :py:class:`smc.core.engine.Engine`
+    :param str directory: directory to save archives in, created if needed
+    :param bool include_core_files: include core files
+    :param bool include_slapcat_output: include slapcat output
+    :param progress: callable called with node name, bytes written and
+           total size (None if not known) as each node downloads. Called
+           from worker threads
+    :param bool resume: resume partial downloads left by an interrupted
+           collection, see :py:meth:`smc.core.node.Node.sginfo`
+    :param int max_workers: maximum number of concurrent downloads
+    :return: list :class:`SginfoResult`, in order of completion
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    engines = [engine if isinstance(engine, Engine) else Engine(engine)
+               for engine in engines]
+    results, nodes = [], []
+    for result in concurrent_map(lambda engine: engine.nodes, engines, max_workers):
+        if result.ok:
+            nodes.extend((result.item.name, node) for node in result.value)
+        else:
+            results.append(SginfoResult(result.item.name, None, None,
+                                        str(result.exception)))
+
+    def download(item):
+        engine, node = item
+        filename = os.path.join(directory, re.sub(
+            r'[^\w.-]+', '_', '{}-{}'.format(engine, node.name)) + '.gz')
+        callback = None
+        if progress is not None:
+            callback = lambda written, total: progress(node.name, written, total)
+        return node.sginfo(include_core_files, include_slapcat_output,
+                           filename=filename, resume=resume,
+                           progress=callback)
+
+    for result in imap_unordered(download, nodes, max_workers):
+        engine, node = result.item
+        if result.ok:
+            results.append(SginfoResult(engine, node.name, result.value, None))
+        else:
+            logger.error('Failed collecting SG Info from node: %s, %s',
+                         node.name, result.exception)
+            results.append(SginfoResult(engine, node.name, None,
+                                        str(result.exception)))
+    return results
@@ -1,3 +1,4 @@
+import copy
 import smc.actions.search as search
 from smc.compat import min_smc_version
 from smc.elements.helpers import domain_helper
@@ -9,12 +10,16 @@ from smc.api.exceptions import LoadEngineFailed, UnsupportedEngineFeature,\
 from smc.core.node import Node
 from smc.core.resource import Snapshot
 from smc.core.interfaces import PhysicalInterface, \
-    VirtualPhysicalInterface, TunnelInterface, Interface
+    VirtualPhysicalInterface, TunnelInterface, Interface, InterfaceIndex
 from smc.administration.tasks import task_handler, Task
 from smc.elements.other import prepare_blacklist
 from smc.elements.network import Alias
 from smc.vpn.elements import VPNSite
-from smc.core.route import Antispoofing, Routing, Routes
+from smc.core.route import Antispoofing, Routing, Routes, RoutingTree,\
+    AntispoofingTree
+from smc.api.pool import concurrent_map, PoolResult, DEFAULT_WORKERS
+from smc.base.util import network_to_range
+from smc.core.aliases import resolve_names
 
 class Engine(Element):
     """
@@ -36,8 +41,14 @@ class Engine(Element):
     :ivar routing_monitoring: :py:class:`smc.core.route.Routes` current route table
     :ivar antispoofing: :py:class:`smc.core.route.Antispoofing` antispoofing interface
           configuration
+    :ivar routing_tree: :py:class:`smc.core.route.RoutingTree` routing configuration
+          for bulk changes
+    :ivar antispoofing_tree: :py:class:`smc.core.route.AntispoofingTree` antispoofing
+          configuration for bulk changes
     :ivar interface: :py:class:`smc.core.interfaces.Interface` interfaces 
           for this engine
+    :ivar interface_index: :py:class:`smc.core.interfaces.InterfaceIndex` 
+          interface lookup by interface ID
     :ivar internal_gateway: :py:class:`~InternalGateway` engine 
           level VPN settings
     :ivar virtual_resource: :py:class:`smc.core.engine.VirtualResource` for engine, 
@@ -48,7 +59,10 @@ class Engine(Element):
           retrieve or create tunnel interfaces
     :ivar snapshots: :py:class:`smc.core.engine.Snapshot` engine level policy snapshots
 
+    Linked resources can be retrieved in advance with :meth:`prefetch`.
     """
+    _prefetched = None # (engine etag, {href: json})
+    
     def __init__(self, name, meta=None, **kwargs):
         super(Engine, self).__init__(name, meta)
         pass
@@ -165,6 +179,78 @@ class Engine(Element):
         except LoadEngineFailed:
             raise
 
+    def prefetch(self, *resources, **kwargs):
+        """
+        Retrieve linked resources of the engine concurrently and keep them
+        on this engine instance. Resources are provided by link name, for
+        example 'nodes', 'routing', 'antispoofing', 'internal_gateway' or
+        'interfaces'. Subsequent access to the related engine properties
+        uses the prefetched json without further requests::
+        
+            engine = Engine('myfw').prefetch('nodes', 'routing', 'interfaces')
+            for node in engine.nodes:
+                ...
+        
+        Resources that are not supported by this engine type are skipped.
+        The engine ETag is checked once per call: prefetching again adds to
+        the resources already prefetched if the engine is unchanged,
+        otherwise they are all retrieved again. Prefetched resources are
+        discarded when the engine or its interfaces are modified through
+        this instance; call prefetch again to pick up changes made
+        elsewhere.
+        
+        :param str resources: link names of resources to retrieve
+        :param int max_workers: maximum number of concurrent requests
+        :raises: :py:class:`smc.api.exceptions.FetchElementFailed`
+        :return: self
+        """
+        max_workers = kwargs.get('max_workers', DEFAULT_WORKERS)
+        etag = self.etag
+        prefetched = {}
+        if self._prefetched and self._prefetched[0] == etag:
+            prefetched = self._prefetched[1]
+        hrefs = []
+        for resource in resources:
+            try:
+                href = self._link(resource)
+            except ResourceNotFound:
+                continue
+            if href not in prefetched:
+                hrefs.append(href)
+        for result in concurrent_map(super(Engine, self)._get_resource,
+                                     hrefs, max_workers):
+            if not result.ok:
+                raise result.exception
+            prefetched[result.item] = result.value
+        self._prefetched = (etag, prefetched)
+        return self
+    
+    def _get_resource(self, href):
+        """
+        Return json for href, from prefetched resources if available
+        """
+        prefetched = self._prefetched
+        if prefetched and href in prefetched[1]:
+            return copy.deepcopy(prefetched[1][href])
+        return super(Engine, self)._get_resource(href)
+    
+    def _invalidate(self):
+        """
+        Discard prefetched resources after the engine is modified
+        """
+        self._prefetched = None
+    
+    def modify_attribute(self, **kwargs):
+        """
+        Modify the engine attribute by key / value pair, see
+        :py:meth:`smc.base.model.ElementBase.modify_attribute`
+        """
+        self._invalidate()
+        super(Engine, self).modify_attribute(**kwargs)
+    
+    def _get_resource_by_link(self, link):
+        return self._get_resource(self._link(link))
+    
     @property
     def version(self):
         """
@@ -192,6 +278,7 @@ class Engine(Element):
         for node in self.nodes:
             node.modify_attribute(name='{} node {}'.format(name, node.nodeid))
         self._name = self.data.get('name')
+        self._invalidate()
         
     @property
     def nodes(self):
@@ -232,10 +319,15 @@ class Engine(Element):
         
             print(list(engine.alias_resolving()))
         
+        Alias names are retrieved concurrently. For resolving aliases on
+        many engines, see :py:class:`smc.core.aliases.AliasResolver`.
+        
         :return: generator :py:class:`smc.elements.network.Alias`
         """
-        for alias in self._get_resource_by_link('alias_resolving'):
-            yield Alias.load(alias)
+        aliases = self._get_resource_by_link('alias_resolving')
+        names = resolve_names(alias.get('alias_ref') for alias in aliases)
+        for alias in aliases:
+            yield Alias.load(alias, names.get(alias.get('alias_ref')))
   
     def blacklist(self, src, dst, duration=3600):
         """ 
@@ -278,12 +370,75 @@ class Engine(Element):
         :raises: `smc.api.exceptions.EngineCommandFailed`
         :return: None
         """
+        self._invalidate()
         prepared_request(EngineCommandFailed,
                          href=self._link('add_route'),
                          params={'gateway': gateway, 
                                  'network': network}
                          ).create()
 
+    def check_routes(self, routes):
+        """
+        Validate static routes locally, without changes on the SMC. Each
+        gateway must be on a network directly connected to an interface
+        of the engine, based on the routing configuration.
+        
+        :param routes: iterable of (gateway, network) tuples
+        :return: list :py:class:`smc.api.pool.PoolResult` in the order of
+                 routes, with the route as item and the interface name as
+                 value, or an :py:class:`smc.api.exceptions.EngineCommandFailed`
+                 exception if the route is invalid
+        """
+        index = self.routing_tree.network_index()
+        results = []
+        for route in routes:
+            gateway, network = route
+            try:
+                network_to_range(network)
+                interface = index.lookup(gateway)
+            except (ValueError, AttributeError) as e:
+                results.append(PoolResult(route, None, EngineCommandFailed(
+                    'Invalid route: {} via {}, {}'.format(network, gateway, e))))
+                continue
+            if interface is None:
+                results.append(PoolResult(route, None, EngineCommandFailed(
+                    'Gateway: {} is not on a network directly connected to the '
+                    'engine'.format(gateway))))
+            else:
+                results.append(PoolResult(route, interface.name, None))
+        return results
+    
+    def add_routes(self, routes, max_workers=DEFAULT_WORKERS):
+        """
+        Add many static routes. All routes are validated locally first 
+        (see :meth:`check_routes`); routes that are invalid are not sent
+        and the valid routes are added concurrently::
+        
+            results = engine.add_routes([('10.0.0.1', '192.168.0.0/16'),
+                                         ('10.0.0.1', '172.16.0.0/12')])
+            for result in results:
+                if not result.ok:
+                    print(result.item, result.exception)
+        
+        :param routes: iterable of (gateway, network) tuples
+        :param int max_workers: maximum number of concurrent requests
+        :return: list :py:class:`smc.api.pool.PoolResult` in the order of
+                 routes, with the route as item and the interface name as
+                 value if the route was added
+        """
+        checked = self.check_routes(routes)
+        valid = [i for i, result in enumerate(checked) if result.ok]
+        
+        def add(i):
+            gateway, network = checked[i].item
+            self.add_route(gateway, network)
+            return checked[i].value
+        
+        for result in concurrent_map(add, valid, max_workers):
+            checked[result.item] = PoolResult(checked[result.item].item,
+                                              result.value, result.exception)
+        return checked
+    
     @property                            
     def routing(self):
         """
@@ -324,6 +479,44 @@ class Engine(Element):
         except SMCConnectionError:
             raise EngineCommandFailed('Timed out waiting for routes')
     
+    def lookup_route(self, address, refresh=False):
+        """
+        Route the engine uses for an address, by longest prefix match on
+        the current route table::
+        
+            route = engine.lookup_route('10.1.1.1')
+            print(route.route_gateway, route.dst_if)
+        
+        The route table is retrieved from routing monitoring on first use
+        and kept on this engine instance until refresh is requested.
+        
+        :param str address: IPv4 or IPv6 address
+        :param bool refresh: retrieve the route table again
+        :raises: `smc.api.exceptions.EngineCommandFailed`: routes cannot be retrieved
+        :raises ValueError: invalid address
+        :return: :py:data:`smc.core.route.Route` or None if no route matches
+        """
+        return self._route_table(refresh).lookup(address)
+    
+    def lookup_routes(self, addresses, refresh=False):
+        """
+        Route the engine uses for each address. See :meth:`lookup_route`.
+        
+        :param addresses: iterable of IPv4 or IPv6 addresses
+        :param bool refresh: retrieve the route table again
+        :raises: `smc.api.exceptions.EngineCommandFailed`: routes cannot be retrieved
+        :raises ValueError: invalid address
+        :return: list :py:data:`smc.core.route.Route` or None, in the order
+                 of addresses
+        """
+        return self._route_table(refresh).lookup_many(addresses)
+    
+    def _route_table(self, refresh=False):
+        table = getattr(self, '_routes', None)
+        if table is None or refresh:
+            table = self._routes = self.routing_monitoring.table
+        return table
+    
     @property                     
     def antispoofing(self):
         """ 
@@ -340,6 +533,34 @@ class Engine(Element):
         return Antispoofing(meta=Meta(href=href),
                             data=self._get_resource(href))
     @property
+    def routing_tree(self):
+        """
+        Flattened routing configuration for bulk changes, sent in a
+        single update::
+        
+            tree = engine.routing_tree
+            tree.add_ospf_area(area, interfaces=['Interface 1', 'Interface 2'])
+            tree.commit()
+        
+        :return: :py:class:`smc.core.route.RoutingTree`
+        """
+        return RoutingTree(self._link('routing'))
+    
+    @property
+    def antispoofing_tree(self):
+        """
+        Flattened antispoofing configuration for bulk changes, sent in a
+        single update::
+        
+            tree = engine.antispoofing_tree
+            tree.add_entries([('Interface 0', network)])
+            tree.commit()
+        
+        :return: :py:class:`smc.core.route.AntispoofingTree`
+        """
+        return AntispoofingTree(self._link('antispoofing'))
+    
+    @property
     def internal_gateway(self):
         """ 
         Engine level VPN gateway information. This is a link from
@@ -394,6 +615,23 @@ class Engine(Element):
         return Interface(meta=Meta(href=self._link('interfaces')), 
                          engine=self)
     
+    @property
+    def interface_index(self):
+        """
+        Index of engine interfaces by interface ID and VLAN nicid. The 
+        index is kept for the life of this engine instance and is rebuilt
+        only when the engine changes::
+        
+            intf = engine.interface_index.get(2)
+            vlan = engine.interface_index.vlan(2, 100)
+        
+        :return: :py:class:`smc.core.interfaces.InterfaceIndex`
+        """
+        index = getattr(self, '_interface_index', None)
+        if index is None:
+            index = self._interface_index = InterfaceIndex(self)
+        return index
+    
     @property
     def physical_interface(self):
         """ 
@@ -744,7 +982,7 @@ class VirtualResource(SubElement):
         return self.data.get('vfw_id')
 
     def create(self, name, vfw_id, domain='Shared Domain',
-               show_master_nic=False, connection_limit=0):
+               show_master_nic=False, connection_limit=0, domain_ref=None):
         """
         Create a new virtual resource
         
@@ -755,9 +993,11 @@ class VirtualResource(SubElement):
                in the virtual instance
         :param int connection_limit: whether to limit number of connections for this 
                instance
+        :param str domain_ref: href of domain. If provided, the domain is not
+               looked up by name
         :return: str href: href location of new virtual resource
         """
-        allocated_domain = domain_helper(domain)
+        allocated_domain = domain_ref if domain_ref else domain_helper(domain)
         json = {'name': name,
                 'connection_limit': connection_limit,
                 'show_master_nic': show_master_nic,
@@ -272,6 +272,42 @@ class Layer3VirtualEngine(object):
                                      'VE named: {}. You must first create a virtual '
                                      'resource for the master engine before you can associate '
                                      'a virtual engine. Cannot add VE'.format(name))
+        engine = cls.build(name, virt_resource_href, interfaces, 
+                           default_nat=default_nat,
+                           outgoing_intf=outgoing_intf,
+                           domain_server_address=domain_server_address,
+                           enable_ospf=enable_ospf,
+                           ospf_profile=ospf_profile)
+        
+        href = search.element_entry_point('virtual_fw')
+        result = prepared_request(href=href, json=engine).create()
+        if result.href:
+            return Engine(name=name, meta=Meta(name=name, href=result.href,
+                                               type='virtual_fw'))
+        else:
+            raise CreateEngineFailed('Could not create the virtual engine, '
+                                     'reason: {}'
+                                     .format(result.msg))
+    
+    @classmethod
+    def build(cls, name, virtual_resource_href, interfaces, default_nat=False,
+              outgoing_intf=0, domain_server_address=None, enable_ospf=False,
+              ospf_profile=None):
+        """
+        Build the virtual engine json without creating it. This is used by
+        :py:meth:`create` and can be used when the virtual resource href is
+        already known, avoiding the virtual resource lookup.
+        
+        :param str name: Name of this layer 3 virtual engine
+        :param str virtual_resource_href: href of the virtual resource
+        :param list interfaces: dict of interface details
+        :param boolean default_nat: Whether to enable default NAT for outbound
+        :param int outgoing_intf: outgoing interface for VE. Specifies interface number
+        :param list domain_server_address: dns addresses
+        :param boolean enable_ospf: whether to turn OSPF on within engine
+        :param str ospf_profile: optional OSPF profile to use on engine, by ref
+        :return: dict
+        """
         new_interfaces=[]   
         for interface in interfaces:       
             physical = VirtualPhysicalInterface()
@@ -288,7 +324,7 @@ class Layer3VirtualEngine(object):
 
             new_interfaces.append(physical())
            
-            engine = Engine.create(name=name,
+        engine = Engine.create(name=name,
                                node_type=cls.node_type,
                                physical_interfaces=new_interfaces, 
                                domain_server_address=domain_server_address,
@@ -297,18 +333,9 @@ class Layer3VirtualEngine(object):
                                enable_ospf=enable_ospf,
                                ospf_profile=ospf_profile)
 
-            engine.update(virtual_resource=virt_resource_href)
-            engine.pop('log_server_ref', None) #Master Engine provides this service
-
-        href = search.element_entry_point('virtual_fw')
-        result = prepared_request(href=href, json=engine).create()
-        if result.href:
-            return Engine(name=name, meta=Meta(name=name, href=result.href,
-                                               type='virtual_fw'))
-        else:
-            raise CreateEngineFailed('Could not create the virtual engine, '
-                                     'reason: {}'
-                                     .format(result.msg))
+        engine.update(virtual_resource=virtual_resource_href)
+        engine.pop('log_server_ref', None) #Master Engine provides this service
+        return engine
             
 class FirewallCluster(object):
     """ 
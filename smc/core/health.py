@@ -0,0 +1,221 @@
+"""
+Health snapshot of all engine nodes. Node status and appliance status are
+retrieved concurrently for all nodes, with a timeout applied to each
+request so that an unresponsive node does not hold up the snapshot.
+
+The result is a compact table with one :class:`NodeHealth` row per node.
+Snapshots are cached for a short time so that dashboards can poll the
+snapshot frequently without a request storm on the SMC::
+
+    from smc.core.health import FleetHealth
+
+    health = FleetHealth(timeout=5, ttl=30)
+    for row in health.snapshot():
+        print(row.engine, row.node, row.status, row.configuration_status,
+              row.version, row.interfaces_down)
+
+The engines and nodes making up the fleet are retrieved once and kept for
+topology_ttl seconds; only the status requests are repeated for each
+snapshot.
+"""
+import time
+import logging
+import threading
+from collections import namedtuple
+import smc.actions.search as search
+from smc.base.model import prepared_request
+from smc.base.util import find_link_by_name
+from smc.api.pool import concurrent_map, DEFAULT_WORKERS
+from smc.api.exceptions import NodeCommandFailed, FetchElementFailed,\
+    UnsupportedEntryPoint, ResourceNotFound
+
+logger = logging.getLogger(__name__)
+
+#: Hardware status value of a node
+HardwareState = namedtuple('HardwareState', 'name label param value')
+
+#: Interface status of a node
+InterfaceState = namedtuple('InterfaceState', 'interface_id name status')
+
+class NodeHealth(namedtuple('NodeHealth', 'engine node nodeid status state '
+                            'configuration_status version installed_policy '
+                            'hardware interfaces error')):
+    """
+    Health of a single node.
+
+    :ivar str engine: name of engine
+    :ivar str node: name of node
+    :ivar int nodeid: node id
+    :ivar str status: node status, i.e. Online, Offline
+    :ivar str state: monitoring state, i.e. READY, TIMEOUT
+    :ivar str configuration_status: i.e. Installed, Configured
+    :ivar str version: engine software version
+    :ivar str installed_policy: name of installed policy
+    :ivar tuple hardware: :data:`HardwareState` values
+    :ivar tuple interfaces: :data:`InterfaceState` values
+    :ivar str error: reason status could not be retrieved, None if ok
+    """
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        """
+        Whether the node status was retrieved
+
+        :rtype: bool
+        """
+        return self.error is None
+
+    @property
+    def interfaces_down(self):
+        """
+        Interface IDs with a status other than Up
+
+        :return: list
+        """
+        return [intf.interface_id for intf in self.interfaces
+                if intf.status and intf.status.lower() != 'up']
+
+def _hardware(data):
+    hardware = data.get('hardware_statuses') or {}
+    if isinstance(hardware, dict): #Status is nested under the same key
+        hardware = hardware.get('hardware_statuses') or []
+    return tuple(HardwareState(status.get('name'), value.get('label'),
+                               value.get('param'), value.get('value'))
+                 for status in hardware
+                 for item in status.get('items') or []
+                 for value in item.get('statuses') or [])
+
+def _interfaces(data):
+    interfaces = data.get('interface_statuses') or {}
+    if isinstance(interfaces, dict):
+        interfaces = interfaces.get('interface_status') or []
+    return tuple(InterfaceState(intf.get('interface_id'), intf.get('name'),
+                                intf.get('status'))
+                 for intf in interfaces)
+
+class FleetHealth(object):
+    """
+    Concurrent health snapshot of engine nodes.
+
+    :param list engines: optional engine names to include, all engines
+           are included by default
+    :param int timeout: timeout in seconds for each status request
+    :param int ttl: seconds a snapshot is reused before it is retrieved again
+    :param int topology_ttl: seconds the engine and node list is reused
+    :param int max_workers: maximum number of concurrent requests
+    """
+    def __init__(self, engines=None, timeout=10, ttl=30, topology_ttl=600,
+                 max_workers=DEFAULT_WORKERS):
+        self.engines = engines
+        self.timeout = timeout
+        self.ttl = ttl
+        self.topology_ttl = topology_ttl
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._topology = None # (time, [(engine, node, nodeid, status, appliance)])
+        self._snapshot = None # (time, [NodeHealth])
+
+    def _engines(self):
+        href = search.element_entry_point('engine_clusters')
+        if not href:
+            raise UnsupportedEntryPoint('Entry point: engine_clusters not found '
+                                        'in this version of the SMC API')
+        engines = prepared_request(FetchElementFailed, href=href).read().json or []
+        if self.engines is not None:
+            engines = [engine for engine in engines
+                       if engine.get('name') in self.engines]
+        return engines
+
+    def _nodes(self, engine):
+        """
+        Status links of each node of an engine
+        """
+        links = prepared_request(FetchElementFailed,
+                                 href=engine.get('href')).read().json.get('link')
+        nodes = []
+        for node in prepared_request(FetchElementFailed,
+                                     href=find_link_by_name('nodes', links)
+                                     ).read().json or []:
+            data = prepared_request(FetchElementFailed,
+                                    href=node.get('href')).read().json
+            try:
+                appliance = find_link_by_name('appliance_status', data.get('link'))
+            except ResourceNotFound: #Not available for virtual engines
+                appliance = None
+            nodes.append((engine.get('name'), data.get('name'), data.get('nodeid'),
+                          find_link_by_name('status', data.get('link')), appliance))
+        return nodes
+
+    def _topology_nodes(self):
+        if self._topology is None or \
+                time.time() - self._topology[0] > self.topology_ttl:
+            nodes = []
+            for result in concurrent_map(self._nodes, self._engines(),
+                                         self.max_workers):
+                if result.ok:
+                    nodes.extend(result.value)
+                else:
+                    logger.error('Failed retrieving nodes for engine: %s, %s',
+                                 result.item.get('name'), result.exception)
+            self._topology = (time.time(), nodes)
+        return self._topology[1]
+
+    def _health(self, node):
+        engine, name, nodeid, status_href, appliance_href = node
+        try:
+            status = prepared_request(NodeCommandFailed,
+                                      href=status_href,
+                                      timeout=self.timeout).read().json or {}
+            appliance = {}
+            if appliance_href:
+                appliance = prepared_request(NodeCommandFailed,
+                                             href=appliance_href,
+                                             timeout=self.timeout).read().json or {}
+        except Exception as e:
+            return NodeHealth(engine, name, nodeid, None, None, None, None, None,
+                              (), (), str(e))
+        return NodeHealth(engine, name, nodeid,
+                          status.get('status'),
+                          status.get('state'),
+                          status.get('configuration_status'),
+                          status.get('version'),
+                          status.get('installed_policy'),
+                          _hardware(appliance),
+                          _interfaces(appliance),
+                          None)
+
+    def snapshot(self, force=False):
+        """
+        Health of all nodes. A snapshot taken within the last ttl seconds
+        is returned unless force is True.
+
+        :param bool force: retrieve a new snapshot regardless of age
+        :raises: :py:class:`smc.api.exceptions.FetchElementFailed`: failed
+                 listing engines
+        :return: list :class:`NodeHealth`, sorted by engine and node id
+        """
+        with self._lock:
+            if force or self._snapshot is None or \
+                    time.time() - self._snapshot[0] > self.ttl:
+                rows = [result.value for result in
+                        concurrent_map(self._health, self._topology_nodes(),
+                                       self.max_workers)]
+                rows.sort(key=lambda row: (row.engine, row.nodeid or 0))
+                self._snapshot = (time.time(), rows)
+            return self._snapshot[1]
+
+    def refresh(self):
+        """
+        Discard the cached snapshot and engine topology. The next snapshot
+        retrieves the engine and node list again.
+
+        :return: None
+        """
+        with self._lock:
+            self._topology = None
+            self._snapshot = None
+
+    def __repr__(self):
+        return '{0}(ttl={1},timeout={2})'.format(self.__class__.__name__,
+                                                 self.ttl, self.timeout)
@@ -24,9 +24,12 @@ VLANs are properties of specific interfaces and can also be retrieved by
 first getting the top level interface, and calling :func:`~smc.core.interfaces.Interface.vlan_interfaces` 
 to view or modify specific aspects of a VLAN, such as addresses, etc.
 """
+import threading
 from copy import deepcopy
 from functools import wraps
 from smc.base.model import Meta, prepared_request, SubElement
+from smc.base.util import find_link_by_name
+from smc.api.pool import concurrent_map, PoolResult, DEFAULT_WORKERS
 from smc.api.exceptions import EngineCommandFailed
 from smc.elements.other import ContactAddress
 from smc.core.sub_interfaces import (NodeInterface, SingleNodeInterface, 
@@ -47,6 +50,7 @@ def create(method):
         if not self.href: #has no location
             return self._data
         else:
+            _invalidate_index(self._engine)
             if hasattr(self, '_update'): #exit decorator
                 return
             prepared_request(EngineCommandFailed,
@@ -260,10 +264,16 @@ class Interface(SubElement):
             print(p.name, p.typeof, p.address, p.network_value)
             .....
         
+        Lookups are done using the engine :class:`InterfaceIndex`.
+        
         :param str|int interface_id: interface ID to retrieve
         :raises: :py:class:`smc.api.exceptions.EngineCommandFailed` if interface not found
         :return: interface object by type (Physical, Tunnel, PhysicalVlanInterface)
         """
+        if self._engine is not None:
+            return self._engine.interface_index.get(
+                interface_id, typeof=getattr(type(self), 'typeof', None))
+        
         interface_id = str(interface_id)
         for interface in self._get_resource(self.meta.href):
             intf_type = interface.get('type') #Keep type
@@ -293,6 +303,20 @@ class Interface(SubElement):
         """
         return bool(self.data.get('interfaces'))
     
+    def batch(self):
+        """
+        Start an interface transaction to queue many interface changes and
+        send them with one request per interface. See :class:`InterfaceBatch`.
+        
+        :raises: :py:class:`smc.api.exceptions.EngineCommandFailed` if there 
+                 is no engine reference
+        :return: :class:`InterfaceBatch`
+        """
+        if not self.href or self._engine is None:
+            raise EngineCommandFailed('An interface batch requires an engine '
+                                      'reference.')
+        return InterfaceBatch(self)
+    
     def save(self):
         """
         Save this interface information back to SMC. When saving
@@ -311,6 +335,7 @@ class Interface(SubElement):
         :raises: :py:class:`smc.api.exceptions.EngineCommandFailed`
         :return: None
         """
+        _invalidate_index(self._engine)
         prepared_request(EngineCommandFailed,
                          href=self.href,
                          json=self.data,
@@ -394,8 +419,9 @@ class Interface(SubElement):
         :return: list :py:class:`smc.elements.interfaces.Interface`
         """
         interfaces=[]
-        
-        for interface in self._get_resource(self.meta.href):
+        #Engine may have prefetched the interface listing
+        resource = self._engine if self._engine is not None else self
+        for interface in resource._get_resource(self.meta.href):
             intf_type = InterfaceFactory(interface.get('type'))
             interfaces.append(intf_type(meta=Meta(**interface),
                                         engine=self._engine))
@@ -885,7 +911,8 @@ class PhysicalInterface(InterfaceCommon, Interface):
             if isinstance(vlan, PhysicalVlanInterface):
                 if vlan.interface_id == '{}.{}'.format(interface_id, vlan_id):
                     vlan.data['interfaces'] = [intf()]
-           
+        
+        _invalidate_index(self._engine)
         prepared_request(EngineCommandFailed,
                          href=p.href,
                          json=p.data,
@@ -1139,6 +1166,228 @@ class VirtualPhysicalInterface(PhysicalInterface):
         super(VirtualPhysicalInterface, self).__init__(meta, **kwargs)
         pass
 
+
+class InterfaceBatch(object):
+    """
+    Interface transaction. Interface changes are queued using the same
+    methods available on the interface, i.e. :meth:`PhysicalInterface.add_vlan_to_node_interface`,
+    and combined locally into one configuration per interface ID. On 
+    commit, each new interface is created and each existing interface 
+    is updated with a single request, regardless of the number of VLANs
+    or sub-interfaces added to it.
+    
+    Obtain a batch from the engine interface and commit automatically
+    when the block exits without error::
+    
+        with engine.physical_interface.batch() as batch:
+            for vlan in range(100, 300):
+                batch.add_vlan_to_node_interface(1, vlan, 
+                                                 virtual_mapping=0,
+                                                 virtual_resource_name='ve-{}'.format(vlan))
+            batch.add_ipaddress_to_vlan_interface(2, '10.0.0.1', '10.0.0.0/24', 
+                                                  vlan_id=10)
+    
+    Collisions, such as adding a VLAN that already exists or an address 
+    twice on the same node, are detected before any request is sent.
+    
+    :param interface: interface with an engine reference, i.e. 
+           engine.physical_interface
+    :ivar list results: :py:class:`smc.api.pool.PoolResult` for each interface
+          ID from the last commit, with value set to the interface href
+    """
+    #: Interface methods that can be queued
+    methods = ('add', 'add_single_node_interface', 'add_node_interface',
+               'add_capture_interface', 'add_inline_interface', 
+               'add_dhcp_interface', 'add_cluster_virtual_interface',
+               'add_cluster_interface_on_master_engine',
+               'add_cluster_virtual_and_node_interfaces',
+               'add_vlan_to_single_node_interface', 
+               'add_vlan_to_node_interface', 'add_vlan_to_inline_interface')
+    
+    def __init__(self, interface):
+        self._interface = interface
+        self._engine = interface._engine
+        self._pending = {} # interface_id -> [href, etag, json]
+        self.results = []
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+    
+    def __getattr__(self, name):
+        if name not in self.methods or \
+            not hasattr(type(self._interface), name):
+            raise AttributeError(name)
+        
+        def queue(*args, **kwargs):
+            #Without an href, the interface method only builds the json
+            detached = type(self._interface)()
+            self._merge(getattr(detached, name)(*args, **kwargs))
+        return queue
+    
+    def _base(self, interface_id):
+        """
+        Configuration for the interface ID, either pending, existing on
+        the engine, or None.
+        """
+        interface_id = str(interface_id)
+        if interface_id not in self._pending:
+            try:
+                existing = self._engine.interface_index.get(
+                    interface_id, typeof=getattr(type(self._interface), 'typeof', None))
+            except EngineCommandFailed:
+                return None
+            if existing.data.get('interface_id') != interface_id:
+                return None #VLAN nicid matched an interface
+            self._pending[interface_id] = [existing.href, 
+                                           existing.cache()[0],
+                                           existing.data]
+        return self._pending[interface_id][2]
+    
+    def _merge(self, data):
+        interface_id = str(data.get('interface_id'))
+        base = self._base(interface_id)
+        if base is None:
+            base = {'interface_id': data.get('interface_id'),
+                    'interfaces': [],
+                    'vlanInterfaces': []}
+            self._pending[interface_id] = [None, None, base]
+        
+        for key, value in data.items():
+            if key == 'interfaces':
+                for intf in value or []:
+                    if not _has_sub_interface(base, intf):
+                        _add_sub_interface(base, intf, interface_id)
+            elif key == 'vlanInterfaces':
+                existing = set(vlan.get('interface_id') 
+                               for vlan in base.get('vlanInterfaces') or [])
+                for vlan in value or []:
+                    if vlan.get('interface_id') in existing:
+                        raise EngineCommandFailed('VLAN {} already exists'
+                                                  .format(vlan.get('interface_id')))
+                    base.setdefault('vlanInterfaces', []).append(vlan)
+            elif key != 'interface_id' and value is not None:
+                base[key] = value
+    
+    def add_ipaddress_to_vlan_interface(self, interface_id, address, network_value,
+                                        vlan_id, nodeid=1, **kwargs):
+        """
+        Queue an IP address for an existing or queued VLAN. See
+        :meth:`PhysicalInterface.add_ipaddress_to_vlan_interface`.
+        Calling this for each node of a cluster adds an address per node.
+        
+        :param str interface_id: interface to modify
+        :param str address: ip address for vlan
+        :param str network_value: network for address
+        :param int vlan_id: id of vlan
+        :param int nodeid: node identifier
+        :raises: :py:class:`smc.api.exceptions.EngineCommandFailed` VLAN not found
+        :return: None
+        """
+        nicid = '{}.{}'.format(interface_id, vlan_id)
+        if self._engine.type == 'single_fw':
+            intf = SingleNodeInterface.create(interface_id, address, network_value, 
+                                              nodeid, nicid=nicid)
+        else:
+            intf = NodeInterface.create(interface_id, address, network_value, 
+                                        nodeid, nicid=nicid)
+        base = self._base(interface_id)
+        for vlan in (base or {}).get('vlanInterfaces') or []:
+            if vlan.get('interface_id') == nicid:
+                _add_sub_interface(vlan, intf(), nicid)
+                return
+        raise EngineCommandFailed('VLAN {} not found'.format(nicid))
+    
+    def _check(self):
+        """
+        Inline interface pairs use the second interface ID, which cannot
+        also be added as a new interface.
+        """
+        for interface_id, (href, _, data) in self._pending.items():
+            for intf in data.get('interfaces') or []:
+                for if_type, values in intf.items():
+                    if if_type != 'inline_interface':
+                        continue
+                    second = str(values.get('nicid')).split('-')[-1].split('.')[0]
+                    pending = self._pending.get(second)
+                    if second != interface_id and pending is not None and \
+                        pending[0] is None:
+                        raise EngineCommandFailed('Interface {} is used by inline '
+                                                  'interface {}'.format(second, 
+                                                                        values.get('nicid')))
+    
+    def commit(self):
+        """
+        Send queued changes, one request per interface ID. All interfaces
+        are attempted; failures are reported after all requests complete.
+        
+        :raises: :py:class:`smc.api.exceptions.EngineCommandFailed` if a 
+                 collision was found (nothing is sent), or if any request
+                 failed
+        :return: list :py:class:`smc.api.pool.PoolResult`
+        """
+        self._check()
+        results = []
+        for interface_id in sorted(self._pending):
+            href, etag, data = self._pending[interface_id]
+            try:
+                if href:
+                    prepared_request(EngineCommandFailed,
+                                     href=href,
+                                     json=data,
+                                     etag=etag).update()
+                else:
+                    href = prepared_request(EngineCommandFailed,
+                                            href=self._interface.href,
+                                            json=data).create().href
+                results.append(PoolResult(interface_id, href, None))
+            except EngineCommandFailed as e:
+                results.append(PoolResult(interface_id, None, e))
+        self._pending = {}
+        self.results = results
+        _invalidate_index(self._engine)
+        
+        failed = ['{}: {}'.format(r.item, r.exception) for r in results if not r.ok]
+        if failed:
+            raise EngineCommandFailed('Failed saving interfaces: {}'
+                                      .format(', '.join(failed)))
+        return results
+
+def _has_sub_interface(data, intf):
+    """
+    Whether the sub interface is already defined on data. Queuing a VLAN on
+    an inline pair repeats the inline interface, which only needs to be
+    defined once; only its VLANs are added.
+    """
+    interfaces = data.get('interfaces') or []
+    if intf in interfaces:
+        return True
+    for if_type, values in intf.items():
+        if if_type == 'inline_interface':
+            return any(values.get('nicid') == subif[if_type].get('nicid')
+                       for subif in interfaces if if_type in subif)
+    return False
+
+def _add_sub_interface(data, intf, interface_id):
+    """
+    Add sub interface json to interfaces of data, raising if the same
+    address is already assigned to the same node.
+    """
+    def key(subif):
+        for if_type, values in subif.items():
+            return (if_type, values.get('nodeid'), 
+                    values.get('address') or values.get('dynamic_index') or
+                    values.get('nicid'))
+    
+    interfaces = data.setdefault('interfaces', [])
+    if key(intf) in [key(subif) for subif in interfaces]:
+        raise EngineCommandFailed('Interface {} already has this sub-interface: {}'
+                                  .format(interface_id, intf))
+    interfaces.append(intf)
+
 def InterfaceFactory(typeof):
     intftype = Registry[typeof]
     if intftype and issubclass(intftype, Interface):
@@ -1151,4 +1400,168 @@ def _interface_helper(data):
     """
     for intf in data['interfaces']:
         for if_type, values in intf.items():
-            return SubInterface.get_subinterface(if_type)(values)
\ No newline at end of file
+            return SubInterface.get_subinterface(if_type)(values)
+
+
+class InterfaceIndex(object):
+    """
+    Index of all interfaces on an engine by interface ID and by VLAN
+    nicid (i.e. '2.100'). The index is built from a single listing of
+    the engine interfaces, then each interface is retrieved concurrently.
+    It is validated against the engine ETag before each lookup and is
+    rebuilt only if the engine has changed. Interface create and save 
+    operations invalidate the index.
+    
+    The index is available from the engine and is used by
+    :meth:`Interface.get`::
+    
+        engine = Engine('master')
+        intf = engine.interface_index.get(1)
+        vlan = engine.interface_index.vlan(1, 100)
+        
+    Interfaces are returned with a copy of the indexed data, so 
+    modifications made before calling save do not alter the index.
+    
+    :param engine: :py:class:`smc.core.engine.Engine`
+    :param int max_workers: maximum number of concurrent requests
+    """
+    def __init__(self, engine, max_workers=DEFAULT_WORKERS):
+        self._engine = engine
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._etag = None
+        self._interfaces = {} # interface_id -> (Meta, etag, json)
+        self._vlans = {} # nicid -> interface_id
+    
+    def invalidate(self):
+        """
+        Discard the index. It is rebuilt on next lookup.
+        
+        :return: None
+        """
+        with self._lock:
+            self._etag = None
+            self._interfaces = {}
+            self._vlans = {}
+    
+    def _is_valid(self):
+        if self._etag is None:
+            return False
+        result = prepared_request(headers={'Etag': self._etag},
+                                  href=self._engine.href).read()
+        return result.code == 304
+    
+    def _build(self):
+        engine = prepared_request(EngineCommandFailed,
+                                  href=self._engine.href).read()
+        listing = prepared_request(EngineCommandFailed,
+                                   href=find_link_by_name('interfaces', 
+                                                          engine.json.get('link'))
+                                   ).read().json or []
+        
+        def hydrate(interface):
+            result = prepared_request(EngineCommandFailed,
+                                      href=interface.get('href')).read()
+            return result.etag, result.json
+        
+        interfaces = {}
+        vlans = {}
+        for result in concurrent_map(hydrate, listing, self.max_workers):
+            if not result.ok:
+                raise result.exception
+            etag, data = result.value
+            interface_id = data.get('interface_id')
+            interfaces[interface_id] = (Meta(href=result.item.get('href'),
+                                             name=result.item.get('name'),
+                                             type=result.item.get('type')),
+                                        etag, data)
+            for vlan in data.get('vlanInterfaces') or []:
+                vlans[vlan.get('interface_id')] = interface_id
+        self._interfaces, self._vlans = interfaces, vlans
+        self._etag = engine.etag
+    
+    def refresh(self):
+        """
+        Rebuild the index if the engine has changed since it was built.
+        
+        :raises: :py:class:`smc.api.exceptions.EngineCommandFailed`
+        :return: self
+        """
+        with self._lock:
+            if not self._is_valid():
+                self._build()
+        return self
+    
+    def _interface(self, interface_id):
+        meta, etag, data = self._interfaces[interface_id]
+        intf = InterfaceFactory(meta.type)(meta=meta, engine=self._engine)
+        intf.add_cache(deepcopy(data), etag)
+        return intf
+    
+    def get(self, interface_id, typeof=None):
+        """
+        Get the top level interface by ID. If a VLAN nicid such as '2.100'
+        is provided, the interface containing the VLAN is returned.
+        
+        :param str|int interface_id: interface ID or VLAN nicid
+        :param str typeof: optionally require interface type, i.e. 
+               'physical_interface'
+        :raises: :py:class:`smc.api.exceptions.EngineCommandFailed` if interface 
+                 not found
+        :return: interface object by type (Physical, Tunnel, etc)
+        """
+        interface_id = str(interface_id)
+        self.refresh()
+        interface_id = self._vlans.get(interface_id, interface_id)
+        if interface_id not in self._interfaces or \
+            (typeof and self._interfaces[interface_id][0].type != typeof):
+            raise EngineCommandFailed('Interface id {} not found'.format(interface_id))
+        return self._interface(interface_id)
+    
+    def vlan(self, interface_id, vlan_id):
+        """
+        Get a VLAN interface. The VLAN references data of its top level 
+        interface; to modify the VLAN, use :meth:`get` and save the top
+        level interface.
+        
+        :param str|int interface_id: top level interface ID
+        :param str|int vlan_id: VLAN ID
+        :raises: :py:class:`smc.api.exceptions.EngineCommandFailed` if VLAN 
+                 not found
+        :return: :py:class:`PhysicalVlanInterface`
+        """
+        nicid = '{}.{}'.format(interface_id, vlan_id)
+        for vlan in self.get(nicid).vlan_interfaces():
+            if vlan.interface_id == nicid:
+                return vlan
+        raise EngineCommandFailed('VLAN {} not found'.format(nicid))
+    
+    def all(self):
+        """
+        All top level interfaces of the engine.
+        
+        :return: list interface object by type
+        """
+        self.refresh()
+        return [self._interface(interface_id)
+                for interface_id in sorted(self._interfaces)]
+    
+    def __contains__(self, interface_id):
+        self.refresh()
+        interface_id = str(interface_id)
+        return interface_id in self._interfaces or interface_id in self._vlans
+    
+    def __len__(self):
+        self.refresh()
+        return len(self._interfaces)
+
+def _invalidate_index(engine):
+    """
+    Invalidate the engine interface index, if one exists, and the
+    resources prefetched by the engine
+    """
+    index = getattr(engine, '_interface_index', None)
+    if index is not None:
+        index.invalidate()
+    if engine is not None:
+        engine._invalidate()
@@ -18,6 +18,12 @@ from smc.api.exceptions import LicenseError, NodeCommandFailed, ResourceNotFound
 from smc.base.model import SubElement, prepared_request
 from collections import namedtuple
 
+#: Single hardware status value, see :py:class:`HardwareStatus`
+HardwareItem = namedtuple('Status', 'label param value')
+
+#: Interface status, see :py:class:`InterfaceStatus`
+InterfaceItem = namedtuple('Status', 'interface_id name status speed mtu port type')
+
 class Node(SubElement):
     """ 
     Node settings to make each engine node controllable individually.
@@ -345,18 +351,44 @@ class Node(SubElement):
  
     def sginfo(self, include_core_files=False,
                include_slapcat_output=False,
-               filename='sginfo.gz'):
+               filename='sginfo.gz', resume=False, progress=None):
         """ 
-        Get the SG Info of the specified node 
+        Get the SG Info of the specified node. The archive is streamed to
+        filename as it is received. With resume, data is written to
+        <filename>.part until complete and calling sginfo again after an
+        interrupted download continues where it stopped, provided the SMC
+        confirms with the ETag or Last-Modified of the first response that
+        the archive is unchanged. Otherwise the download restarts.
+        
+        Show progress of the download::
+        
+            node.sginfo(filename='/tmp/node1.gz',
+                        progress=lambda written, total: print(written, total))
 
         :param include_core_files: flag to include or not core files
         :param include_slapcat_output: flag to include or not slapcat output
+        :param str filename: name of file to save to, including directory path
+        :param bool resume: resume an interrupted download, see above
+        :param progress: callable called with bytes written and total size,
+               total is None if the size is not known
+        :raises: :py:class:`smc.api.exceptions.NodeCommandFailed`
+        :return: str path of file
         """
-        #params = {'include_core_files': include_core_files,
-        #          'include_slapcat_output': include_slapcat_output}
-        #result = prepared_request(href=self._link('sginfo'),
-        #                          filename=filename).read()
-        raise NotImplementedError
+        params = {'include_core_files': include_core_files,
+                  'include_slapcat_output': include_slapcat_output}
+        try:
+            result = prepared_request(NodeCommandFailed,
+                                      href=self._link('sginfo'),
+                                      params=params,
+                                      filename=filename,
+                                      resume=resume,
+                                      progress=progress).read()
+        except ResourceNotFound:
+            raise NodeCommandFailed('SG Info not supported on this node type: {}'
+                                    .format(self.type))
+        except IOError as e:
+            raise NodeCommandFailed('SG Info download failed: {}'.format(e))
+        return result.content
    
     def ssh(self, enable=True, comment=None):
         """
@@ -528,11 +560,10 @@ class HardwareStatus(object):
         """
         totals = []
         for item in self._data.get('items'):
-            t = namedtuple('Status', 'label param value')
             for status in item.get('statuses'):
-                totals.append(t(status.get('label'),
-                                status.get('param'),
-                                status.get('value')))
+                totals.append(HardwareItem(status.get('label'),
+                                           status.get('param'),
+                                           status.get('value')))
         return totals
         
     def __str__(self):
@@ -567,14 +598,13 @@ class InterfaceStatus(object):
         
         :return: namedtuple of interface statuses
         """
-        t = namedtuple('Status', 'interface_id name status speed mtu port type')
-        return t(self._data.get('interface_id'),
-                 self._data.get('name'),
-                 self._data.get('status'),
-                 self._data.get('speed_duplex'),
-                 self._data.get('mtu'),
-                 self._data.get('port'),
-                 self._data.get('capability'))
+        return InterfaceItem(self._data.get('interface_id'),
+                             self._data.get('name'),
+                             self._data.get('status'),
+                             self._data.get('speed_duplex'),
+                             self._data.get('mtu'),
+                             self._data.get('port'),
+                             self._data.get('capability'))
                                
     def __str__(self):
         return '{0}(interface={1},name={2},status={3})'\
@@ -0,0 +1,312 @@
+"""
+Run node commands on many engines, rolling through the nodes of each
+cluster.
+
+Engines are processed concurrently with a bounded number of workers.
+Within a cluster, nodes are commanded one at a time. Before each node is
+commanded, the status of all nodes of the cluster is polled until every
+node is in an acceptable state: nodes already commanded must have reached
+the status expected after the command (i.e. Offline after go_offline)
+and the other nodes must be healthy (Online, Standby or Locked Online).
+For a reboot, the node is first polled until it goes down, as it may
+still report Online for a while after the command. A rolling reboot
+therefore only reboots the next node once the previous node has been
+down, is back and the cluster is healthy. Without rolling, all nodes of
+an engine are commanded first and then waited on concurrently::
+
+    from smc.core.orchestration import NodeCommandOrchestrator
+
+    orchestrator = NodeCommandOrchestrator(engines, 'reboot',
+                                           comment='Monthly reboot',
+                                           max_workers=20, timeout=900,
+                                           max_failures=2)
+    for result in orchestrator.run():
+        print(result)
+
+If a cluster does not reach an acceptable state within ``timeout`` seconds,
+the remaining nodes of the cluster are skipped and the engine is failed.
+Once more than ``max_failures`` engines have failed, or :meth:`abort` is
+called, no further nodes are commanded on any engine.
+"""
+import time
+import logging
+import threading
+from collections import namedtuple
+from smc.core.engine import Engine
+from smc.api.pool import concurrent_map, imap_unordered, PoolResult,\
+    DEFAULT_WORKERS
+
+try:
+    import queue
+except ImportError: #py2
+    import Queue as queue  # @UnresolvedImport
+
+logger = logging.getLogger(__name__)
+
+#: Node statuses considered healthy
+HEALTHY = ('Online', 'Standby', 'Locked Online')
+
+#: Node status expected after each command, None when the command does not
+#: change the node status and no waiting is done
+COMMANDS = {'go_online': ('Online', 'Standby'),
+            'go_offline': ('Offline',),
+            'go_standby': ('Standby',),
+            'lock_online': ('Locked Online',),
+            'lock_offline': ('Locked Offline',),
+            'reboot': HEALTHY,
+            'time_sync': None,
+            'reset_user_db': None}
+
+_DONE = object()
+
+class NodeResult(namedtuple('NodeResult', 'engine node command result message')):
+    """
+    Result of a command on a single node.
+
+    :ivar str engine: name of engine
+    :ivar str node: name of node, None when the engine failed before
+          any node was commanded
+    :ivar str command: name of command
+    :ivar str result: 'succeeded', 'failed' or 'skipped'
+    :ivar str message: failure or skip reason
+    """
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.result == 'succeeded'
+
+    def __str__(self):
+        return '{0} {1}/{2}: {3}{4}'.format(
+            self.command, self.engine, self.node or '', self.result,
+            ', {}'.format(self.message) if self.message else '')
+
+class NodeCommandOrchestrator(object):
+    """
+    Run a node command on the nodes of many engines.
+
+    :param list engines: engine names or :py:class:`smc.core.engine.Engine`
+    :param str command: one of :data:`COMMANDS`
+    :param str comment: comment to audit, for commands that take one
+    :param int max_workers: maximum number of engines processed at once
+    :param bool rolling: command the nodes of a cluster one at a time. If
+           False all nodes of an engine are commanded before waiting
+    :param int timeout: seconds to wait for the cluster to reach an
+           acceptable state before and after each node command
+    :param int settle: seconds to wait after a command before polling the
+           node status
+    :param int poll: seconds between polls of node status
+    :param int max_failures: number of failed engines tolerated before
+           all engines are aborted
+    :raises ValueError: unknown command
+    """
+    def __init__(self, engines, command, comment=None, max_workers=DEFAULT_WORKERS,
+                 rolling=True, timeout=600, settle=10, poll=10, max_failures=0):
+        if command not in COMMANDS:
+            raise ValueError('Unsupported node command: {}, valid commands: {}'
+                             .format(command, sorted(COMMANDS)))
+        self.engines = [engine if isinstance(engine, Engine) else Engine(engine)
+                        for engine in engines]
+        self.command = command
+        self.comment = comment
+        self.max_workers = max_workers
+        self.rolling = rolling
+        self.timeout = timeout
+        self.settle = settle
+        self.poll = poll
+        self.max_failures = max_failures
+        self.results = []
+        self._failed = set()
+        self._lock = threading.Lock()
+        self._abort = threading.Event()
+
+    def abort(self):
+        """
+        Stop commanding nodes. Commands already sent are not undone and
+        nodes not yet commanded are skipped.
+
+        :return: None
+        """
+        self._abort.set()
+
+    @property
+    def aborted(self):
+        """
+        Whether the orchestration was aborted
+
+        :rtype: bool
+        """
+        return self._abort.is_set()
+
+    def _fail(self, engine):
+        with self._lock:
+            self._failed.add(engine)
+            if len(self._failed) > self.max_failures:
+                if not self._abort.is_set():
+                    logger.error('Aborting %s, %s engines failed', self.command,
+                                 len(self._failed))
+                self._abort.set()
+
+    def _execute(self, node):
+        method = getattr(node, self.command)
+        if self.command == 'time_sync':
+            method()
+        else:
+            method(comment=self.comment)
+
+    def _wait(self, nodes, commanded):
+        """
+        Poll node status until commanded nodes have the expected status
+        and all other nodes are healthy. Returns None when done or aborted,
+        otherwise the reason for the timeout.
+        """
+        expected = COMMANDS[self.command]
+        deadline = time.time() + self.timeout
+        while True:
+            waiting = []
+            for index, node in enumerate(nodes):
+                try:
+                    status = node.status().status
+                except Exception as e:
+                    status = 'unavailable ({})'.format(e)
+                if status not in (expected if index < commanded else HEALTHY):
+                    waiting.append('{}: {}'.format(node.name, status))
+            if not waiting:
+                return None
+            if self._abort.is_set():
+                return None
+            if time.time() + self.poll > deadline:
+                return 'Timed out after {} seconds waiting for nodes: {}'.format(
+                    self.timeout, ', '.join(waiting))
+            time.sleep(self.poll)
+
+    def _wait_down(self, node):
+        """
+        Poll node status until a rebooted node is no longer healthy or
+        cannot be reached. The node may still report Online for some time
+        after the reboot command, and waiting for it to be healthy again
+        before it has gone down would move on to the next node too early.
+        Returns None when the node went down or on abort, otherwise the
+        reason for the timeout.
+        """
+        deadline = time.time() + self.timeout
+        while not self._abort.is_set():
+            try:
+                status = node.status().status
+            except Exception:
+                return None
+            if status not in HEALTHY:
+                return None
+            if time.time() + self.poll > deadline:
+                return 'Timed out after {} seconds waiting for node: {} to ' \
+                    'reboot, status: {}'.format(self.timeout, node.name, status)
+            time.sleep(self.poll)
+
+    def _commanded(self, engine, nodes, report):
+        """
+        Report the nodes a command was sent to. For a reboot, the nodes
+        are first waited on to go down, concurrently. Returns the reason of
+        the first failure, None if all succeeded.
+        """
+        failure = None
+        if self.command == 'reboot':
+            waits = concurrent_map(self._wait_down, nodes, len(nodes))
+        else:
+            waits = [PoolResult(node, None, None) for node in nodes]
+        for result in waits:
+            message = result.value if result.ok else str(result.exception)
+            if message is None:
+                report(NodeResult(engine.name, result.item.name, self.command,
+                                  'succeeded', None))
+            else:
+                failure = failure or message
+                report(NodeResult(engine.name, result.item.name, self.command,
+                                  'failed', message))
+        return failure
+
+    def _engine(self, engine, report):
+        nodes = engine.nodes
+        wait = COMMANDS[self.command] is not None
+        failure = None
+        commanded = [] # nodes commanded and not yet reported, if not rolling
+        for index, node in enumerate(nodes):
+            if failure is None and wait and (self.rolling or index == 0):
+                failure = self._wait(nodes, index if self.rolling else 0)
+            if failure is not None or self._abort.is_set():
+                report(NodeResult(engine.name, node.name, self.command,
+                                  'skipped', failure or 'Aborted'))
+                continue
+            try:
+                self._execute(node)
+            except Exception as e:
+                failure = 'Command failed on node: {}'.format(node.name)
+                report(NodeResult(engine.name, node.name, self.command,
+                                  'failed', str(e)))
+                continue
+            if self.rolling:
+                if wait and self.settle:
+                    time.sleep(self.settle)
+                failure = self._commanded(engine, [node], report)
+            else:
+                commanded.append(node)
+        if commanded:
+            if wait and self.settle:
+                time.sleep(self.settle)
+            failure = self._commanded(engine, commanded, report) or failure
+        if failure is None and wait and not self._abort.is_set():
+            failure = self._wait(nodes, len(nodes))
+            if failure is not None:
+                report(NodeResult(engine.name, None, self.command, 'failed', failure))
+        if failure is not None:
+            self._fail(engine.name)
+
+    def run(self):
+        """
+        Run the command. This is a generator yielding a :class:`NodeResult`
+        for each node as engines progress. Engines continue to be processed
+        in the background while results are not consumed; all results are
+        also kept in :attr:`results`.
+
+        :return: generator :class:`NodeResult`
+        """
+        self.results, self._failed = [], set()
+        self._abort.clear()
+        events = queue.Queue()
+
+        def engine(engine):
+            self._engine(engine, events.put)
+
+        def runner():
+            try:
+                for result in imap_unordered(engine, self.engines, self.max_workers):
+                    if not result.ok:
+                        self._fail(result.item.name)
+                        events.put(NodeResult(result.item.name, None, self.command,
+                                              'failed', str(result.exception)))
+            finally:
+                events.put(_DONE)
+
+        thread = threading.Thread(target=runner)
+        thread.daemon = True
+        thread.start()
+        while True:
+            event = events.get()
+            if event is _DONE:
+                break
+            if event.result == 'failed':
+                logger.error('Node command failed: %s', event)
+            self.results.append(event)
+            yield event
+
+    @property
+    def failed(self):
+        """
+        Names of engines where the command or waiting for the cluster failed
+
+        :return: list str
+        """
+        return sorted(self._failed)
+
+    def __repr__(self):
+        return '{0}(command={1},engines={2})'.format(self.__class__.__name__,
+                                                     self.command, len(self.engines))
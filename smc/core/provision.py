@@ -0,0 +1,266 @@
+"""
+Bulk provisioning of layer 3 virtual engines on a master engine.
+
+Each row of the specification describes one interface of a virtual engine;
+rows with the same virtual engine name make up that engine. Shared
+references (master engine, domain, zones, OSPF profile) are resolved once
+for the whole run. Provisioning is then done in three stages:
+
+#. Virtual resources that do not exist yet are created concurrently
+#. VLANs are added to the master engine physical interfaces using an
+   :py:class:`smc.core.interfaces.InterfaceBatch`, one request per physical
+   interface
+#. Virtual engines are created concurrently
+
+Provision from a CSV file::
+
+    import csv
+    from smc.core.provision import VirtualEngineProvisioner
+
+    with open('virtual_engines.csv') as f:
+        rows = list(csv.DictReader(f))
+
+    provisioner = VirtualEngineProvisioner('master', dns=['8.8.8.8'])
+    for result in provisioner.provision(rows):
+        if not result.ok:
+            print(result.item, result.exception)
+
+Row keys are:
+
+* virtual_engine: name of the virtual engine and virtual resource
+* interface_id: master engine physical interface id
+* vlan_id: VLAN id on the master engine physical interface
+* address: ip address of the virtual engine interface
+* network_value: network cidr of the virtual engine interface
+* zone: (optional) zone name or href for the virtual engine interface
+* vfw_id: (optional) virtual resource id; if not provided the next free
+  id on the master engine is used
+* virtual_interface_id: (optional) interface id on the virtual engine,
+  by default interfaces are numbered from 0 in row order
+
+VLANs that already exist and are mapped to the same virtual resource are
+left as is, so a run can be repeated to complete rows that failed.
+"""
+import logging
+from collections import OrderedDict
+import smc.actions.search as search
+from smc.base.model import Meta, prepared_request
+from smc.core.engine import Engine
+from smc.core.engines import Layer3VirtualEngine
+from smc.elements.helpers import zone_helper, domain_helper
+from smc.routing.ospf import OSPFProfile
+from smc.api.pool import concurrent_map, PoolResult, DEFAULT_WORKERS
+from smc.api.exceptions import CreateEngineFailed, EngineCommandFailed,\
+    MissingRequiredInput
+
+logger = logging.getLogger(__name__)
+
+class VirtualEngineProvisioner(object):
+    """
+    Provision many layer 3 virtual engines on a master engine.
+
+    :param master_engine: name of master engine or :py:class:`smc.core.engine.Engine`
+    :param str domain: domain for virtual resources
+    :param list dns: dns addresses for virtual engines
+    :param boolean default_nat: enable default NAT on virtual engines
+    :param int outgoing_intf: virtual engine interface used for outgoing
+           and authentication requests
+    :param boolean show_master_nic: show master engine NIC ids in virtual engines
+    :param boolean enable_ospf: enable OSPF on virtual engines
+    :param str ospf_profile: OSPF profile name, default profile used if not set
+    :param ospf_area: :py:class:`smc.routing.ospf.OSPFArea` or href, added to
+           all virtual engine interfaces if provided
+    :param int max_workers: maximum number of concurrent requests
+    """
+    def __init__(self, master_engine, domain='Shared Domain', dns=None,
+                 default_nat=False, outgoing_intf=0, show_master_nic=False,
+                 enable_ospf=False, ospf_profile=None, ospf_area=None,
+                 max_workers=DEFAULT_WORKERS):
+        self.master_engine = master_engine if isinstance(master_engine, Engine) \
+            else Engine(master_engine)
+        self.domain = domain
+        self.dns = dns
+        self.default_nat = default_nat
+        self.outgoing_intf = outgoing_intf
+        self.show_master_nic = show_master_nic
+        self.enable_ospf = enable_ospf
+        self.ospf_profile = ospf_profile
+        self.ospf_area = ospf_area
+        self.max_workers = max_workers
+
+    def _resolve_zones(self, rows):
+        zones = {}
+        for row in rows:
+            zone = row.get('zone')
+            if zone and zone not in zones:
+                zones[zone] = zone if zone.startswith('http') else zone_helper(zone)
+        return zones
+
+    def _vfw_ids(self, engines, rows, existing):
+        """
+        Virtual resource id for each new virtual engine. Ids of existing
+        virtual resources are only retrieved if an id must be assigned.
+        """
+        vfw_ids = {}
+        for name, indexes in engines.items():
+            for i in indexes:
+                if rows[i].get('vfw_id'):
+                    vfw_ids[name] = int(rows[i].get('vfw_id'))
+                    break
+        missing = [name for name in engines
+                   if name not in vfw_ids and name not in existing]
+        if missing:
+            used = set(vfw_ids.values())
+            for result in concurrent_map(lambda resource: resource.vfw_id,
+                                         existing.values(), self.max_workers):
+                if result.ok and result.value:
+                    used.add(int(result.value))
+            next_id = 1
+            for name in missing:
+                while next_id in used:
+                    next_id += 1
+                vfw_ids[name] = next_id
+                used.add(next_id)
+        return vfw_ids
+
+    def provision(self, rows):
+        """
+        Provision virtual engines from the rows provided. A failure affects
+        only the rows of the virtual engine it belongs to; a virtual engine
+        is not created if any of its rows failed.
+
+        :param list rows: list of dict, see module documentation for keys
+        :raises: :py:class:`smc.api.exceptions.MissingRequiredInput` row is
+                 missing a required key
+        :raises: :py:class:`smc.api.exceptions.LoadEngineFailed` master engine
+                 not found
+        :return: list :py:class:`smc.api.pool.PoolResult` in row order, with value
+                 set to the virtual engine :py:class:`smc.core.engine.Engine`
+        """
+        rows = [dict(row) for row in rows]
+        engines = OrderedDict() # virtual engine name -> row indexes
+        for i, row in enumerate(rows):
+            for key in ('virtual_engine', 'interface_id', 'vlan_id',
+                        'address', 'network_value'):
+                if row.get(key) in (None, ''):
+                    raise MissingRequiredInput('Row {} is missing required value: {}'
+                                               .format(i, key))
+            engines.setdefault(row['virtual_engine'], []).append(i)
+
+        errors = {} # row index -> exception
+        def fail(name, exception):
+            for i in engines[name]:
+                errors.setdefault(i, exception)
+
+        # Shared references, resolved once
+        master = self.master_engine.load()
+        resource = master.virtual_resource
+        domain_ref = domain_helper(self.domain)
+        zones = self._resolve_zones(rows)
+        ospf_profile = None
+        if self.enable_ospf:
+            ospf_profile = OSPFProfile(self.ospf_profile).href if self.ospf_profile \
+                else search.get_ospf_default_profile()
+        virtual_fw = search.element_entry_point('virtual_fw')
+        existing = dict((vr.name, vr) for vr in resource.all())
+        vfw_ids = self._vfw_ids(engines, rows, existing)
+
+        # Existing VLANs, conflicts are found before anything is created
+        vlans = {}
+        for intf in master.interface_index.all():
+            for vlan in intf.data.get('vlanInterfaces') or []:
+                vlans[vlan.get('interface_id')] = vlan.get('virtual_resource_name')
+        for name, indexes in engines.items():
+            for i in indexes:
+                nicid = '{}.{}'.format(rows[i]['interface_id'], rows[i]['vlan_id'])
+                if vlans.get(nicid, name) != name:
+                    errors[i] = EngineCommandFailed('VLAN {} is already used by: {}'
+                                                    .format(nicid, vlans[nicid]))
+
+        # Virtual resources
+        resources = dict((name, vr.href) for name, vr in existing.items())
+        def create_resource(name):
+            return resource.create(name, vfw_ids[name],
+                                   show_master_nic=self.show_master_nic,
+                                   domain_ref=domain_ref)
+        for result in concurrent_map(create_resource,
+                                     [name for name, indexes in engines.items()
+                                      if name not in resources and 
+                                      not any(i in errors for i in indexes)],
+                                     self.max_workers):
+            if result.ok:
+                resources[result.item] = result.value
+            else:
+                fail(result.item, result.exception)
+
+        # VLANs on master engine, one request per physical interface
+        batch = master.physical_interface.batch()
+        queued = {} # physical interface id -> row indexes
+        interfaces = {} # virtual engine name -> virtual engine interfaces
+        for name, indexes in engines.items():
+            interfaces[name] = []
+            for position, i in enumerate(indexes):
+                row = rows[i]
+                virtual_id = position if row.get('virtual_interface_id') in (None, '') \
+                    else int(row['virtual_interface_id'])
+                interfaces[name].append({'interface_id': virtual_id,
+                                         'address': row['address'],
+                                         'network_value': row['network_value'],
+                                         'zone_ref': zones.get(row.get('zone'))})
+                if i in errors or name not in resources:
+                    continue
+                if '{}.{}'.format(row['interface_id'], row['vlan_id']) in vlans:
+                    continue #Already mapped to this virtual resource
+                try:
+                    batch.add_vlan_to_node_interface(row['interface_id'],
+                                                     row['vlan_id'],
+                                                     virtual_mapping=virtual_id,
+                                                     virtual_resource_name=name)
+                    queued.setdefault(str(row['interface_id']), []).append(i)
+                except EngineCommandFailed as e:
+                    errors[i] = e
+        try:
+            batch.commit()
+        except EngineCommandFailed:
+            for result in batch.results:
+                if not result.ok:
+                    for i in queued.get(result.item, []):
+                        errors.setdefault(i, result.exception)
+
+        # Virtual engines
+        def create_engine(name):
+            engine = Layer3VirtualEngine.build(name, resources[name], interfaces[name],
+                                               default_nat=self.default_nat,
+                                               outgoing_intf=self.outgoing_intf,
+                                               domain_server_address=self.dns,
+                                               enable_ospf=self.enable_ospf,
+                                               ospf_profile=ospf_profile)
+            href = prepared_request(CreateEngineFailed,
+                                    href=virtual_fw,
+                                    json=engine).create().href
+            virtual = Engine(name=name, meta=Meta(name=name, href=href,
+                                                  type='virtual_fw'))
+            if self.ospf_area is not None:
+                for interface in virtual.routing.all():
+                    interface.add_ospf_area(self.ospf_area)
+            return virtual
+
+        created = {}
+        ready = []
+        for name, indexes in engines.items():
+            failed = [errors[i] for i in indexes if i in errors]
+            if failed:
+                fail(name, CreateEngineFailed('Virtual engine {} not created: {}'
+                                              .format(name, failed[0])))
+            else:
+                ready.append(name)
+        for result in concurrent_map(create_engine, ready, self.max_workers):
+            if result.ok:
+                created[result.item] = result.value
+            else:
+                logger.error('Failed creating virtual engine: %s, %s',
+                             result.item, result.exception)
+                fail(result.item, result.exception)
+
+        return [PoolResult(row, created.get(row['virtual_engine']), errors.get(i))
+                for i, row in enumerate(rows)]
@@ -2,10 +2,18 @@
 Route module encapsulates functions related to static routing and 
 related configurations on NGFW
 """
+import socket
+import struct
+import logging
+from array import array
 from collections import namedtuple
 from smc.base.model import Element, prepared_request, SubElement, Meta
-from smc.base.util import find_link_by_name
-from smc.api.exceptions import CreateElementFailed
+from smc.base.util import find_link_by_name, ip_to_int, int_to_ip,\
+    network_to_range
+from smc.api.exceptions import CreateElementFailed, FetchElementFailed,\
+    ElementNotFound
+
+logger = logging.getLogger(__name__)
 
 class Routing(SubElement):
     """
@@ -134,9 +142,14 @@ class Routing(SubElement):
     def __repr__(self):
         return str(self)
 
+_route_types = {} # field names -> namedtuple class
+
 def routetuple(d):
     d.pop('cluster_ref', None)
-    routes = namedtuple('Route', d.keys())
+    fields = tuple(d.keys())
+    routes = _route_types.get(fields)
+    if routes is None:
+        routes = _route_types[fields] = namedtuple('Route', fields)
     return routes(**d)
     
 class Routes(object):
@@ -159,9 +172,13 @@ class Routes(object):
     :ivar str route_gateway: The route gateway address
         
     .. note:: Not all attributes may be present.
+    
+    For large route tables, use :py:attr:`table` to obtain a 
+    :class:`RouteTable`.
     """
     def __init__(self, data):
         self._data = data
+        self._table = None
             
     def __iter__(self):
         for route in self._data['routing_monitoring_entry']:
@@ -169,6 +186,383 @@ class Routes(object):
                 
     def all(self):
         return [r for r in iter(self)]
+    
+    @property
+    def table(self):
+        """
+        Columnar representation of the routes
+        
+        :return: :class:`RouteTable`
+        """
+        if self._table is None:
+            self._table = RouteTable.from_json(
+                self._data.get('routing_monitoring_entry') or [])
+        return self._table
+
+class PrefixIndex(object):
+    """
+    Longest prefix match index of IPv4 and IPv6 networks. Networks are
+    kept in one hash table per prefix length; a lookup masks the address
+    for each prefix length present, longest first, so the cost of a
+    lookup depends on the number of distinct prefix lengths and not the
+    number of networks::
+    
+        index = PrefixIndex()
+        index.add('10.0.0.0/8', 'core')
+        index.add('10.1.0.0/16', 'branch')
+        index.lookup('10.1.2.3')    # 'branch'
+    
+    If the same network is added more than once, the first value is kept.
+    """
+    def __init__(self):
+        self._tables = {4: {}, 6: {}} # version -> prefix -> network -> value
+        self._prefixes = {4: [], 6: []} # version -> [(prefix, mask)] longest first
+        self._size = 0
+    
+    def add(self, network, value):
+        """
+        Add a network.
+        
+        :param str network: network in cidr format, an address without
+               prefix is a host
+        :param value: value returned by lookup
+        :raises ValueError: invalid network
+        :return: None
+        """
+        version, start, end = network_to_range(network)
+        bits = 32 if version == 4 else 128
+        self.add_int(version, start, bits - (end - start).bit_length(), value)
+    
+    def add_int(self, version, network, prefix, value):
+        """
+        Add a network given as integer network address and prefix length.
+        
+        :return: None
+        """
+        table = self._tables[version].get(prefix)
+        if table is None:
+            table = self._tables[version][prefix] = {}
+            bits = 32 if version == 4 else 128
+            self._prefixes[version] = sorted(
+                [(p, ((1 << bits) - 1) ^ ((1 << (bits - p)) - 1))
+                 for p in self._tables[version]], reverse=True)
+        if network not in table:
+            table[network] = value
+            self._size += 1
+    
+    def lookup_int(self, version, address):
+        """
+        Longest match for an address given as integer.
+        
+        :return: value or None
+        """
+        tables = self._tables[version]
+        for prefix, mask in self._prefixes[version]:
+            value = tables[prefix].get(address & mask)
+            if value is not None:
+                return value
+        return None
+    
+    def lookup(self, address):
+        """
+        Longest match for an address.
+        
+        :param str address: IPv4 or IPv6 address
+        :raises ValueError: invalid address
+        :return: value or None if no network contains the address
+        """
+        return self.lookup_int(*_address_to_int(address))
+    
+    def lookup_many(self, addresses):
+        """
+        Longest match for each address.
+        
+        :param addresses: iterable of IPv4 or IPv6 addresses
+        :raises ValueError: invalid address
+        :return: list of value or None, in the order of addresses
+        """
+        lookup = self.lookup_int
+        return [lookup(*_address_to_int(address)) for address in addresses]
+    
+    def __len__(self):
+        return self._size
+
+def _address_to_int(address):
+    """
+    Integer value of address with a fast path for IPv4
+    """
+    if address.count('.') == 3: #inet_aton also accepts short forms, i.e. 10.1
+        try:
+            return 4, struct.unpack('!I', socket.inet_aton(address))[0]
+        except (socket.error, struct.error):
+            pass
+    return ip_to_int(address)
+
+#: Route returned from a :class:`RouteTable`
+Route = namedtuple('Route', 'route_network route_netmask route_gateway '
+                   'route_type src_if dst_if')
+
+def _ifid(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return -1
+
+class RouteTable(object):
+    """
+    Route table stored by column. IPv4 network and gateway addresses are
+    kept as integers in arrays, route types as codes and interface IDs as
+    integers, so large tables (i.e. full BGP tables) stay small and can
+    be filtered quickly. IPv6 routes are supported and kept aside by row.
+    
+    Obtain the table from the engine and filter it::
+    
+        table = engine.routing_monitoring.table
+        static = table.filter(route_type='Static')
+        for route in table.filter(dst_if=1, contains='10.1.1.1'):
+            print(route.route_network, route.route_netmask, route.route_gateway)
+    
+    Filters return a new :class:`RouteTable` and can be chained. Export to
+    a pandas DataFrame if pandas is installed::
+    
+        df = table.to_dataframe()
+    
+    Interface IDs that are not provided are stored as -1, a route without
+    a gateway has a gateway of None.
+    """
+    def __init__(self):
+        self.version = array('B')
+        self.network = array('L')
+        self.prefix = array('B')
+        self.gateway_version = array('B') # 0 if no gateway
+        self.gateway = array('L')
+        self.route_type = array('H')
+        self.src_if = array('l')
+        self.dst_if = array('l')
+        self.types = [] # route type by code
+        self._ipv6 = {} # row -> (network, gateway)
+        self._index = None
+    
+    def _type_code(self, route_type):
+        try:
+            return self.types.index(route_type)
+        except ValueError:
+            self.types.append(route_type)
+            return len(self.types) - 1
+    
+    def _append(self, version, network, prefix, gateway_version, gateway,
+                route_type, src_if, dst_if):
+        if version == 6 or gateway_version == 6:
+            self._ipv6[len(self.version)] = (network, gateway)
+            network = 0 if version == 6 else network
+            gateway = 0 if gateway_version == 6 else gateway
+        self.version.append(version)
+        self.network.append(network)
+        self.prefix.append(prefix)
+        self.gateway_version.append(gateway_version)
+        self.gateway.append(gateway)
+        self.route_type.append(route_type)
+        self.src_if.append(src_if)
+        self.dst_if.append(dst_if)
+    
+    @classmethod
+    def from_json(cls, entries):
+        """
+        Build the table from routing monitoring entries. Entries with an
+        invalid network are skipped.
+        
+        :param list entries: routing_monitoring_entry json
+        :return: :class:`RouteTable`
+        """
+        table = cls()
+        codes = {}
+        gateways = {} # address -> (version, int), gateways are few
+        for entry in entries:
+            try:
+                version, start = ip_to_int(entry.get('route_network'))
+                bits = 32 if version == 4 else 128
+                prefix = entry.get('route_netmask')
+                if prefix is None or prefix == '':
+                    prefix = bits
+                elif '.' in str(prefix): #Netmask
+                    prefix = bin(ip_to_int(prefix)[1]).count('1')
+                else:
+                    prefix = int(prefix)
+                if not 0 <= prefix <= bits:
+                    raise ValueError('Invalid prefix')
+                start &= ~((1 << (bits - prefix)) - 1)
+                gateway = entry.get('route_gateway')
+                if gateway not in gateways:
+                    gateways[gateway] = ip_to_int(gateway) if gateway else (0, 0)
+                gateway_version, gateway = gateways[gateway]
+            except (ValueError, AttributeError, TypeError):
+                logger.debug('Skipping invalid route entry: %s', entry)
+                continue
+            route_type = entry.get('route_type')
+            code = codes.get(route_type)
+            if code is None:
+                code = codes[route_type] = table._type_code(route_type)
+            table._append(version, start, prefix, gateway_version, gateway, code,
+                          _ifid(entry.get('src_if')), _ifid(entry.get('dst_if')))
+        return table
+    
+    def __len__(self):
+        return len(self.version)
+    
+    def _network(self, i):
+        return self._ipv6[i][0] if self.version[i] == 6 else self.network[i]
+    
+    def _gateway(self, i):
+        if not self.gateway_version[i]:
+            return None
+        return self._ipv6[i][1] if self.gateway_version[i] == 6 else self.gateway[i]
+    
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        gateway = self._gateway(i)
+        return Route(int_to_ip(self.version[i], self._network(i)),
+                     self.prefix[i],
+                     None if gateway is None else
+                     int_to_ip(self.gateway_version[i], gateway),
+                     self.types[self.route_type[i]],
+                     self.src_if[i] if self.src_if[i] != -1 else None,
+                     self.dst_if[i] if self.dst_if[i] != -1 else None)
+    
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+    
+    def take(self, rows):
+        """
+        New table with the rows given
+        
+        :param list rows: row indexes
+        :return: :class:`RouteTable`
+        """
+        table = RouteTable()
+        table.types = list(self.types)
+        for name in ('version', 'network', 'prefix', 'gateway_version', 'gateway',
+                     'route_type', 'src_if', 'dst_if'):
+            column = getattr(self, name)
+            getattr(table, name).extend(column[i] for i in rows)
+        for new, old in enumerate(rows):
+            if old in self._ipv6:
+                table._ipv6[new] = self._ipv6[old]
+        return table
+    
+    def mask(self, route_type=None, src_if=None, dst_if=None, contains=None,
+             within=None, gateway=None):
+        """
+        Row indexes matching all of the criteria provided. See :meth:`filter`.
+        
+        :return: list int
+        """
+        rows = range(len(self))
+        if route_type is not None:
+            codes = set(i for i, t in enumerate(self.types) if t == route_type)
+            column = self.route_type
+            rows = [i for i in rows if column[i] in codes]
+        if src_if is not None:
+            column = self.src_if
+            rows = [i for i in rows if column[i] == src_if]
+        if dst_if is not None:
+            column = self.dst_if
+            rows = [i for i in rows if column[i] == dst_if]
+        if gateway is not None:
+            version, value = ip_to_int(gateway)
+            rows = [i for i in rows if self.gateway_version[i] == version and
+                    self._gateway(i) == value]
+        if contains is not None:
+            version, value = ip_to_int(contains)
+            bits = 32 if version == 4 else 128
+            rows = [i for i in rows if self.version[i] == version and
+                    self._network(i) >> (bits - self.prefix[i]) == 
+                    value >> (bits - self.prefix[i])]
+        if within is not None:
+            version, start, end = network_to_range(within)
+            rows = [i for i in rows if self.version[i] == version and
+                    start <= self._network(i) <= end and
+                    self.prefix[i] >= (32 if version == 4 else 128) - 
+                    (end - start).bit_length()]
+        return list(rows)
+    
+    def filter(self, route_type=None, src_if=None, dst_if=None, contains=None,
+               within=None, gateway=None):
+        """
+        Routes matching all of the criteria provided.
+        
+        :param str route_type: route type, i.e. 'Static', 'Connected'
+        :param int src_if: source interface ID
+        :param int dst_if: destination interface ID
+        :param str contains: routes whose network contains this address
+        :param str within: routes whose network is within this network (cidr)
+        :param str gateway: routes using this gateway address
+        :raises ValueError: invalid address or network
+        :return: :class:`RouteTable`
+        """
+        return self.take(self.mask(route_type, src_if, dst_if, contains,
+                                   within, gateway))
+    
+    @property
+    def index(self):
+        """
+        Longest prefix match index of the table, built on first use. 
+        Values are row numbers; when several routes have the same network
+        the first one is used.
+        
+        :return: :class:`PrefixIndex`
+        """
+        if self._index is None:
+            index = PrefixIndex()
+            for i in range(len(self)):
+                index.add_int(self.version[i], self._network(i), self.prefix[i], i)
+            self._index = index
+        return self._index
+    
+    def lookup(self, address):
+        """
+        Route used for an address, by longest prefix match.
+        
+        :param str address: IPv4 or IPv6 address
+        :raises ValueError: invalid address
+        :return: :data:`Route` or None if no route matches
+        """
+        row = self.index.lookup(address)
+        return None if row is None else self[row]
+    
+    def lookup_many(self, addresses):
+        """
+        Route used for each address.
+        
+        :param addresses: iterable of IPv4 or IPv6 addresses
+        :raises ValueError: invalid address
+        :return: list :data:`Route` or None, in the order of addresses
+        """
+        routes = {}
+        results = []
+        for row in self.index.lookup_many(addresses):
+            if row is not None and row not in routes:
+                routes[row] = self[row]
+            results.append(None if row is None else routes[row])
+        return results
+    
+    def to_dataframe(self):
+        """
+        Export the table to a pandas DataFrame with one column per
+        :data:`Route` field. Requires pandas.
+        
+        :raises ImportError: pandas is not installed
+        :return: pandas.DataFrame
+        """
+        try:
+            import pandas
+        except ImportError:
+            raise ImportError('pandas is required to export routes to a DataFrame')
+        return pandas.DataFrame(list(self), columns=Route._fields)
+    
+    def __repr__(self):
+        return '{0}(routes={1})'.format(self.__class__.__name__, len(self))
  
 class Antispoofing(SubElement):
     """
@@ -271,4 +665,312 @@ class Antispoofing(SubElement):
                                                 self.level)
     def __repr__(self):
         return str(self)
-        
\ No newline at end of file
+        
+#: Node of a :class:`NodeTree`, data is the node json within the tree
+TreeNode = namedtuple('TreeNode', 'path level name ip href data')
+
+class NodeTree(object):
+    """
+    Flattened view of a nested routing or antispoofing configuration. The
+    tree is retrieved once and every node is indexed by level, name (or
+    interface nic id), ip and element href. Nodes can be added and
+    removed in bulk and all changes are sent in a single update of the
+    tree using the ETag from when it was retrieved.
+    
+    Use :class:`RoutingTree` or :class:`AntispoofingTree`, available from
+    the engine as ``engine.routing_tree`` and ``engine.antispoofing_tree``.
+    
+    :param str href: href of the tree
+    :param dict data: tree json, retrieved if not provided
+    :param str etag: ETag of the tree json
+    """
+    node_key = None
+    
+    def __init__(self, href, data=None, etag=None):
+        self.href = href
+        if data is None:
+            result = prepared_request(FetchElementFailed, href=href).read()
+            data, etag = result.json, result.etag
+        self.data = data
+        self.etag = etag
+        self.changes = 0
+        self._stale = True
+    
+    def _build(self):
+        self._nodes = []
+        self._parents = {} # id(node json) -> parent json
+        self._children = {} # id(node json) -> [TreeNode]
+        self._index = {'level': {}, 'name': {}, 'ip': {}, 'href': {}}
+        self._walk(self.data, ())
+        self._stale = False
+    
+    def _register(self, parent, child, path):
+        node = TreeNode(path, child.get('level'), child.get('name'),
+                        child.get('ip'), child.get('href'), child)
+        self._nodes.append(node)
+        self._parents[id(child)] = parent
+        self._children.setdefault(id(parent), []).append(node)
+        for key in ('level', 'name', 'ip', 'href'):
+            self._index[key].setdefault(getattr(node, key), []).append(node)
+        if child.get('nic_id') is not None:
+            self._index['name'].setdefault(str(child['nic_id']), []).append(node)
+        self._walk(child, path)
+    
+    def _walk(self, parent, path):
+        for i, child in enumerate(parent.get(self.node_key) or []):
+            self._register(parent, child, path + (i,))
+    
+    @property
+    def nodes(self):
+        """
+        All nodes in the tree
+        
+        :return: list :data:`TreeNode`
+        """
+        if self._stale:
+            self._build()
+        return list(self._nodes)
+    
+    def find(self, level=None, name=None, ip=None, href=None, parent=None):
+        """
+        Nodes matching all criteria provided.
+        
+        :param str level: node level, i.e. 'interface', 'network', 'gateway'
+        :param str name: node name or interface nic id, i.e. 'Interface 0' or '0'
+        :param str ip: node ip, i.e. '10.0.0.0/24'
+        :param str href: href of the element referenced by the node
+        :param TreeNode parent: only nodes below this node
+        :return: list :data:`TreeNode`
+        """
+        if self._stale:
+            self._build()
+        criteria = [(key, value) for key, value in (('level', level), 
+                    ('name', None if name is None else str(name)), 
+                    ('ip', ip), ('href', href)) if value is not None]
+        if criteria:
+            candidates = min((self._index[key].get(value, []) 
+                              for key, value in criteria), key=len)
+        else:
+            candidates = self._nodes
+        nodes = []
+        for node in candidates:
+            if level is not None and node.level != level:
+                continue
+            if name is not None and str(name) not in (node.name, 
+                                                      str(node.data.get('nic_id'))):
+                continue
+            if ip is not None and node.ip != ip:
+                continue
+            if href is not None and node.href != href:
+                continue
+            if parent is not None and node.path[:len(parent.path)] != parent.path \
+                    or parent is not None and node.path == parent.path:
+                continue
+            nodes.append(node)
+        return nodes
+    
+    def children(self, node):
+        """
+        Direct children of a node
+        
+        :param TreeNode node: node, or None for the top level
+        :return: list :data:`TreeNode`
+        """
+        if self._stale:
+            self._build()
+        parent = self.data if node is None else node.data
+        return list(self._children.get(id(parent), []))
+    
+    def add(self, node, child):
+        """
+        Add a child node. The change is sent on :meth:`commit`.
+        
+        :param TreeNode node: parent node, or None for the top level
+        :param dict child: json of the node to add
+        :return: None
+        """
+        parent = self.data if node is None else node.data
+        siblings = parent.setdefault(self.node_key, [])
+        siblings.append(child)
+        self.changes += 1
+        if not self._stale:
+            path = () if node is None else node.path
+            self._register(parent, child, path + (len(siblings) - 1,))
+    
+    def remove(self, node):
+        """
+        Remove a node and the nodes below it. The change is sent on
+        :meth:`commit`.
+        
+        :param TreeNode node: node to remove
+        :return: None
+        """
+        if self._stale:
+            self._build()
+        siblings = self._parents[id(node.data)][self.node_key]
+        for i, sibling in enumerate(siblings):
+            if sibling is node.data:
+                del siblings[i]
+                break
+        self.changes += 1
+        self._stale = True
+    
+    def commit(self):
+        """
+        Send all changes in a single update of the tree.
+        
+        :raises: :py:class:`smc.api.exceptions.CreateElementFailed`: update
+                 failed, for example if the tree was modified since it was
+                 retrieved
+        :return: bool True if changes were sent
+        """
+        if not self.changes:
+            return False
+        result = prepared_request(CreateElementFailed,
+                                  href=self.href,
+                                  json=self.data,
+                                  etag=self.etag).update()
+        self.etag = result.etag
+        self.changes = 0
+        return True
+    
+    def __len__(self):
+        return len(self.nodes)
+    
+    def __repr__(self):
+        return '{0}(nodes={1},changes={2})'.format(self.__class__.__name__,
+                                                   len(self), self.changes)
+
+class RoutingTree(NodeTree):
+    """
+    Flattened routing configuration with bulk changes. Add an OSPF area
+    to every IPv4 network of several interfaces with a single update::
+    
+        tree = engine.routing_tree
+        tree.add_ospf_area(area, interfaces=[1, 2, 3])
+        tree.commit()
+    """
+    node_key = 'routing_node'
+    
+    def network_index(self):
+        """
+        Index of the networks directly connected to interfaces, to find
+        the interface an address belongs to::
+        
+            index = engine.routing_tree.network_index()
+            interface = index.lookup('10.0.0.254')
+        
+        :return: :class:`PrefixIndex` with the interface :data:`TreeNode` 
+                 as value
+        """
+        index = PrefixIndex()
+        for interface in self.find(level='interface'):
+            for network in self.children(interface):
+                if network.level == 'network' and network.ip:
+                    try:
+                        index.add(network.ip, interface)
+                    except ValueError:
+                        logger.debug('Skipping invalid routing network: %s', network.ip)
+        return index
+    
+    def add_ospf_area(self, ospf_area, interfaces=None, networks=None,
+                      communication_mode='NOT_FORCED', unicast_ref=None):
+        """
+        Add OSPF area to interface networks. IPv6 networks and networks
+        that already have the area are skipped. See
+        :py:meth:`Routing.add_ospf_area` for the parameters.
+        
+        :param OSPFArea ospf_area: OSPF area instance or href
+        :param list interfaces: interface names or nic ids, all interfaces
+               if not provided
+        :param list networks: only these networks (i.e. '10.0.0.0/24')
+        :param str communication_mode: NOT_FORCED|POINT_TO_POINT|PASSIVE|UNICAST
+        :param str unicast_ref: location ref of host (required for UNICAST)
+        :return: int number of networks changed
+        """
+        if isinstance(ospf_area, Element):
+            ospf_area = ospf_area.href
+        communication_mode = communication_mode.upper()
+        
+        if interfaces is None:
+            targets = self.find(level='interface')
+        else:
+            targets = [node for name in interfaces
+                       for node in self.find(level='interface', name=name)]
+        added = 0
+        for interface in targets:
+            for network in self.children(interface):
+                if network.level != 'network' or ':' in (network.ip or ''):
+                    continue
+                if networks is not None and network.ip not in networks:
+                    continue
+                if any(child.href == ospf_area for child in self.children(network)):
+                    continue
+                node = {'href': ospf_area, 
+                        'communication_mode': communication_mode,
+                        'level': 'gateway'}
+                if communication_mode == 'UNICAST':
+                    node.update(routing_node=[{'href': unicast_ref,
+                                               'level': 'any'}])
+                self.add(network, node)
+                added += 1
+        return added
+
+class AntispoofingTree(NodeTree):
+    """
+    Flattened antispoofing configuration with bulk changes. Add several
+    networks as valid sources on interfaces with a single update::
+    
+        tree = engine.antispoofing_tree
+        tree.add_entries([('Interface 0', Network('net-a')),
+                          ('Interface 1', Network('net-b'))])
+        tree.commit()
+    """
+    node_key = 'antispoofing_node'
+    
+    def add_entries(self, entries):
+        """
+        Add entries below interface nodes. Entries already present on
+        the interface are skipped.
+        
+        :param list entries: tuples of (interface name or nic id, entry),
+               entry is an element or href, see :py:meth:`Antispoofing.add`
+        :raises: :py:class:`smc.api.exceptions.ElementNotFound`: interface not
+                 found in the antispoofing configuration
+        :return: int number of entries added
+        """
+        added = 0
+        for interface, entry in entries:
+            if isinstance(entry, Element):
+                entry = entry.href
+            nodes = self.find(level='interface', name=interface)
+            if not nodes:
+                raise ElementNotFound('Interface: {} not found in antispoofing '
+                                      'configuration'.format(interface))
+            if any(child.href == entry for child in self.children(nodes[0])):
+                continue
+            self.add(nodes[0], {'antispoofing_node': [],
+                                'auto_generated': 'false',
+                                'href': entry,
+                                'level': nodes[0].level,
+                                'validity': 'enable'})
+            added += 1
+        return added
+    
+    def remove_entries(self, entries):
+        """
+        Remove entries added below interface nodes.
+        
+        :param list entries: tuples of (interface name or nic id, entry)
+        :return: int number of entries removed
+        """
+        removed = 0
+        for interface, entry in entries:
+            if isinstance(entry, Element):
+                entry = entry.href
+            for node in self.find(level='interface', name=interface):
+                for child in self.children(node):
+                    if child.href == entry:
+                        self.remove(child)
+                        removed += 1
+        return removed
@@ -0,0 +1,370 @@
+"""
+Sampling of node status over time, for capacity tracking and to detect
+changes such as an interface going down or a configuration status change.
+
+Samples are kept per node and per metric in bounded ring buffers backed
+by arrays that grow with the number of changes. Only changes are stored:
+a sample with the same value as the previous sample of the metric only
+updates the time the metric was last seen. Values are interned, so each
+stored change costs a timestamp and an integer. Interned values are
+reference counted and dropped once the last change using them is
+overwritten. Memory use is bounded by the number of series and the ring
+buffer capacity, regardless of how long sampling runs.
+
+Sample the fleet every minute and report changes::
+
+    from smc.core.sampling import StatusSampler
+
+    sampler = StatusSampler(capacity=1024)
+    for changes in sampler.run(interval=60):
+        for change in changes:
+            print(change)
+
+Query the history::
+
+    history = sampler.history
+    history.value_at(('fw', 'fw node 1'), 'interface.0', timestamp)
+    history.range(('fw', 'fw node 1'), 'status', start, end)
+    history.changes(start=time.time() - 3600, metric='configuration_status')
+
+Metrics recorded for each node are the node status fields (status, state,
+configuration_status, version, installed_policy), 'error' when the
+node status could not be retrieved, 'interface.<id>' for each interface
+status and 'hardware.<name>.<label>.<param>' for each hardware value.
+"""
+import time
+import logging
+from array import array
+from collections import namedtuple
+from smc.core.health import FleetHealth
+
+logger = logging.getLogger(__name__)
+
+#: Node status fields recorded as metrics
+STATUS_METRICS = ('status', 'state', 'configuration_status', 'version',
+                  'installed_policy')
+
+class Change(namedtuple('Change', 'timestamp node metric previous value')):
+    """
+    Change of a metric value.
+
+    :ivar float timestamp: time of the sample showing the change
+    :ivar tuple node: (engine name, node name)
+    :ivar str metric: name of metric
+    :ivar previous: value before the change
+    :ivar value: new value
+    """
+    __slots__ = ()
+
+    def __str__(self):
+        return '{0} {1}/{2} {3}: {4} -> {5}'.format(
+            time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.timestamp)),
+            self.node[0], self.node[1], self.metric, self.previous, self.value)
+
+class RingBuffer(object):
+    """
+    Bounded buffer of (timestamp, value code) pairs in time order. The
+    arrays start empty and double in size as entries are appended, up to
+    capacity, so series with few changes stay small. Once full, each append
+    overwrites the oldest entry.
+
+    :param int capacity: maximum number of entries
+    """
+    __slots__ = ('capacity', 'times', 'values', 'start', 'size')
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.times = array('d')
+        self.values = array('l') # value codes, bounded by the entries stored
+        self.start = 0
+        self.size = 0
+
+    def _grow(self):
+        length = min(max(1, 2 * len(self.times)), self.capacity)
+        extra = length - len(self.times)
+        self.times.extend(array('d', [0.0]) * extra)
+        self.values.extend(array('l', [0]) * extra)
+
+    def append(self, timestamp, value):
+        """
+        Append an entry
+
+        :return: value of the entry overwritten, None if not full
+        """
+        evicted = None
+        if self.size < self.capacity:
+            if self.size == len(self.times):
+                self._grow()
+            index = self.size
+            self.size += 1
+        else:
+            index = self.start
+            evicted = self.values[index]
+            self.start = (self.start + 1) % self.capacity
+        self.times[index] = timestamp
+        self.values[index] = value
+        return evicted
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.size:
+            raise IndexError('Ring buffer index out of range')
+        index = (self.start + i) % self.capacity
+        return self.times[index], self.values[index]
+
+    def __iter__(self):
+        for i in range(self.size):
+            yield self[i]
+
+    def bisect(self, timestamp):
+        """
+        Number of entries with a time less than or equal to timestamp
+        """
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if self.times[(self.start + middle) % self.capacity] <= timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    @property
+    def last(self):
+        return self[self.size - 1] if self.size else None
+
+class StatusHistory(object):
+    """
+    Change history of metrics per node.
+
+    :param int capacity: maximum number of changes kept per node metric
+    """
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self._series = {} # (node, metric) -> RingBuffer
+        self._seen = {} # (node, metric) -> last sample time
+        self._codes = {None: 0}
+        self._values = [None]
+        self._refs = [0] # code -> number of entries using it
+        self._free = [] # codes of values no longer referenced
+
+    def _acquire(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            if self._free:
+                code = self._free.pop()
+                self._values[code] = value
+                self._refs[code] = 0
+            else:
+                code = len(self._values)
+                self._values.append(value)
+                self._refs.append(0)
+            self._codes[value] = code
+        self._refs[code] += 1
+        return code
+
+    def _release(self, code):
+        """
+        Release a code when an entry using it is overwritten. Values no
+        longer referenced by any entry are dropped so the value table is
+        bounded by the number of entries.
+        """
+        self._refs[code] -= 1
+        if code and not self._refs[code]:
+            del self._codes[self._values[code]]
+            self._values[code] = None
+            self._free.append(code)
+
+    def record(self, node, metric, value, timestamp=None):
+        """
+        Record a sample.
+
+        :param tuple node: (engine name, node name)
+        :param str metric: name of metric
+        :param value: sample value, must be hashable
+        :param float timestamp: time of sample, defaults to now
+        :return: :class:`Change` if the value changed, otherwise None. The
+                 first sample of a metric is not a change
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        key = (node, metric)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = RingBuffer(self.capacity)
+        self._seen[key] = timestamp
+        last = series.last
+        if last is not None and self._codes.get(value, -1) == last[1]:
+            return None
+        previous = self._values[last[1]] if last is not None else None
+        evicted = series.append(timestamp, self._acquire(value))
+        if evicted is not None:
+            self._release(evicted)
+        if last is not None:
+            return Change(timestamp, node, metric, previous, value)
+
+    def record_health(self, row, timestamp=None):
+        """
+        Record all metrics of a node health row.
+
+        :param row: :py:class:`smc.core.health.NodeHealth`
+        :param float timestamp: time of sample, defaults to now
+        :return: list :class:`Change`
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        node = (row.engine, row.node)
+        changes = [self.record(node, 'error', row.error, timestamp)]
+        if row.ok: #Keep last known values while the node is unreachable
+            for metric in STATUS_METRICS:
+                changes.append(self.record(node, metric, getattr(row, metric),
+                                           timestamp))
+            for intf in row.interfaces:
+                changes.append(self.record(node, 'interface.{}'.format(intf.interface_id),
+                                           intf.status, timestamp))
+            for hw in row.hardware:
+                changes.append(self.record(node, 'hardware.{}.{}.{}'.format(
+                    hw.name, hw.label, hw.param), hw.value, timestamp))
+        return [change for change in changes if change is not None]
+
+    def nodes(self):
+        """
+        Nodes with recorded samples
+
+        :return: list tuple (engine name, node name)
+        """
+        return sorted(set(node for node, _ in self._series))
+
+    def metrics(self, node):
+        """
+        Metrics recorded for a node
+
+        :param tuple node: (engine name, node name)
+        :return: list str
+        """
+        return sorted(metric for n, metric in self._series if n == node)
+
+    def last_seen(self, node, metric):
+        """
+        Time of the last sample of a metric, changed or not
+
+        :return: float or None
+        """
+        return self._seen.get((node, metric))
+
+    def value_at(self, node, metric, timestamp=None):
+        """
+        Value of a metric at a point in time.
+
+        :param tuple node: (engine name, node name)
+        :param str metric: name of metric
+        :param float timestamp: point in time, defaults to latest
+        :return: value, or None if there is no sample at or before timestamp
+        """
+        series = self._series.get((node, metric))
+        if series is None:
+            return None
+        index = series.size if timestamp is None else series.bisect(timestamp)
+        if not index:
+            return None
+        return self._values[series[index - 1][1]]
+
+    def range(self, node, metric, start=None, end=None):
+        """
+        Values of a metric between start and end. The first entry is the
+        value in effect at start, followed by each change until end.
+
+        :param tuple node: (engine name, node name)
+        :param str metric: name of metric
+        :param float start: start time, defaults to oldest
+        :param float end: end time, defaults to latest
+        :return: list tuple (timestamp, value)
+        """
+        series = self._series.get((node, metric))
+        if series is None:
+            return []
+        first = 0 if start is None else max(series.bisect(start) - 1, 0)
+        last = series.size if end is None else series.bisect(end)
+        return [(series[i][0], self._values[series[i][1]])
+                for i in range(first, last)]
+
+    def changes(self, start=None, end=None, node=None, metric=None):
+        """
+        Changes recorded between start and end, in time order. The first
+        sample of a metric is not a change and is not returned.
+
+        :param float start: start time, defaults to oldest
+        :param float end: end time, defaults to latest
+        :param tuple node: optional node filter
+        :param str metric: optional metric filter, a trailing '*' matches
+               a prefix, i.e. 'interface.*'
+        :return: list :class:`Change`
+        """
+        changes = []
+        for (n, m), series in self._series.items():
+            if node is not None and n != node:
+                continue
+            if metric is not None and m != metric and not \
+                    (metric.endswith('*') and m.startswith(metric[:-1])):
+                continue
+            first = 1 if start is None else max(series.bisect(start - 1e-9), 1)
+            last = series.size if end is None else series.bisect(end)
+            for i in range(first, last):
+                timestamp, code = series[i]
+                changes.append(Change(timestamp, n, m,
+                                      self._values[series[i - 1][1]],
+                                      self._values[code]))
+        changes.sort(key=lambda change: (change.timestamp, change.node, change.metric))
+        return changes
+
+    def __len__(self):
+        return len(self._series)
+
+    def __repr__(self):
+        return '{0}(series={1},capacity={2})'.format(self.__class__.__name__,
+                                                     len(self), self.capacity)
+
+class StatusSampler(object):
+    """
+    Periodically sample node health into a :class:`StatusHistory`.
+
+    :param FleetHealth health: health source, if not provided one is created
+           for all engines
+    :param int capacity: maximum number of changes kept per node metric
+    """
+    def __init__(self, health=None, capacity=1024):
+        self.health = health if health is not None else FleetHealth(ttl=0)
+        self.history = StatusHistory(capacity)
+
+    def sample(self):
+        """
+        Take a health snapshot and record it.
+
+        :return: list :class:`Change`
+        """
+        timestamp = time.time()
+        changes = []
+        for row in self.health.snapshot(force=True):
+            changes.extend(self.history.record_health(row, timestamp))
+        return changes
+
+    def run(self, interval=60, count=None):
+        """
+        Sample every interval seconds. This is a generator yielding the
+        changes of each sample; sampling stops when the generator is
+        closed or after count samples.
+
+        :param int interval: seconds between the start of each sample
+        :param int count: number of samples, None to sample indefinitely
+        :return: generator list :class:`Change`
+        """
+        taken = 0
+        while count is None or taken < count:
+            started = time.time()
+            try:
+                yield self.sample()
+            except Exception as e:
+                logger.error('Failed sampling node status: %s', e)
+            taken += 1
+            if count is None or taken < count:
+                time.sleep(max(0, interval - (time.time() - started)))
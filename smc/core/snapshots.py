@@ -0,0 +1,450 @@
+"""
+Local store of engine policy snapshots for reviewing configuration changes.
+
+Snapshots downloaded from the SMC are zip files. The store keeps each
+member of a snapshot content-addressed by its SHA-1, so a member that is
+unchanged between snapshots, or identical across engines, is stored once.
+A snapshot is recorded as a manifest mapping member names to content
+hashes, and a snapshot already in the store is not downloaded again.
+
+Members are parsed once into normalized structures (dicts, lists and
+strings) and the parsed result is cached by content hash and parser, on
+disk and in memory. Diffs between two snapshots only parse the members whose content
+differs::
+
+    from smc.core.snapshots import SnapshotStore
+
+    store = SnapshotStore('/var/lib/snapshots')
+    store.collect(['fw1', 'fw2'], max_workers=8)
+
+    first, last = store.snapshots('fw1')[-2:]
+    for change in store.diff(first['id'], last['id']):
+        print(change)
+
+Members are parsed based on the file extension: json as json, xml into
+nested dicts with attributes prefixed by '@' and text under '#text', and
+other members as a list of lines. Lists of dicts having unique names are
+normalized into dicts keyed by name so that changes are reported by name
+instead of by position.
+
+A snapshot member can also be compared to the current engine json
+with :meth:`SnapshotStore.diff_live`.
+"""
+import os
+import json
+import time
+import zlib
+import shutil
+import hashlib
+import logging
+import zipfile
+import tempfile
+import threading
+import xml.etree.ElementTree as ElementTree
+from collections import namedtuple
+from smc.core.engine import Engine
+from smc.api.pool import concurrent_map, DEFAULT_WORKERS
+
+logger = logging.getLogger(__name__)
+
+#: Keys ignored when normalizing json, these change without a change in
+#: configuration
+VOLATILE_KEYS = ('link', 'key', 'read_only', 'system')
+
+class Change(namedtuple('Change', 'path action old new')):
+    """
+    Difference between two structures.
+
+    :ivar tuple path: keys and list positions from the root to the change,
+          the first item is the member name
+    :ivar str action: 'added', 'removed' or 'changed'
+    :ivar old: previous value, None if added
+    :ivar new: new value, None if removed
+    """
+    __slots__ = ()
+
+    def __str__(self):
+        path = '/'.join(str(key) for key in self.path)
+        if self.action == 'added':
+            return '+ {0}: {1}'.format(path, self.new)
+        elif self.action == 'removed':
+            return '- {0}: {1}'.format(path, self.old)
+        return '~ {0}: {1} -> {2}'.format(path, self.old, self.new)
+
+def _xml(element):
+    node = dict(('@' + key, value) for key, value in element.attrib.items())
+    for child in element:
+        value = _xml(child)
+        if child.tag in node:
+            if not isinstance(node[child.tag], list):
+                node[child.tag] = [node[child.tag]]
+            node[child.tag].append(value)
+        else:
+            node[child.tag] = value
+    text = (element.text or '').strip()
+    if text:
+        if not node:
+            return text
+        node['#text'] = text
+    return node
+
+def normalize(data, ignore=VOLATILE_KEYS):
+    """
+    Normalize a parsed structure for comparison. Keys in ignore are
+    removed from dicts and lists of dicts with unique names are converted
+    to dicts keyed by name.
+
+    :param data: dict, list or value
+    :param tuple ignore: dict keys to remove
+    :return: normalized structure
+    """
+    if isinstance(data, dict):
+        return dict((key, normalize(value, ignore)) for key, value in data.items()
+                    if key not in ignore)
+    if isinstance(data, list):
+        items = [normalize(item, ignore) for item in data]
+        names = [item.get('name', item.get('@name')) for item in items
+                 if isinstance(item, dict)]
+        if names and len(names) == len(items) and None not in names and \
+                len(set(names)) == len(names):
+            return dict(zip(names, items))
+        return items
+    return data
+
+def parser(name):
+    """
+    Parser used for a snapshot member, selected by its extension.
+
+    :param str name: name of member
+    :return: 'json', 'xml' or 'text'
+    """
+    extension = os.path.splitext(name)[1].lower()
+    return {'.json': 'json', '.xml': 'xml'}.get(extension, 'text')
+
+def parse(name, content):
+    """
+    Parse a snapshot member into a normalized structure.
+
+    :param str name: name of member, the extension selects the parser
+    :param bytes content: content of member
+    :return: normalized structure
+    """
+    kind = parser(name)
+    try:
+        if kind == 'json':
+            return normalize(json.loads(content.decode('utf-8')))
+        elif kind == 'xml':
+            root = ElementTree.fromstring(content)
+            return normalize({root.tag: _xml(root)}, ())
+    except (ValueError, SyntaxError) as e: #xml ParseError is a SyntaxError
+        logger.debug('Failed parsing snapshot member: %s, %s', name, e)
+    return content.decode('utf-8', 'replace').splitlines()
+
+def diff(old, new, path=()):
+    """
+    Structural differences between two normalized structures. Dicts are
+    compared by key and lists by position.
+
+    :param old: previous structure
+    :param new: new structure
+    :param tuple path: path prefix of the returned changes
+    :return: list :class:`Change`
+    """
+    if old == new:
+        return []
+    if isinstance(old, dict) and isinstance(new, dict):
+        changes = []
+        for key in sorted(set(old) | set(new), key=str):
+            if key not in new:
+                changes.append(Change(path + (key,), 'removed', old[key], None))
+            elif key not in old:
+                changes.append(Change(path + (key,), 'added', None, new[key]))
+            else:
+                changes.extend(diff(old[key], new[key], path + (key,)))
+        return changes
+    if isinstance(old, list) and isinstance(new, list):
+        changes = []
+        for index in range(max(len(old), len(new))):
+            if index >= len(new):
+                changes.append(Change(path + (index,), 'removed', old[index], None))
+            elif index >= len(old):
+                changes.append(Change(path + (index,), 'added', None, new[index]))
+            else:
+                changes.extend(diff(old[index], new[index], path + (index,)))
+        return changes
+    return [Change(path, 'changed', old, new)]
+
+def _created_order(manifest):
+    """
+    Sort key of a manifest: SMC creation time, numeric id at the end of
+    the snapshot href, then the time it was stored
+    """
+    created = manifest.get('created')
+    href = manifest.get('href') or ''
+    number = href.rstrip('/').rsplit('/', 1)[-1]
+    return (created is None, created or 0,
+            int(number) if number.isdigit() else -1, manifest['stored_at'])
+
+class SnapshotStore(object):
+    """
+    Content-addressed store of engine snapshots in a directory. Member
+    content is kept compressed under ``objects``, parsed members under
+    ``parsed`` and snapshot manifests under ``snapshots``.
+
+    :param str directory: directory of the store, created if needed
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        for name in ('objects', 'parsed', 'snapshots'):
+            path = os.path.join(directory, name)
+            if not os.path.isdir(path):
+                os.makedirs(path)
+        self._lock = threading.Lock()
+        self._parsed = {} # (content hash, parser) -> normalized structure
+        self._manifests = None # id -> manifest
+
+    def _path(self, kind, name):
+        return os.path.join(self.directory, kind, name)
+
+    def _load(self):
+        if self._manifests is None:
+            manifests = {}
+            for name in os.listdir(os.path.join(self.directory, 'snapshots')):
+                if name.endswith('.json'):
+                    with open(self._path('snapshots', name)) as f:
+                        manifest = json.load(f)
+                    manifests[manifest['id']] = manifest
+            self._manifests = manifests
+        return self._manifests
+
+    def _put(self, content):
+        digest = hashlib.sha1(content).hexdigest()
+        path = self._path('objects', digest)
+        if not os.path.exists(path):
+            temp = path + '.tmp{}'.format(threading.current_thread().ident)
+            with open(temp, 'wb') as f:
+                f.write(zlib.compress(content))
+            try:
+                os.rename(temp, path)
+            except OSError: #Same content written concurrently
+                os.remove(temp)
+        return digest
+
+    def add(self, filename, engine, name=None, href=None, created=None):
+        """
+        Add a snapshot zip file to the store. Members already in the store
+        are not stored again.
+
+        :param str filename: snapshot zip file
+        :param str engine: name of engine the snapshot is from
+        :param str name: name of snapshot, defaults to the file name
+        :param str href: href of the snapshot on the SMC
+        :param created: creation time of the snapshot reported by the SMC
+        :raises: IOError, zipfile.BadZipfile if the file is not a zip file
+        :return: manifest of snapshot as dict with id, engine, name, href,
+                 created, stored_at and members (member name -> content hash)
+        """
+        members = {}
+        with zipfile.ZipFile(filename) as archive:
+            for info in archive.infolist():
+                if not info.filename.endswith('/'):
+                    members[info.filename] = self._put(archive.read(info))
+        key = json.dumps([engine, name, href, sorted(members.items())])
+        manifest = {'id': hashlib.sha1(key.encode('utf-8')).hexdigest()[:16],
+                    'engine': engine,
+                    'name': name or os.path.basename(filename),
+                    'href': href,
+                    'created': created,
+                    'stored_at': time.time(),
+                    'members': members}
+        with self._lock:
+            manifests = self._load()
+            if manifest['id'] not in manifests:
+                with open(self._path('snapshots', manifest['id'] + '.json'), 'w') as f:
+                    json.dump(manifest, f)
+                manifests[manifest['id']] = manifest
+            return manifests[manifest['id']]
+
+    def get(self, snapshot_id):
+        """
+        Manifest of a snapshot
+
+        :raises: KeyError if the snapshot is not in the store
+        :return: dict
+        """
+        with self._lock:
+            return self._load()[snapshot_id]
+
+    def snapshots(self, engine=None):
+        """
+        Manifests of stored snapshots, oldest first. Snapshots are ordered
+        by their creation time on the SMC, then by the id in their href, as
+        snapshots are not necessarily stored in the order they were created.
+        The time they were stored only orders snapshots added from files.
+
+        :param str engine: only snapshots of this engine
+        :return: list dict
+        """
+        with self._lock:
+            manifests = list(self._load().values())
+        return sorted((manifest for manifest in manifests
+                       if engine is None or manifest['engine'] == engine),
+                      key=_created_order)
+
+    def _stored_hrefs(self):
+        return set(manifest['href'] for manifest in self.snapshots()
+                   if manifest['href'])
+
+    def download(self, snapshot, engine):
+        """
+        Download a snapshot from the SMC and add it to the store, unless a
+        snapshot with the same href is already stored.
+
+        :param snapshot: :py:class:`smc.core.resource.Snapshot`
+        :param str engine: name of engine the snapshot is from
+        :raises: :py:class:`smc.api.exceptions.EngineCommandFailed`
+        :return: manifest as dict
+        """
+        for manifest in self.snapshots(engine):
+            if manifest['href'] == snapshot.href:
+                return manifest
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, 'snapshot.zip')
+            snapshot.download(filename)
+            return self.add(filename, engine, snapshot.name, snapshot.href,
+                            snapshot.data.get('creation_date'))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def collect(self, engines, max_workers=DEFAULT_WORKERS):
+        """
+        Download the snapshots of engines that are not yet in the store.
+        Engines are processed concurrently.
+
+        :param list engines: engine names or :py:class:`smc.core.engine.Engine`
+        :param int max_workers: maximum number of concurrent downloads
+        :return: dict engine name -> list of manifests added, or the
+                 exception if the snapshots could not be listed
+        """
+        stored = self._stored_hrefs()
+        engines = [engine if isinstance(engine, Engine) else Engine(engine)
+                   for engine in engines]
+        work = []
+        results = {}
+        for result in concurrent_map(lambda engine: engine.snapshots(),
+                                     engines, max_workers):
+            name = result.item.name
+            if not result.ok:
+                logger.error('Failed listing snapshots for engine: %s, %s',
+                             name, result.exception)
+                results[name] = result.exception
+                continue
+            results[name] = []
+            work.extend((name, snapshot) for snapshot in result.value
+                        if snapshot.href not in stored)
+
+        for result in concurrent_map(lambda item: self.download(item[1], item[0]),
+                                     work, max_workers):
+            name, snapshot = result.item
+            if result.ok:
+                results[name].append(result.value)
+            else:
+                logger.error('Failed downloading snapshot: %s for engine: %s, %s',
+                             snapshot.name, name, result.exception)
+        return results
+
+    def content(self, snapshot_id, member):
+        """
+        Content of a snapshot member
+
+        :param str snapshot_id: id of snapshot
+        :param str member: name of member
+        :raises: KeyError if the snapshot or member does not exist
+        :return: bytes
+        """
+        digest = self.get(snapshot_id)['members'][member]
+        with open(self._path('objects', digest), 'rb') as f:
+            return zlib.decompress(f.read())
+
+    def _parse(self, member, digest):
+        # The same content can be stored under names parsed differently
+        key = (digest, parser(member))
+        parsed = self._parsed.get(key)
+        if parsed is None:
+            path = self._path('parsed', '{}.{}.json'.format(*key))
+            if os.path.exists(path):
+                with open(path) as f:
+                    parsed = json.load(f)
+            else:
+                with open(self._path('objects', digest), 'rb') as f:
+                    parsed = parse(member, zlib.decompress(f.read()))
+                temp = path + '.tmp{}'.format(threading.current_thread().ident)
+                with open(temp, 'w') as f:
+                    json.dump(parsed, f)
+                try:
+                    os.rename(temp, path)
+                except OSError: #Same member parsed concurrently
+                    os.remove(temp)
+            self._parsed[key] = parsed
+        return parsed
+
+    def parsed(self, snapshot_id, member=None):
+        """
+        Normalized structure of a snapshot, parsed once per distinct
+        member content.
+
+        :param str snapshot_id: id of snapshot
+        :param str member: name of member, all members by default
+        :raises: KeyError if the snapshot or member does not exist
+        :return: structure of member, or dict member name -> structure
+        """
+        members = self.get(snapshot_id)['members']
+        if member is not None:
+            return self._parse(member, members[member])
+        return dict((name, self._parse(name, digest))
+                    for name, digest in members.items())
+
+    def diff(self, old_id, new_id):
+        """
+        Changes between two stored snapshots. Members with identical
+        content are not parsed or compared.
+
+        :param str old_id: id of previous snapshot
+        :param str new_id: id of new snapshot
+        :raises: KeyError if a snapshot does not exist
+        :return: list :class:`Change`
+        """
+        old, new = self.get(old_id)['members'], self.get(new_id)['members']
+        changes = []
+        for member in sorted(set(old) | set(new)):
+            if member not in new:
+                changes.append(Change((member,), 'removed',
+                                      self._parse(member, old[member]), None))
+            elif member not in old:
+                changes.append(Change((member,), 'added', None,
+                                      self._parse(member, new[member])))
+            elif old[member] != new[member]:
+                changes.extend(diff(self._parse(member, old[member]),
+                                    self._parse(member, new[member]), (member,)))
+        return changes
+
+    def diff_live(self, snapshot_id, member, data):
+        """
+        Changes between a snapshot member and current configuration, such
+        as the engine json. The current data is normalized the same way as
+        json members.
+
+        :param str snapshot_id: id of snapshot
+        :param str member: name of member to compare
+        :param data: current configuration, i.e. ``engine.data``, or an
+               :py:class:`smc.core.engine.Engine` to use its json
+        :raises: KeyError if the snapshot or member does not exist
+        :return: list :class:`Change`
+        """
+        if isinstance(data, Engine):
+            data = data.data
+        return diff(self.parsed(snapshot_id, member), normalize(data), (member,))
+
+    def __repr__(self):
+        return '{0}(directory={1})'.format(self.__class__.__name__, self.directory)
@@ -0,0 +1,192 @@
+"""
+Client side analysis of network elements to find duplicate, overlapping
+and unused elements. This is an alternative to the SMC search_duplicate
+and search_unused entry points (see :py:mod:`smc.actions.search`) that
+works from a local :py:class:`smc.elements.inventory.ElementInventory`
+snapshot and can be filtered and re-run cheaply.
+
+Results are cached and only recomputed after a refresh of the inventory
+shows that an element has been added, removed or modified (by ETag).
+
+Find duplicate and unused network elements::
+
+    from smc.elements.analysis import ElementAnalyzer
+
+    analyzer = ElementAnalyzer().refresh()
+    for duplicates in analyzer.duplicates():
+        print([element.name for element in duplicates])
+    for element in analyzer.unused():
+        print(element.name)
+
+Overlapping elements, for example a host that is within a network or
+two address ranges that intersect::
+
+    for first, second in analyzer.overlaps():
+        print(first.name, second.name)
+"""
+import heapq
+import logging
+import itertools
+from smc.base.util import ip_to_int, network_to_range, range_to_ints
+from smc.elements.inventory import ElementInventory
+from smc.administration.references import ReferenceGraph
+from smc.api.pool import DEFAULT_WORKERS
+
+logger = logging.getLogger(__name__)
+
+#: Element types analyzed by default
+NETWORK_ELEMENT_TYPES = ('host', 'network', 'address_range', 'router', 'group')
+
+def address_intervals(typeof, data):
+    """
+    Address intervals an element covers, based on the element json.
+    Hosts and routers provide one interval for each address, including
+    secondary addresses.
+
+    :param str typeof: element type
+    :param dict data: element json
+    :return: list tuple (version, start, end)
+    """
+    intervals = []
+    try:
+        if typeof in ('host', 'router'):
+            for address in [data.get('address'), data.get('ipv6_address')] + \
+                    list(data.get('secondary') or []):
+                if address:
+                    version, value = ip_to_int(address)
+                    intervals.append((version, value, value))
+        elif typeof == 'network':
+            for network in (data.get('ipv4_network'), data.get('ipv6_network')):
+                if network:
+                    intervals.append(network_to_range(network))
+        elif typeof == 'address_range':
+            if data.get('ip_range'):
+                intervals.append(range_to_ints(data.get('ip_range')))
+    except ValueError as e:
+        logger.debug('Skipping invalid address for element: %s, %s',
+                     data.get('name'), e)
+    return intervals
+
+class ElementAnalyzer(object):
+    """
+    Analyze an element inventory for duplicates, overlaps and unused
+    elements.
+
+    :param ElementInventory inventory: inventory to analyze. If not provided,
+           an inventory of :data:`NETWORK_ELEMENT_TYPES` is used
+    :param ReferenceGraph references: reference graph used to determine
+           unused elements. If not provided one is created and collected
+           on demand
+    :param int max_workers: maximum number of concurrent requests
+    """
+    def __init__(self, inventory=None, references=None,
+                 max_workers=DEFAULT_WORKERS):
+        self.inventory = inventory if inventory is not None else \
+            ElementInventory(NETWORK_ELEMENT_TYPES, max_workers)
+        self.references = references
+        self.max_workers = max_workers
+        self._results = {} # name -> (fingerprint, result)
+
+    def refresh(self):
+        """
+        Refresh the underlying inventory. Cached results are recomputed
+        on next access only if the inventory changed.
+
+        :return: self
+        """
+        self.inventory.refresh()
+        return self
+
+    def _cached(self, name, function):
+        fingerprint = self.inventory.fingerprint
+        cached = self._results.get(name)
+        if cached is None or cached[0] != fingerprint:
+            cached = self._results[name] = (fingerprint, function())
+        return cached[1]
+
+    def _index(self):
+        """
+        Build the hash index (exact address match) and the sorted interval
+        list used for overlap detection.
+        """
+        def build():
+            exact = {}
+            intervals = []
+            for meta in self.inventory.meta():
+                data = self.inventory.json(meta.href)
+                if meta.type == 'group':
+                    key = ('group', frozenset(data.get('element') or ()))
+                    exact.setdefault(key, []).append(meta)
+                    continue
+                for interval in set(address_intervals(meta.type, data)):
+                    exact.setdefault(interval, []).append(meta)
+                    intervals.append(interval + (meta,))
+            intervals.sort(key=lambda i: (i[0], i[1], -i[2]))
+            return exact, intervals
+        return self._cached('index', build)
+
+    def duplicates(self, typeof=None):
+        """
+        Elements that have exactly the same address value, for example a
+        host and a router using the same address or a network defined
+        twice. Groups are duplicates when their members are the same.
+
+        :param str typeof: only return duplicate sets including this type
+        :return: list of list Meta, each list is a set of duplicates
+        """
+        def build():
+            return [sorted(set(metas), key=lambda m: m.href)
+                    for key, metas in self._index()[0].items()
+                    if len(set(metas)) > 1 and
+                    (key[0] != 'group' or key[1])] #Ignore empty groups
+        return [metas for metas in self._cached('duplicates', build)
+                if typeof is None or any(m.type == typeof for m in metas)]
+
+    def overlaps(self, typeof=None):
+        """
+        Pairs of elements with overlapping, but not identical, address
+        values. For example a host address that falls within a network,
+        or two ranges that intersect. Intervals are sorted by start address
+        and swept once, keeping the currently open intervals in a heap.
+
+        :param str typeof: only return pairs including this type
+        :return: list of tuple (Meta, Meta), lowest start address first
+        """
+        def build():
+            pairs = set()
+            active = []
+            version = None
+            counter = itertools.count() #Heap tie breaker
+            for v, start, end, meta in self._index()[1]:
+                if v != version:
+                    version, active = v, []
+                while active and active[0][0] < start:
+                    heapq.heappop(active)
+                for a_end, a_start, _, a_meta in active:
+                    if a_meta.href == meta.href or \
+                            (a_start == start and a_end == end):
+                        continue
+                    pairs.add((a_meta, meta))
+                heapq.heappush(active, (end, start, next(counter), meta))
+            return sorted(pairs, key=lambda p: (p[0].href, p[1].href))
+        return [pair for pair in self._cached('overlaps', build)
+                if typeof is None or typeof in (pair[0].type, pair[1].type)]
+
+    def unused(self, typeof=None):
+        """
+        Elements in the inventory that are not referenced by any other
+        element. References are collected concurrently the first time
+        and again only when the inventory changes.
+
+        :param str typeof: optional element type filter
+        :return: list Meta
+        """
+        def build():
+            if self.references is None:
+                self.references = ReferenceGraph()
+            self.references.collect(self.inventory.meta(), self.max_workers)
+            return [meta for meta in self.inventory.meta()
+                    if meta.href in self.references and
+                    not self.references.is_used(meta.href)]
+        return [meta for meta in self._cached('unused', build)
+                if typeof is None or meta.type == typeof]
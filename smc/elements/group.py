@@ -70,11 +70,11 @@ class Group(GroupMixin, Element):
         """
         comment = None if comment is None else comment
         members = [] if members is None else members
-        cls.json = {'name': name,
-                    'element': members,
-                    'comment': comment}
+        json = {'name': name,
+                'element': members,
+                'comment': comment}
         
-        return ElementCreator(cls)
+        return ElementCreator(cls, json)
 
 class ServiceGroup(GroupMixin, Element):
     """ 
@@ -106,11 +106,11 @@ class ServiceGroup(GroupMixin, Element):
         """
         comment = comment if comment else ''
         elements = [] if element is None else element
-        cls.json = {'name': name,
-                    'element': elements,
-                    'comment': comment}
+        json = {'name': name,
+                'element': elements,
+                'comment': comment}
         
-        return ElementCreator(cls)
+        return ElementCreator(cls, json)
 
 class TCPServiceGroup(GroupMixin, Element):
     """ 
@@ -139,11 +139,11 @@ class TCPServiceGroup(GroupMixin, Element):
         """
         comment = comment if comment else ''
         elements = [] if element is None else element
-        cls.json = {'name': name,
-                    'element': elements,
-                    'comment': comment}
+        json = {'name': name,
+                'element': elements,
+                'comment': comment}
         
-        return ElementCreator(cls)
+        return ElementCreator(cls, json)
 
 class UDPServiceGroup(GroupMixin, Element):
     """ 
@@ -173,11 +173,11 @@ class UDPServiceGroup(GroupMixin, Element):
         """
         comment = comment if comment else ''
         elements = [] if element is None else element
-        cls.json = {'name': name,
-                    'element': elements,
-                    'comment': comment}
+        json = {'name': name,
+                'element': elements,
+                'comment': comment}
         
-        return ElementCreator(cls)
+        return ElementCreator(cls, json)
 
 class IPServiceGroup(GroupMixin, Element):
     """ 
@@ -202,11 +202,11 @@ class IPServiceGroup(GroupMixin, Element):
         """
         comment = comment if comment else ''
         elements = [] if element is None else element
-        cls.json = {'name': name,
-                    'element': elements,
-                    'comment': comment}
+        json = {'name': name,
+                'element': elements,
+                'comment': comment}
         
-        return ElementCreator(cls)
+        return ElementCreator(cls, json)
     
 class SecurityGroup(Element):
     pass
@@ -0,0 +1,241 @@
+"""
+Inventory provides a local snapshot of all elements of one or more
+element types. The snapshot is built from a single listing request per
+element type; each listed element is then retrieved concurrently to
+obtain its full json and ETag.
+
+When the inventory is refreshed, elements already in the snapshot are
+retrieved conditionally using their ETag. Elements that have not changed
+on the SMC are not transferred again, and elements that no longer exist
+are removed. The inventory can be saved to disk so that this also works
+between runs.
+
+Take a snapshot of hosts and networks::
+
+    from smc.elements.inventory import ElementInventory
+
+    inventory = ElementInventory(['host', 'network']).refresh()
+    for host in inventory.elements('host'):
+        print(host.name, host.address)
+
+Re-use a snapshot from a previous run::
+
+    inventory = ElementInventory.load('inventory.json').refresh()
+    ....
+    inventory.save('inventory.json')
+"""
+import json
+import logging
+import hashlib
+import smc.actions.search as search
+from smc.base.model import Meta, prepared_request
+from smc.base.resource import Registry
+from smc.api.pool import concurrent_map, DEFAULT_WORKERS
+from smc.api.exceptions import FetchElementFailed, UnsupportedEntryPoint
+from smc.base.util import unicode_to_bytes
+
+logger = logging.getLogger(__name__)
+
+def _typeof(element_type):
+    """
+    Element type can be the entry point name or the element class
+    """
+    return getattr(element_type, 'typeof', element_type)
+
+class ElementInventory(object):
+    """
+    Local snapshot of elements by element type.
+
+    :param list types: element entry point names (i.e. 'host') or
+           element classes with a typeof attribute
+    :param int max_workers: maximum number of concurrent requests
+    :ivar dict errors: href -> exception for elements that could not be retrieved
+    """
+    def __init__(self, types, max_workers=DEFAULT_WORKERS):
+        self.types = [_typeof(t) for t in types]
+        self.max_workers = max_workers
+        self._entries = {} # href -> (meta, etag, json)
+        self.errors = {}
+
+    def _list(self, typeof):
+        href = search.element_entry_point(typeof)
+        if not href:
+            raise UnsupportedEntryPoint('Entry point: {} not found in this '
+                                        'version of the SMC API'.format(typeof))
+        result = prepared_request(FetchElementFailed, href=href).read()
+        return [Meta(href=item.get('href'), name=item.get('name'),
+                     type=item.get('type', typeof))
+                for item in result.json or []]
+
+    def _hydrate(self, meta):
+        """
+        Retrieve element json. If the element is cached, send the ETag
+        and keep the cached json if the server indicates no changes.
+        """
+        cached = self._entries.get(meta.href)
+        if cached and cached[1]:
+            result = prepared_request(FetchElementFailed,
+                                      headers={'Etag': cached[1]},
+                                      href=meta.href).read()
+            if result.code == 304:
+                return meta, cached[1], cached[2]
+        else:
+            result = prepared_request(FetchElementFailed,
+                                      href=meta.href).read()
+        return meta, result.etag, result.json
+
+    def refresh(self, types=None, revalidate=True):
+        """
+        Refresh the inventory. A listing is done for each element type and
+        elements are retrieved concurrently. Unchanged elements are
+        validated by ETag only.
+
+        If revalidate is False, elements already in the inventory are not
+        retrieved again and only the listing requests are made. Additions
+        and removals are still detected, but modifications made to existing
+        elements since the last refresh are not. Use :meth:`invalidate` for
+        elements known to have changed.
+
+        :param list types: optionally restrict the refresh to these types
+        :param bool revalidate: revalidate cached elements (default: True)
+        :raises: :py:class:`smc.api.exceptions.FetchElementFailed`: listing failed
+        :return: self
+        """
+        types = [_typeof(t) for t in types] if types else self.types
+        listed = []
+        for typeof in types:
+            listed.extend(self._list(typeof))
+
+        seen = set(meta.href for meta in listed)
+        for href, entry in list(self._entries.items()):
+            if entry[0].type in types and href not in seen:
+                del self._entries[href]
+
+        if not revalidate:
+            listed = [meta for meta in listed if meta.href not in self._entries]
+
+        for result in concurrent_map(self._hydrate, listed, self.max_workers):
+            if result.ok:
+                self.errors.pop(result.item.href, None)
+                self._entries[result.item.href] = result.value
+            else:
+                logger.error('Failed retrieving element: %s, %s',
+                             unicode_to_bytes(result.item.name), result.exception)
+                self.errors[result.item.href] = result.exception
+        return self
+
+    def invalidate(self, href):
+        """
+        Remove an element from the inventory cache. The element is
+        retrieved again on the next refresh if it still exists.
+
+        :param str href: href of element
+        :return: None
+        """
+        self._entries.pop(href, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, href):
+        return href in self._entries
+
+    def meta(self, typeof=None):
+        """
+        Meta data for elements in the inventory
+
+        :param str typeof: optional element type filter
+        :return: list Meta
+        """
+        typeof = _typeof(typeof)
+        return [entry[0] for entry in self._entries.values()
+                if typeof is None or entry[0].type == typeof]
+
+    def json(self, href):
+        """
+        Cached json for the element
+
+        :param str href: href of element
+        :raises: KeyError if element is not in the inventory
+        :return: dict
+        """
+        return self._entries[href][2]
+
+    def etag(self, href):
+        """
+        Cached ETag for the element
+
+        :param str href: href of element
+        :raises: KeyError if element is not in the inventory
+        :return: str
+        """
+        return self._entries[href][1]
+
+    def elements(self, typeof=None):
+        """
+        Elements from the inventory. Each element is returned with its
+        cache already populated, so accessing element data does not
+        require a further request.
+
+        :param str typeof: optional element type filter
+        :return: list :py:class:`smc.base.model.Element`
+        """
+        elements = []
+        for meta in self.meta(typeof):
+            _, etag, data = self._entries[meta.href]
+            element = Registry[meta.type](name=meta.name, meta=meta)
+            element.add_cache(data, etag)
+            elements.append(element)
+        return elements
+
+    @property
+    def fingerprint(self):
+        """
+        Digest representing the state of all elements in the inventory. The
+        fingerprint changes when an element is added, removed or modified.
+        Use this to determine whether results derived from the inventory
+        need to be recomputed.
+
+        :return: str
+        """
+        digest = hashlib.sha1()
+        for href in sorted(self._entries):
+            entry = u'{}:{};'.format(href, self._entries[href][1])
+            digest.update(entry.encode('utf-8'))
+        return digest.hexdigest()
+
+    def save(self, filename):
+        """
+        Save the inventory to file as json.
+
+        :param str filename: name of file
+        :raises: IOError
+        :return: None
+        """
+        with open(filename, 'w') as f:
+            json.dump({'types': self.types,
+                       'entries': [[meta.href, meta.name, meta.type, etag, data]
+                                   for meta, etag, data in self._entries.values()]},
+                      f)
+
+    @classmethod
+    def load(cls, filename, max_workers=DEFAULT_WORKERS):
+        """
+        Load an inventory previously saved with :meth:`save`. Call
+        :meth:`refresh` to revalidate against the SMC.
+
+        :param str filename: name of file
+        :raises: IOError, ValueError
+        :return: :class:`ElementInventory`
+        """
+        with open(filename) as f:
+            saved = json.load(f)
+        inventory = cls(saved.get('types', []), max_workers)
+        for href, name, typeof, etag, data in saved.get('entries', []):
+            inventory._entries[href] = (Meta(href=href, name=name, type=typeof),
+                                        etag, data)
+        return inventory
+
+    def __repr__(self):
+        return '{0}(types={1},elements={2})'.format(self.__class__.__name__,
+                                                    self.types, len(self))
@@ -2,7 +2,8 @@
 Module representing network elements used within the SMC
 """
 import smc.actions.search as search
-from smc.base.model import Element, ElementCreator, prepared_request, Meta
+from smc.base.model import Element, ElementCreator, prepared_request, Meta,\
+    CreatedElement, returns_elements
 from smc.api.exceptions import MissingRequiredInput, CreateElementFailed,\
     ElementNotFound
 
@@ -48,12 +49,12 @@ class Host(Element):
         ipv6_address = None if ipv6_address is None else ipv6_address
         secondary = [] if secondary_ip is None else secondary_ip
         comment = comment if comment else ''
-        cls.json = {'name': name,
-                    'address': address,
-                    'ipv6_address': ipv6_address,
-                    'secondary': secondary,
-                    'comment': comment}
-        return ElementCreator(cls)
+        json = {'name': name,
+                'address': address,
+                'ipv6_address': ipv6_address,
+                'secondary': secondary,
+                'comment': comment}
+        return ElementCreator(cls, json)
 
     @property
     def address(self):
@@ -116,11 +117,11 @@ class AddressRange(Element):
         :raises: :py:class:`smc.api.exceptions.CreateElementFailed`
         """
         comment = comment if comment else ''
-        cls.json = {'name': name,
-                    'ip_range': iprange,
-                    'comment': comment}
+        json = {'name': name,
+                'ip_range': iprange,
+                'comment': comment}
         
-        return ElementCreator(cls)
+        return ElementCreator(cls, json)
 
     @property
     def iprange(self):
@@ -176,13 +177,13 @@ class Router(Element):
         ipv6_address = None if ipv6_address is None else ipv6_address   
         secondary = [] if secondary_ip is None else secondary_ip 
         comment = comment if comment else ''
-        cls.json = {'name': name,
-                    'address': address,
-                    'ipv6_address': ipv6_address,
-                    'secondary': secondary,
-                    'comment': comment}
+        json = {'name': name,
+                'address': address,
+                'ipv6_address': ipv6_address,
+                'secondary': secondary,
+                'comment': comment}
         
-        return ElementCreator(cls)
+        return ElementCreator(cls, json)
 
 class Network(Element):
     """ 
@@ -221,12 +222,12 @@ class Network(Element):
         ipv4_network = None if ipv4_network is None else ipv4_network
         ipv6_network = None if ipv6_network is None else ipv6_network
         comment = comment if comment else ''
-        cls.json = {'name': name,
-                    'ipv4_network': ipv4_network,
-                    'ipv6_network': ipv6_network,
-                    'comment': comment}
+        json = {'name': name,
+                'ipv4_network': ipv4_network,
+                'ipv6_network': ipv6_network,
+                'comment': comment}
         
-        return ElementCreator(cls)
+        return ElementCreator(cls, json)
 
 class DomainName(Element):
     """ 
@@ -254,10 +255,10 @@ class DomainName(Element):
         :raises: :py:class:`smc.api.exceptions.CreateElementFailed`
         """
         comment = comment if comment else ''
-        cls.json = {'name': name,
-                    'comment': comment}
+        json = {'name': name,
+                'comment': comment}
         
-        return ElementCreator(cls)
+        return ElementCreator(cls, json)
 
 class Expression(Element):
     """
@@ -323,13 +324,13 @@ class Expression(Element):
         """
         comment = comment if comment else ''
         sub_expression = [] if sub_expression is None else [sub_expression]
-        cls.json = {'name':name,
-                    'operator': operator,
-                    'ne_ref': ne_ref,
-                    'sub_expression': sub_expression,
-                    'comment': comment}
+        json = {'name':name,
+                'operator': operator,
+                'ne_ref': ne_ref,
+                'sub_expression': sub_expression,
+                'comment': comment}
     
-        return ElementCreator(cls)
+        return ElementCreator(cls, json)
 
 class URLListApplication(Element):
     """
@@ -360,10 +361,10 @@ class URLListApplication(Element):
         :return: str href: href location of new element
         :raises: :py:class:`smc.api.exceptions.CreateElementFailed`
         """
-        cls.json = {'name': name,
-                    'url_entry': url_entry,
-                    'comment': comment}
-        return ElementCreator(cls)
+        json = {'name': name,
+                'url_entry': url_entry,
+                'comment': comment}
+        return ElementCreator(cls, json)
 
 class IPListGroup(Element):
     """
@@ -477,18 +478,18 @@ class IPList(Element):
         :param str name: name of ip list
         :param list iplist: list of ipaddress
         :param str comment: optional comment
-        :return: str href: href location of new element 
+        :return: str href: href location of new element, or the
+                 :class:`IPList` within :func:`smc.base.model.return_elements`
         :raises: :py:class:`smc.api.exceptions.CreateElementFailed`
         """
-        cls.json={'name': name,
-                  'comment': comment}
-        result = ElementCreator(cls)
-        if result and iplist is not None:
-            element = IPList(name)
+        json = {'name': name,
+                'comment': comment}
+        element = CreatedElement(cls, json)
+        if iplist is not None:
             prepared_request(CreateElementFailed,
                              href=element._link('ip_address_list'),
                              json={'ip': iplist}).create()
-        return result
+        return element if returns_elements() else element.href
 
 class Zone(Element):
     """ 
@@ -518,9 +519,9 @@ class Zone(Element):
         :raises: :py:class:`smc.api.exceptions.CreateElementFailed`
         """
         comment = comment if comment else ''
-        cls.json = {'name': name,
-                    'comment': comment}
-        return ElementCreator(cls)
+        json = {'name': name,
+                'comment': comment}
+        return ElementCreator(cls, json)
         
 class Country(Element):
     """
@@ -566,8 +567,16 @@ class Alias(Element):
         self.resolved_value = None
     
     @classmethod
-    def load(cls, data):
-        name = search.element_name_by_href(data.get('alias_ref'))
+    def load(cls, data, name=None):
+        """
+        Load an alias from an alias resolving entry.
+
+        :param dict data: entry with alias_ref, cluster_ref and resolved_value
+        :param str name: name of alias if already known, otherwise it is
+               retrieved from the alias_ref
+        :return: :py:class:`smc.elements.network.Alias`
+        """
+        name = name or search.element_name_by_href(data.get('alias_ref'))
         alias = cls(name, meta=Meta(href=data.get('cluster_ref')))
         alias.resolved_value = data.get('resolved_value')
         return alias
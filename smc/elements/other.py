@@ -37,9 +37,9 @@ class Location(Element):
         :return: str href: href of location element
         """
         comment = comment if comment else ''
-        cls.json = {'name': name,
-                    'comment': comment}
-        return ElementCreator(cls)
+        json = {'name': name,
+                'comment': comment}
+        return ElementCreator(cls, json)
 
 class LogicalInterface(Element):
     """
@@ -67,9 +67,9 @@ class LogicalInterface(Element):
         :return: str href: href of logical interface element
         """
         comment = comment if comment else ''
-        cls.json = {'name': name,
-                    'comment': comment}
-        return ElementCreator(cls)
+        json = {'name': name,
+                'comment': comment}
+        return ElementCreator(cls, json)
 
 class MacAddress(Element):
     """
@@ -97,10 +97,10 @@ class MacAddress(Element):
         :return: str href: href of macaddress element
         """
         comment = comment if comment else ''
-        cls.json = {'name': name,
-                    'address': mac_address,
-                    'comment': comment}
-        return ElementCreator(cls)
+        json = {'name': name,
+                'address': mac_address,
+                'comment': comment}
+        return ElementCreator(cls, json)
 
 class ContactAddress(object):
     """
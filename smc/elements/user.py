@@ -62,14 +62,14 @@ class AdminUser(UserCommon, Element):
                superuser=False, admin_domain=None, enabled=True,
                engine_target=None):
         engines = [] if engine_target is None else engine_target
-        cls.json = {'name': name,
-                    'enabled': enabled,
-                    'allow_sudo': allow_sudo,
-                    'engine_target': engines,
-                    'local_admin': local_admin,
-                    'superuser': superuser}
+        json = {'name': name,
+                'enabled': enabled,
+                'allow_sudo': allow_sudo,
+                'engine_target': engines,
+                'local_admin': local_admin,
+                'superuser': superuser}
         
-        return ElementCreator(cls)
+        return ElementCreator(cls, json)
 
     def change_engine_password(self, password):
         """ Change Engine password for engines on allowed
@@ -33,7 +33,7 @@ Example rule deletion::
 """
 from smc.policy.policy import Policy
 from smc.policy.rule import IPv4Layer2Rule, EthernetRule
-from smc.base.model import Meta, ElementCreator
+from smc.base.model import Meta, CreatedElement
 from smc.api.exceptions import ElementNotFound, LoadPolicyFailed,\
     CreatePolicyFailed, CreateElementFailed
 
@@ -95,11 +95,10 @@ class IPSPolicy(IPSRule, Policy):
         except ElementNotFound:
             raise LoadPolicyFailed('Cannot find specified firewall template: {}'
                                    .format(template))
-        cls.json = {'name': name,
-                    'template': fw_template}
+        json = {'name': name,
+                'template': fw_template}
         try:
-            result = ElementCreator(cls)
-            return IPSPolicy(name, Meta(href=result))
+            return CreatedElement(cls, json)
         except CreateElementFailed as err:
             raise CreatePolicyFailed('Failed to create firewall policy: {}'
                                      .format(err))
@@ -51,7 +51,7 @@ Example rule deletion::
         if rule.name == 'myrule':
             print rule.delete()
 """
-from smc.base.model import Meta, ElementCreator
+from smc.base.model import Meta, CreatedElement
 from smc.api.exceptions import ElementNotFound, LoadPolicyFailed,\
     CreatePolicyFailed, CreateElementFailed
 from smc.policy.policy import Policy
@@ -141,11 +141,10 @@ class Layer2Policy(Layer2Rule, Policy):
         except ElementNotFound:
             raise LoadPolicyFailed('Cannot find specified layer2 firewall '
                                    'template: {}'.format(template))
-        cls.json = {'name': name,
-                    'template': fw_template}
+        json = {'name': name,
+                'template': fw_template}
         try:
-            result = ElementCreator(cls)
-            return Layer2Policy(name, Meta(href=result))
+            return CreatedElement(cls, json)
         except CreateElementFailed as err:
             raise CreatePolicyFailed('Failed to create firewall policy: {}'
                                      .format(err))
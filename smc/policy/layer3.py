@@ -34,7 +34,7 @@ Example rule deletion::
         if rule.name == 'mynewrule':
             rule.delete()
 """
-from smc.base.model import Meta, ElementCreator
+from smc.base.model import Meta, CreatedElement
 from smc.api.exceptions import CreatePolicyFailed, ElementNotFound, LoadPolicyFailed,\
     CreateElementFailed
 from smc.policy.policy import Policy
@@ -136,11 +136,10 @@ class FirewallPolicy(FirewallRule, Policy):
         except ElementNotFound:
             raise LoadPolicyFailed('Cannot find specified firewall template: {}'
                                    .format(template))
-        cls.json = {'name': name,
-                    'template': fw_template}
+        json = {'name': name,
+                'template': fw_template}
         try:
-            result = ElementCreator(cls)
-            return FirewallPolicy(name, Meta(href=result))
+            return CreatedElement(cls, json)
         except CreateElementFailed as err:
             raise CreatePolicyFailed('Failed to create firewall policy: {}'
                                      .format(err))
@@ -0,0 +1,232 @@
+"""
+Push policy to many engines with bounded concurrency and a staged rollout.
+
+Engines are split into waves. The first wave is a canary of one or more
+engines; if any canary engine fails, the rollout is aborted. The remaining
+engines are pushed in waves of a given size, each wave completing before
+the next one starts. At most ``max_concurrent`` uploads run at any time,
+and the follower tasks of all running uploads are polled together.
+
+If the number of failed engines exceeds ``max_failures``, no further
+uploads are started. Uploads already running are followed until they
+complete and engines not yet started are skipped.
+
+Progress is provided as a stream of :class:`RolloutEvent`::
+
+    from smc.policy.rollout import PolicyRollout
+
+    rollout = PolicyRollout(engines, policy='Standard Policy',
+                            max_concurrent=20, canary=2, wave_size=50,
+                            max_failures=5)
+    for event in rollout.run():
+        print(event)
+
+    print(rollout.succeeded, rollout.failed, rollout.skipped)
+
+If policy is not provided, the currently installed policy is refreshed on
+each engine.
+"""
+import re
+import time
+import logging
+from collections import namedtuple
+from smc.core.engine import Engine
+from smc.administration.tasks import Task, clean_html
+from smc.api.pool import concurrent_map, DEFAULT_WORKERS
+from smc.api.exceptions import TaskRunFailed
+
+logger = logging.getLogger(__name__)
+
+#: Number of consecutive failures polling a task before the engine is failed
+MAX_POLL_ERRORS = 3
+
+class RolloutEvent(namedtuple('RolloutEvent',
+                              'event engine wave message succeeded failed remaining')):
+    """
+    Progress event of a rollout. Each event carries the totals for the
+    rollout at the time of the event.
+
+    :ivar str event: one of 'wave', 'started', 'progress', 'succeeded',
+          'failed', 'aborted', 'skipped' or 'finished'
+    :ivar str engine: name of engine, None for rollout level events
+    :ivar int wave: wave number, 0 is the canary wave
+    :ivar str message: task message or failure reason
+    :ivar int succeeded: number of engines succeeded so far
+    :ivar int failed: number of engines failed so far
+    :ivar int remaining: number of engines not completed, failed or skipped
+    """
+    __slots__ = ()
+
+    def __str__(self):
+        return '[{0}] {1} {2}: {3} (succeeded={4},failed={5},remaining={6})'.format(
+            self.wave, self.event, self.engine or '', self.message or '',
+            self.succeeded, self.failed, self.remaining)
+
+class PolicyRollout(object):
+    """
+    Staged policy push to many engines.
+
+    :param list engines: engine names or :py:class:`smc.core.engine.Engine`
+    :param str policy: name of policy to upload. If None, the installed
+           policy is refreshed
+    :param int max_concurrent: maximum number of uploads running at once
+    :param int canary: number of engines in the canary wave, 0 to disable
+    :param int wave_size: number of engines per wave after the canary, if
+           None all remaining engines are in a single wave
+    :param int max_failures: number of failed engines tolerated before the
+           rollout is aborted
+    :param int sleep: seconds between polls of running tasks
+    :param int timeout: seconds after which a running upload is considered
+           failed, None to wait indefinitely
+    :ivar list succeeded: names of engines where the upload succeeded
+    :ivar dict failed: name -> failure reason for failed engines
+    :ivar list skipped: names of engines not started due to abort
+    """
+    def __init__(self, engines, policy=None, max_concurrent=DEFAULT_WORKERS,
+                 canary=1, wave_size=None, max_failures=0, sleep=3, timeout=None):
+        self.engines = [engine if isinstance(engine, Engine) else Engine(engine)
+                        for engine in engines]
+        self.policy = policy
+        self.max_concurrent = max_concurrent
+        self.canary = canary
+        self.wave_size = wave_size
+        self.max_failures = max_failures
+        self.sleep = sleep
+        self.timeout = timeout
+        self.succeeded = []
+        self.failed = {}
+        self.skipped = []
+
+    @property
+    def waves(self):
+        """
+        Engines grouped by wave, the canary wave first
+
+        :return: list of list :py:class:`smc.core.engine.Engine`
+        """
+        waves = []
+        engines = list(self.engines)
+        if self.canary:
+            waves.append(engines[:self.canary])
+            engines = engines[self.canary:]
+        size = self.wave_size or len(engines)
+        while engines:
+            waves.append(engines[:size])
+            engines = engines[size:]
+        return waves
+
+    def _start(self, engine):
+        """
+        Start the upload or refresh and return the task to follow
+        """
+        if self.policy:
+            follower = next(engine.upload(self.policy, wait_for_finish=False))
+        else:
+            follower = next(engine.refresh(wait_for_finish=False))
+        if not follower:
+            raise TaskRunFailed('No follower returned for engine: {}'
+                                .format(engine.name))
+        return Task(follower=follower)
+
+    @property
+    def aborted(self):
+        """
+        Whether the failure threshold has been exceeded
+
+        :rtype: bool
+        """
+        return len(self.failed) > self.max_failures
+
+    def run(self):
+        """
+        Run the rollout. This is a generator and the rollout only progresses
+        while events are consumed.
+
+        :return: generator :class:`RolloutEvent`
+        """
+        self.succeeded, self.failed, self.skipped = [], {}, []
+        total = len(self.engines)
+
+        def event(name, engine=None, wave=None, message=None):
+            return RolloutEvent(name, engine, wave, message, len(self.succeeded),
+                                len(self.failed), total - len(self.succeeded) -
+                                len(self.failed) - len(self.skipped))
+
+        def fail(engine, message):
+            self.failed[engine] = message
+            logger.error('Policy upload failed on engine: %s, %s', engine, message)
+
+        aborted = False
+        for number, wave in enumerate(self.waves):
+            pending = list(wave)
+            if not aborted:
+                yield event('wave', wave=number,
+                            message='{} engines'.format(len(wave)))
+            running = {} # name -> [task, started, last message, poll errors]
+            while pending or running:
+                if self.aborted and not aborted:
+                    aborted = True
+                    yield event('aborted', wave=number,
+                                message='{} engines failed'.format(len(self.failed)))
+                if aborted:
+                    for engine in pending:
+                        self.skipped.append(engine.name)
+                        yield event('skipped', engine.name, number)
+                    pending = []
+
+                starting = pending[:max(0, self.max_concurrent - len(running))]
+                pending = pending[len(starting):]
+                for result in concurrent_map(self._start, starting, self.max_concurrent):
+                    name = result.item.name
+                    if result.ok:
+                        running[name] = [result.value, time.time(), None, 0]
+                        yield event('started', name, number)
+                    else:
+                        fail(name, str(result.exception))
+                        yield event('failed', name, number, self.failed[name])
+                if not running:
+                    continue
+
+                time.sleep(self.sleep)
+                for result in concurrent_map(lambda name: running[name][0](),
+                                             list(running), self.max_concurrent):
+                    name = result.item
+                    task, started, last_message, errors = running[name]
+                    if not result.ok:
+                        running[name][3] = errors + 1
+                        if running[name][3] >= MAX_POLL_ERRORS:
+                            del running[name]
+                            fail(name, 'Failed retrieving task status: {}'
+                                 .format(result.exception))
+                            yield event('failed', name, number, self.failed[name])
+                        continue
+                    running[name][3] = 0
+                    message = re.sub(clean_html, '', task.last_message or '')
+                    if task.success:
+                        del running[name]
+                        self.succeeded.append(name)
+                        yield event('succeeded', name, number, message)
+                    elif not task.in_progress:
+                        del running[name]
+                        fail(name, message)
+                        yield event('failed', name, number, message)
+                    elif self.timeout and time.time() - started > self.timeout:
+                        del running[name]
+                        fail(name, 'Timed out after {} seconds'.format(self.timeout))
+                        yield event('failed', name, number, self.failed[name])
+                    elif message and message != last_message:
+                        running[name][2] = message
+                        yield event('progress', name, number, message)
+
+            if number == 0 and self.canary and self.failed and not aborted:
+                aborted = True
+                yield event('aborted', wave=number, message='Canary failed')
+            elif self.aborted and not aborted:
+                aborted = True
+                yield event('aborted', wave=number,
+                            message='{} engines failed'.format(len(self.failed)))
+        yield event('finished')
+
+    def __repr__(self):
+        return '{0}(engines={1},policy={2})'.format(self.__class__.__name__,
+                                                    len(self.engines), self.policy)
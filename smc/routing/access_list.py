@@ -42,10 +42,10 @@ class AccessList(object):
                     {'{}_entry'.format(cls.typeof): {
                         'action': action,
                         'subnet': subnet}})           
-        cls.json = {'name': name,
-                    'entries': access_list_entry}
+        json = {'name': name,
+                'entries': access_list_entry}
 
-        return ElementCreator(cls)
+        return ElementCreator(cls, json)
 
     def add_entry(self, subnet, action):
         """
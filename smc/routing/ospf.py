@@ -145,18 +145,18 @@ class OSPFArea(Element):
         :return: str href: href location of new element
         :raises: :py:class:`smc.api.exceptions.CreateElementFailed`
         """
-        cls.json={'name': name,
-                  'area_id': area_id,
-                  'area_type': area_type,
-                  'inbound_filters_ref': inbound_filters_ref,
-                  'interface_settings_ref': interface_settings_ref,
-                  'ospf_abr_substitute_container': ospf_abr_substitute_container,
-                  'ospfv2_virtual_links_endpoints_container': 
-                                        ospfv2_virtual_links_endpoints_container,
-                  'outbound_filters_ref': outbound_filters_ref,
-                  'shortcut_capable_area': shortcut_capable_area}
+        json = {'name': name,
+                'area_id': area_id,
+                'area_type': area_type,
+                'inbound_filters_ref': inbound_filters_ref,
+                'interface_settings_ref': interface_settings_ref,
+                'ospf_abr_substitute_container': ospf_abr_substitute_container,
+                'ospfv2_virtual_links_endpoints_container': 
+                                      ospfv2_virtual_links_endpoints_container,
+                'outbound_filters_ref': outbound_filters_ref,
+                'shortcut_capable_area': shortcut_capable_area}
         
-        return ElementCreator(cls)
+        return ElementCreator(cls, json)
 
 class OSPFInterfaceSetting(Element):
     """
@@ -213,20 +213,20 @@ class OSPFInterfaceSetting(Element):
         :return: str href: href location of new element
         :raises: :py:class:`smc.api.exceptions.CreateElementFailed`
         """
-        cls.json={'name': name,
-                  'authentication_type': authentication_type,
-                  'password': password,
-                  'key_chain_ref': key_chain_ref,
-                  'dead_interval': dead_interval,
-                  'dead_multiplier': dead_multiplier,
-                  'hello_interval': hello_interval,
-                  'hello_interval_type': hello_interval_type,
-                  'mtu_mismatch_detection': mtu_mismatch_detection,
-                  'retransmit_interval': retransmit_interval,
-                  'router_priority': router_priority,
-                  'transmit_delay': transmit_delay}
+        json = {'name': name,
+                'authentication_type': authentication_type,
+                'password': password,
+                'key_chain_ref': key_chain_ref,
+                'dead_interval': dead_interval,
+                'dead_multiplier': dead_multiplier,
+                'hello_interval': hello_interval,
+                'hello_interval_type': hello_interval_type,
+                'mtu_mismatch_detection': mtu_mismatch_detection,
+                'retransmit_interval': retransmit_interval,
+                'router_priority': router_priority,
+                'transmit_delay': transmit_delay}
         
-        return ElementCreator(cls)    
+        return ElementCreator(cls, json)    
 
 class OSPFKeyChain(Element):
     """
@@ -264,10 +264,10 @@ class OSPFKeyChain(Element):
         :raises: :py:class:`smc.api.exceptions.CreateElementFailed`
         """
         key_chain_entry = [] if key_chain_entry is None else key_chain_entry
-        cls.json={'name': name,
-                  'ospfv2_key_chain_entry': key_chain_entry}
+        json = {'name': name,
+                'ospfv2_key_chain_entry': key_chain_entry}
         
-        return ElementCreator(cls)
+        return ElementCreator(cls, json)
 
 class OSPFProfile(Element):
     """
@@ -320,14 +320,14 @@ class OSPFProfile(Element):
         :return: str href: href location of new element
         :raises: :py:class:`smc.api.exceptions.CreateElementFailed`
         """
-        cls.json={'name': name,
-                  'domain_settings_ref': domain_settings_ref,
-                  'external_distance': external_distance,
-                  'inter_distance': inter_distance,
-                  'intra_distance': intra_distance,
-                  'redistribution_entry': redistribution_entry}
+        json = {'name': name,
+                'domain_settings_ref': domain_settings_ref,
+                'external_distance': external_distance,
+                'inter_distance': inter_distance,
+                'intra_distance': intra_distance,
+                'redistribution_entry': redistribution_entry}
         
-        return ElementCreator(cls)    
+        return ElementCreator(cls, json)    
 
 class OSPFDomainSetting(Element):
     """
@@ -373,14 +373,14 @@ class OSPFDomainSetting(Element):
         :return: str href: href location of new element
         :raises: :py:class:`smc.api.exceptions.CreateElementFailed`
         """
-        cls.json={'name': name,
-                  'abr_type': abr_type,
-                  'auto_cost_bandwidth': auto_cost_bandwidth,
-                  'deprecated_algorithm': deprecated_algorithm,
-                  'initial_delay': initial_delay,
-                  'initial_hold_time': initial_hold_time,
-                  'max_hold_time': max_hold_time,
-                  'shutdown_max_metric_lsa': shutdown_max_metric_lsa,
-                  'startup_max_metric_lsa': startup_max_metric_lsa}
+        json = {'name': name,
+                'abr_type': abr_type,
+                'auto_cost_bandwidth': auto_cost_bandwidth,
+                'deprecated_algorithm': deprecated_algorithm,
+                'initial_delay': initial_delay,
+                'initial_hold_time': initial_hold_time,
+                'max_hold_time': max_hold_time,
+                'shutdown_max_metric_lsa': shutdown_max_metric_lsa,
+                'startup_max_metric_lsa': startup_max_metric_lsa}
         
-        return ElementCreator(cls)
+        return ElementCreator(cls, json)
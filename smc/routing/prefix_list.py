@@ -42,10 +42,10 @@ class PrefixList(Element):
                         'max_prefix_length': max_len,
                         'min_prefix_length': min_len,
                         'subnet': subnet}})
-        cls.json = {'name': name,
-                    'entries': prefix_list_entry}
+        json = {'name': name,
+                'entries': prefix_list_entry}
 
-        return ElementCreator(cls)
+        return ElementCreator(cls, json)
 
     def add_entry(self, subnet, min_prefix_length,
                   max_prefix_length, action):
@@ -0,0 +1,124 @@
+"""
+Tests for the alias matrix and alias name resolution. No SMC is required.
+"""
+import unittest
+try:
+    from unittest import mock
+except ImportError: #py2
+    import mock
+import smc.core.aliases as aliases
+from smc.core.aliases import AliasMatrix, resolve_names
+
+
+class AliasMatrixTest(unittest.TestCase):
+
+    def setUp(self):
+        self.matrix = AliasMatrix(['$$ ip', '$$ net', '$$ dns'],
+                                  ['fw1', 'fw2', 'fw3'])
+        self.matrix.set('$$ ip', 'fw1', ['10.0.0.1'])
+        self.matrix.set('$$ ip', 'fw2', ['10.0.0.1'])
+        self.matrix.set('$$ net', 'fw1', ['10.0.0.0/24', '2001:db8::/32'])
+        self.matrix.set('$$ net', 'fw2', ['10.1.0.0-10.1.0.255'])
+        self.matrix.set('$$ dns', 'fw1', ['ns.example.com'])
+        self.matrix.set('$$ dns', 'fw3', [])
+
+    def test_value(self):
+        self.assertEqual(self.matrix.value('$$ ip', 'fw1'), ('10.0.0.1',))
+        self.assertIsNone(self.matrix.value('$$ ip', 'fw3'))
+        self.assertEqual(self.matrix.value('$$ dns', 'fw3'), ())
+        self.assertRaises(KeyError, self.matrix.value, '$$ missing', 'fw1')
+        self.assertRaises(KeyError, self.matrix.set, '$$ ip', 'fw4', [])
+
+    def test_values_shared(self):
+        self.assertEqual(len(self.matrix._values), 5)
+
+    def test_row_and_column(self):
+        self.assertEqual(self.matrix.row('$$ ip'), {'fw1': ('10.0.0.1',),
+                                                    'fw2': ('10.0.0.1',)})
+        self.assertEqual(self.matrix.column('fw3'), {'$$ dns': ()})
+        self.assertEqual(len(self.matrix), 6)
+        self.assertEqual(len(list(self.matrix)), 6)
+
+    def test_lookup_address(self):
+        self.assertEqual(self.matrix.lookup('10.0.0.1'),
+                         [('$$ ip', 'fw1'), ('$$ ip', 'fw2'), ('$$ net', 'fw1')])
+
+    def test_lookup_network_and_range(self):
+        self.assertEqual(self.matrix.lookup('10.0.0.200'), [('$$ net', 'fw1')])
+        self.assertEqual(self.matrix.lookup('10.1.0.255'), [('$$ net', 'fw2')])
+        self.assertEqual(self.matrix.lookup('10.1.1.0'), [])
+        self.assertEqual(self.matrix.lookup('2001:db8::1'), [('$$ net', 'fw1')])
+
+    def test_lookup_ignores_other_values(self):
+        self.assertEqual(self.matrix.lookup('::'), [])
+        self.assertRaises(ValueError, self.matrix.lookup, 'ns.example.com')
+
+    def test_lookup_after_set(self):
+        self.assertEqual(self.matrix.lookup('192.168.1.1'), [])
+        self.matrix.set('$$ ip', 'fw3', ['192.168.1.1'])
+        self.assertEqual(self.matrix.lookup('192.168.1.1'), [('$$ ip', 'fw3')])
+        self.matrix.set('$$ ip', 'fw3', None)
+        self.assertEqual(self.matrix.lookup('192.168.1.1'), [])
+
+
+class ResolveNamesTest(unittest.TestCase):
+
+    def test_names_cached_and_failures_skipped(self):
+        def name(href):
+            if href == 'bad':
+                raise IOError('failed')
+            return 'name of {}'.format(href)
+
+        cache = {'known': 'cached'}
+        with mock.patch.object(aliases.search, 'element_name_by_href',
+                               side_effect=name) as lookup:
+            names = resolve_names(['known', 'new', 'new', None, 'bad'], cache)
+        self.assertTrue(names is cache)
+        self.assertEqual(names, {'known': 'cached', 'new': 'name of new'})
+        self.assertEqual(sorted(call[0][0] for call in lookup.call_args_list),
+                         ['bad', 'new'])
+
+
+class AliasResolverTest(unittest.TestCase):
+
+    def resolve(self, **kwargs):
+        resolving = {'fw1': [{'alias_ref': 'a1', 'resolved_value': ['10.0.0.1']},
+                             {'alias_ref': 'a2', 'resolved_value': ['10.0.0.2']},
+                             {'alias_ref': 'gone', 'resolved_value': ['1.1.1.1']}],
+                     'fw2': [{'alias_ref': 'a1', 'resolved_value': ['10.0.1.1']}]}
+
+        def engine(engine):
+            if engine['name'] == 'fw3':
+                raise IOError('no alias resolving')
+            return resolving[engine['name']]
+
+        def name(href):
+            if href == 'gone':
+                raise IOError('not found')
+            return {'a1': '$$ a1', 'a2': '$$ a2'}[href]
+
+        resolver = aliases.AliasResolver()
+        listing = [{'name': 'fw1'}, {'name': 'fw2'}, {'name': 'fw3'}]
+        with mock.patch.object(resolver, '_engines', return_value=listing), \
+                mock.patch.object(resolver, '_resolving', side_effect=engine), \
+                mock.patch.object(aliases.search, 'element_name_by_href',
+                                  side_effect=name):
+            return resolver, resolver.resolve(**kwargs)
+
+    def test_failures_reported(self):
+        _, matrix = self.resolve()
+        self.assertEqual(matrix.engines, ['fw1', 'fw2'])
+        self.assertEqual(list(matrix.errors), ['fw3'])
+        self.assertEqual(matrix.aliases, ['$$ a1', '$$ a2'])
+        self.assertEqual(matrix.value('$$ a1', 'fw2'), ('10.0.1.1',))
+        self.assertIsNone(matrix.value('$$ a2', 'fw2'))
+
+    def test_selected_aliases(self):
+        resolver, matrix = self.resolve(aliases=['$$ a2', '$$ unknown'])
+        self.assertEqual(matrix.row('$$ a2'), {'fw1': ('10.0.0.2',)})
+        self.assertEqual(matrix.row('$$ unknown'), {})
+        self.assertEqual(resolver.names, {'a1': '$$ a1', 'a2': '$$ a2'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+"""
+Tests for coalescing blacklist entries. No SMC is required.
+"""
+import unittest
+from smc.core.blacklist import coalesce
+
+
+def entries(result):
+    return sorted(result.values())
+
+
+class CoalesceTest(unittest.TestCase):
+
+    def test_duplicate_keeps_longest_duration(self):
+        result = coalesce([('1.1.1.1/32', '0.0.0.0/0', 60),
+                           ('1.1.1.1/32', '0.0.0.0/0', 3600),
+                           ('1.1.1.1/32', '0.0.0.0/0', 600)])
+        self.assertEqual(entries(result), [('1.1.1.1/32', '0.0.0.0/0', 3600)])
+
+    def test_contained_source_shorter_duration_dropped(self):
+        result = coalesce([('10.0.0.0/8', '0.0.0.0/0', 3600),
+                           ('10.1.0.0/16', '0.0.0.0/0', 600),
+                           ('10.1.2.3/32', '0.0.0.0/0', 60)])
+        self.assertEqual(entries(result), [('10.0.0.0/8', '0.0.0.0/0', 3600)])
+
+    def test_contained_source_equal_duration_dropped(self):
+        result = coalesce([('10.1.2.3/32', '0.0.0.0/0', 3600),
+                           ('10.0.0.0/8', '0.0.0.0/0', 3600)])
+        self.assertEqual(entries(result), [('10.0.0.0/8', '0.0.0.0/0', 3600)])
+
+    def test_contained_source_longer_duration_kept(self):
+        result = coalesce([('10.0.0.0/8', '0.0.0.0/0', 600),
+                           ('10.1.2.3/32', '0.0.0.0/0', 3600)])
+        self.assertEqual(entries(result), [('10.0.0.0/8', '0.0.0.0/0', 600),
+                                           ('10.1.2.3/32', '0.0.0.0/0', 3600)])
+
+    def test_nested_uses_longest_enclosing_duration(self):
+        # /24 is dropped by the /8 even though the /16 between is shorter
+        result = coalesce([('10.0.0.0/8', '0.0.0.0/0', 3600),
+                           ('10.1.0.0/16', '0.0.0.0/0', 7200),
+                           ('10.2.0.0/16', '0.0.0.0/0', 60),
+                           ('10.2.3.0/24', '0.0.0.0/0', 600)])
+        self.assertEqual(entries(result), [('10.0.0.0/8', '0.0.0.0/0', 3600),
+                                           ('10.1.0.0/16', '0.0.0.0/0', 7200)])
+
+    def test_disjoint_sources_kept(self):
+        result = coalesce([('10.0.0.0/16', '0.0.0.0/0', 3600),
+                           ('10.1.0.0/16', '0.0.0.0/0', 60),
+                           ('10.0.255.255/32', '0.0.0.0/0', 60)])
+        self.assertEqual(entries(result), [('10.0.0.0/16', '0.0.0.0/0', 3600),
+                                           ('10.1.0.0/16', '0.0.0.0/0', 60)])
+
+    def test_different_destinations_not_merged(self):
+        result = coalesce([('10.0.0.0/8', '192.168.1.0/24', 3600),
+                           ('10.1.2.3/32', '192.168.2.0/24', 60),
+                           ('10.1.2.3/32', '192.168.1.1/32', 60)])
+        self.assertEqual(len(result), 3)
+
+    def test_ipv4_and_ipv6_not_merged(self):
+        # ::/0 starts at 0 like 0.0.0.0/0 but is a different address family
+        result = coalesce([('::/0', '::/0', 3600),
+                           ('0.0.0.0/0', '::/0', 60),
+                           ('1.1.1.1/32', '::/0', 60),
+                           ('::1/128', '::/0', 60)])
+        self.assertEqual(entries(result), [('0.0.0.0/0', '::/0', 60),
+                                           ('::/0', '::/0', 3600)])
+
+    def test_invalid_network(self):
+        self.assertRaises(ValueError, coalesce,
+                          [('1.1.1.300/32', '0.0.0.0/0', 60)])
+
+
+if __name__ == '__main__':
+    unittest.main()
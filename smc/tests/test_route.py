@@ -0,0 +1,171 @@
+"""
+Tests for longest prefix matching of networks and route tables. No SMC
+is required.
+"""
+import unittest
+from smc.core.route import PrefixIndex, RouteTable, Routes
+
+
+def entry(network, netmask, gateway=None, route_type='Static', src_if=None,
+          dst_if=None):
+    return {'route_network': network, 'route_netmask': netmask,
+            'route_gateway': gateway, 'route_type': route_type,
+            'src_if': src_if, 'dst_if': dst_if}
+
+
+class PrefixIndexTest(unittest.TestCase):
+
+    def test_longest_prefix_wins(self):
+        index = PrefixIndex()
+        index.add('10.0.0.0/8', 'core')
+        index.add('10.1.0.0/16', 'branch')
+        index.add('10.1.2.0/24', 'site')
+        self.assertEqual(index.lookup('10.1.2.3'), 'site')
+        self.assertEqual(index.lookup('10.1.3.1'), 'branch')
+        self.assertEqual(index.lookup('10.2.0.1'), 'core')
+        self.assertIsNone(index.lookup('11.0.0.1'))
+        self.assertEqual(len(index), 3)
+
+    def test_default_route(self):
+        index = PrefixIndex()
+        index.add('0.0.0.0/0', 'default')
+        index.add('192.168.0.0/16', 'lan')
+        self.assertEqual(index.lookup('8.8.8.8'), 'default')
+        self.assertEqual(index.lookup('255.255.255.255'), 'default')
+        self.assertEqual(index.lookup('192.168.1.1'), 'lan')
+
+    def test_host_routes(self):
+        index = PrefixIndex()
+        index.add('10.0.0.0/24', 'net')
+        index.add('10.0.0.5/32', 'host')
+        index.add('10.0.0.6', 'no prefix')
+        self.assertEqual(index.lookup('10.0.0.5'), 'host')
+        self.assertEqual(index.lookup('10.0.0.6'), 'no prefix')
+        self.assertEqual(index.lookup('10.0.0.7'), 'net')
+
+    def test_network_not_aligned_on_prefix(self):
+        index = PrefixIndex()
+        index.add('10.1.2.3/16', 'branch')
+        self.assertEqual(index.lookup('10.1.200.1'), 'branch')
+
+    def test_netmask_format(self):
+        index = PrefixIndex()
+        index.add('172.16.0.0/255.240.0.0', 'private')
+        self.assertEqual(index.lookup('172.31.255.1'), 'private')
+        self.assertIsNone(index.lookup('172.32.0.1'))
+
+    def test_first_value_kept(self):
+        index = PrefixIndex()
+        index.add('10.0.0.0/8', 'first')
+        index.add('10.0.0.0/8', 'second')
+        self.assertEqual(index.lookup('10.0.0.1'), 'first')
+        self.assertEqual(len(index), 1)
+
+    def test_falsy_values(self):
+        index = PrefixIndex()
+        index.add('10.0.0.0/8', 0)
+        index.add('10.1.0.0/16', '')
+        self.assertEqual(index.lookup('10.2.0.1'), 0)
+        self.assertEqual(index.lookup('10.1.0.1'), '')
+
+    def test_ipv6(self):
+        index = PrefixIndex()
+        index.add('::/0', 'default')
+        index.add('2001:db8::/32', 'doc')
+        index.add('2001:db8:1::/48', 'site')
+        index.add('2001:db8:1::1/128', 'host')
+        self.assertEqual(index.lookup('2001:db8:1::1'), 'host')
+        self.assertEqual(index.lookup('2001:db8:1::2'), 'site')
+        self.assertEqual(index.lookup('2001:db8:2::1'), 'doc')
+        self.assertEqual(index.lookup('2001:db9::1'), 'default')
+
+    def test_versions_kept_apart(self):
+        index = PrefixIndex()
+        index.add('0.0.0.0/0', 'v4')
+        self.assertIsNone(index.lookup('::1'))
+        index.add('::/0', 'v6')
+        self.assertEqual(index.lookup('::1'), 'v6')
+        self.assertEqual(index.lookup('0.0.0.1'), 'v4')
+
+    def test_lookup_many(self):
+        index = PrefixIndex()
+        index.add('10.0.0.0/8', 'a')
+        index.add('2001:db8::/32', 'b')
+        self.assertEqual(index.lookup_many(['10.1.1.1', '2001:db8::1', '1.1.1.1']),
+                         ['a', 'b', None])
+
+    def test_invalid(self):
+        index = PrefixIndex()
+        self.assertRaises(ValueError, index.add, '10.0.0.0/33', 'a')
+        self.assertRaises(ValueError, index.add, 'foo', 'a')
+        self.assertRaises(ValueError, index.lookup, '10.0.0.256')
+        self.assertRaises(ValueError, index.lookup, '10.1')
+
+
+class RouteTableTest(unittest.TestCase):
+
+    def setUp(self):
+        self.table = RouteTable.from_json([
+            entry('0.0.0.0', 0, '192.168.1.1', dst_if=0),
+            entry('10.0.0.0', 8, '10.255.255.254', dst_if=1),
+            entry('10.1.0.0', '255.255.0.0', '10.255.255.253', dst_if=1),
+            entry('192.168.1.0', 24, route_type='Connected', dst_if=0),
+            entry('10.1.1.1', '', '10.255.255.252', dst_if=2),
+            entry('2001:db8::', 32, 'fe80::1', dst_if=3),
+            entry('not an address', 24),
+            entry('10.2.0.0', 40)])
+
+    def test_invalid_entries_skipped(self):
+        self.assertEqual(len(self.table), 6)
+
+    def test_rows(self):
+        route = self.table[2]
+        self.assertEqual(route.route_network, '10.1.0.0')
+        self.assertEqual(route.route_netmask, 16)
+        self.assertEqual(route.route_gateway, '10.255.255.253')
+        self.assertIsNone(self.table[3].route_gateway)
+        self.assertIsNone(self.table[0].src_if)
+        self.assertEqual(self.table[-1].route_network, '2001:db8::')
+        self.assertEqual(self.table[-1].route_gateway, 'fe80::1')
+
+    def test_lookup(self):
+        self.assertEqual(self.table.lookup('10.1.1.1').dst_if, 2)
+        self.assertEqual(self.table.lookup('10.1.1.2').route_network, '10.1.0.0')
+        self.assertEqual(self.table.lookup('10.2.0.1').route_network, '10.0.0.0')
+        self.assertEqual(self.table.lookup('192.168.1.20').route_type, 'Connected')
+        self.assertEqual(self.table.lookup('8.8.8.8').route_network, '0.0.0.0')
+        self.assertEqual(self.table.lookup('2001:db8::1').dst_if, 3)
+        self.assertIsNone(self.table.lookup('2001:db9::1'))
+
+    def test_lookup_many(self):
+        routes = self.table.lookup_many(['10.1.1.1', '10.9.9.9', '10.8.8.8',
+                                         '::1'])
+        self.assertEqual([r and r.route_network for r in routes],
+                         ['10.1.1.1', '10.0.0.0', '10.0.0.0', None])
+
+    def test_filter(self):
+        self.assertEqual(len(self.table.filter(route_type='Static')), 5)
+        self.assertEqual(len(self.table.filter(dst_if=1)), 2)
+        self.assertEqual([r.route_network for r in
+                          self.table.filter(contains='10.1.1.1')],
+                         ['0.0.0.0', '10.0.0.0', '10.1.0.0', '10.1.1.1'])
+        self.assertEqual([r.route_network for r in
+                          self.table.filter(within='10.0.0.0/8')],
+                         ['10.0.0.0', '10.1.0.0', '10.1.1.1'])
+        self.assertEqual([r.route_network for r in
+                          self.table.filter(contains='2001:db8::5')],
+                         ['2001:db8::'])
+        self.assertEqual(len(self.table.filter(gateway='fe80::1')), 1)
+        filtered = self.table.filter(dst_if=1).filter(contains='10.1.0.1')
+        self.assertEqual([r.route_network for r in filtered],
+                         ['10.0.0.0', '10.1.0.0'])
+
+    def test_routes_table(self):
+        routes = Routes({'routing_monitoring_entry': [
+            entry('10.0.0.0', 8, '10.0.0.1')]})
+        self.assertEqual(len(routes.table), 1)
+        self.assertEqual(len(Routes({}).table), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
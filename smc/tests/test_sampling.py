@@ -0,0 +1,142 @@
+"""
+Tests for the node status history. No SMC is required.
+"""
+import unittest
+from smc.core.sampling import RingBuffer, StatusHistory
+
+NODE = ('fw', 'fw node 1')
+
+
+class RingBufferTest(unittest.TestCase):
+
+    def test_grows_up_to_capacity(self):
+        buffer = RingBuffer(5)
+        self.assertEqual(len(buffer.times), 0)
+        lengths = []
+        for i in range(5):
+            self.assertIsNone(buffer.append(float(i), i))
+            lengths.append(len(buffer.times))
+        self.assertEqual(lengths, [1, 2, 4, 4, 5])
+        self.assertEqual(list(buffer), [(float(i), i) for i in range(5)])
+
+    def test_wraparound(self):
+        buffer = RingBuffer(3)
+        evicted = [buffer.append(float(i), i) for i in range(7)]
+        self.assertEqual(evicted, [None, None, None, 0, 1, 2, 3])
+        self.assertEqual(len(buffer), 3)
+        self.assertEqual(len(buffer.values), 3)
+        self.assertEqual(list(buffer), [(4.0, 4), (5.0, 5), (6.0, 6)])
+        self.assertEqual(buffer.last, (6.0, 6))
+        self.assertRaises(IndexError, buffer.__getitem__, 3)
+
+    def test_bisect_across_wraparound(self):
+        buffer = RingBuffer(4)
+        for i in range(6):
+            buffer.append(float(i * 10), i)
+        # Entries at 20, 30, 40, 50
+        self.assertEqual(buffer.bisect(0), 0)
+        self.assertEqual(buffer.bisect(20), 1)
+        self.assertEqual(buffer.bisect(45), 3)
+        self.assertEqual(buffer.bisect(50), 4)
+
+
+class StatusHistoryTest(unittest.TestCase):
+
+    def test_only_changes_stored(self):
+        history = StatusHistory()
+        self.assertIsNone(history.record(NODE, 'status', 'Online', 1.0))
+        self.assertIsNone(history.record(NODE, 'status', 'Online', 2.0))
+        change = history.record(NODE, 'status', 'Offline', 3.0)
+        self.assertEqual((change.previous, change.value), ('Online', 'Offline'))
+        self.assertEqual(history.last_seen(NODE, 'status'), 3.0)
+        self.assertEqual(history.range(NODE, 'status'),
+                         [(1.0, 'Online'), (3.0, 'Offline')])
+
+    def test_evicted_values_released(self):
+        history = StatusHistory(capacity=3)
+        for t in range(10):
+            history.record(NODE, 'status', 'v{}'.format(t), float(t))
+        self.assertEqual(sorted(value for value in history._codes
+                                if value is not None), ['v7', 'v8', 'v9'])
+        self.assertEqual(len(history._values), 5) # None, 3 live, 1 free
+        self.assertEqual(history.range(NODE, 'status'),
+                         [(7.0, 'v7'), (8.0, 'v8'), (9.0, 'v9')])
+
+    def test_shared_value_kept_while_referenced(self):
+        history = StatusHistory(capacity=2)
+        other = ('fw', 'fw node 2')
+        history.record(NODE, 'status', 'Online', 1.0)
+        history.record(other, 'status', 'Online', 1.0)
+        history.record(NODE, 'status', 'Offline', 2.0)
+        history.record(NODE, 'status', 'Standby', 3.0) # evicts NODE Online
+        self.assertIn('Online', history._codes)
+        self.assertEqual(history.value_at(other, 'status'), 'Online')
+        history.record(other, 'status', 'Offline', 4.0)
+        history.record(other, 'status', 'Standby', 5.0) # evicts other Online
+        self.assertNotIn('Online', history._codes)
+        self.assertEqual(history.value_at(NODE, 'status', 2.5), 'Offline')
+
+    def test_value_reused_after_release(self):
+        history = StatusHistory(capacity=2)
+        for t, value in enumerate(['a', 'b', 'c', 'a', 'b']):
+            history.record(NODE, 'status', value, float(t))
+        self.assertEqual(history.range(NODE, 'status'), [(3.0, 'a'), (4.0, 'b')])
+        self.assertEqual(history.changes(),
+                         [(4.0, NODE, 'status', 'a', 'b')])
+
+    def test_value_at_across_wraparound(self):
+        history = StatusHistory(capacity=3)
+        for t in range(6):
+            history.record(NODE, 'status', t, float(t * 10))
+        # Entries at 30, 40, 50, older values are gone
+        self.assertIsNone(history.value_at(NODE, 'status', 25))
+        self.assertEqual(history.value_at(NODE, 'status', 30), 3)
+        self.assertEqual(history.value_at(NODE, 'status', 49), 4)
+        self.assertEqual(history.value_at(NODE, 'status'), 5)
+        self.assertIsNone(history.value_at(NODE, 'missing'))
+
+    def test_range_across_wraparound(self):
+        history = StatusHistory(capacity=3)
+        for t in range(6):
+            history.record(NODE, 'status', t, float(t * 10))
+        self.assertEqual(history.range(NODE, 'status', 45, 50),
+                         [(40.0, 4), (50.0, 5)])
+        self.assertEqual(history.range(NODE, 'status', 0, 35), [(30.0, 3)])
+        self.assertEqual(history.range(NODE, 'status', 40),
+                         [(40.0, 4), (50.0, 5)])
+
+    def test_changes_boundaries(self):
+        history = StatusHistory(capacity=4)
+        for t in range(7):
+            history.record(NODE, 'status', t, float(t * 10))
+        # Entries at 30, 40, 50, 60; the oldest has no known previous value
+        self.assertEqual([c.timestamp for c in history.changes()],
+                         [40.0, 50.0, 60.0])
+        self.assertEqual([c.timestamp for c in history.changes(start=50)],
+                         [50.0, 60.0])
+        self.assertEqual([c.timestamp for c in history.changes(start=50.5)],
+                         [60.0])
+        self.assertEqual([c.timestamp for c in history.changes(end=50)],
+                         [40.0, 50.0])
+        self.assertEqual([c.timestamp for c in history.changes(start=0, end=35)],
+                         [])
+        change = history.changes(start=40, end=40)[0]
+        self.assertEqual((change.previous, change.value), (3, 4))
+
+    def test_changes_filters(self):
+        history = StatusHistory()
+        other = ('fw', 'fw node 2')
+        for t, value in enumerate(['Up', 'Down', 'Up']):
+            history.record(NODE, 'interface.0', value, float(t))
+            history.record(NODE, 'interface.1', value, float(t))
+            history.record(other, 'status', value, float(t))
+        self.assertEqual(len(history.changes()), 6)
+        self.assertEqual(len(history.changes(node=other)), 2)
+        self.assertEqual(len(history.changes(metric='interface.*')), 4)
+        self.assertEqual(len(history.changes(node=NODE, metric='interface.1')), 2)
+        self.assertEqual(history.metrics(NODE), ['interface.0', 'interface.1'])
+        self.assertEqual(history.nodes(), [NODE, other])
+
+
+if __name__ == '__main__':
+    unittest.main()
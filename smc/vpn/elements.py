@@ -1,7 +1,7 @@
 from smc.base.model import Meta, SubElement
 import smc.actions.search as search
 from smc.api.exceptions import CreateElementFailed
-from smc.base.model import Element, ElementCreator, prepared_request
+from smc.base.model import Element, CreatedElement, prepared_request
                     
 class ExternalGateway(Element):
     """
@@ -41,12 +41,11 @@ class ExternalGateway(Element):
                (default: True)
         :return: :py:class:`smc.vpn.elements.ExternalGateway`
         """
-        cls.json = {'name': name,
-                    'trust_all_cas': trust_all_cas}
+        json = {'name': name,
+                'trust_all_cas': trust_all_cas}
 
         try:
-            ElementCreator(cls)
-            return ExternalGateway(name)
+            return CreatedElement(cls, json)
         except CreateElementFailed as err:
             raise CreateElementFailed('Failed creating test_external gateway, '
                                       'reason: {}'.format(err))
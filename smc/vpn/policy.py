@@ -1,4 +1,4 @@
-from smc.base.model import Element, ElementCreator, prepared_request, SubElement
+from smc.base.model import Element, CreatedElement, prepared_request, SubElement
 from smc.base.model import Meta
 from smc.api.exceptions import CreatePolicyFailed, CreateElementFailed,\
     PolicyCommandFailed, ElementNotFound
@@ -38,14 +38,13 @@ class VPNPolicy(Element):
         :param str vpn_profile: reference to VPN profile, or uses default
         :return: :py:class:`~VPNPolicy`
         """
-        cls.json = {'mobile_vpn_topology_mode': None,
-                    'name': name,
-                    'nat': nat,
-                    'vpn_profile': vpn_profile}
+        json = {'mobile_vpn_topology_mode': None,
+                'name': name,
+                'nat': nat,
+                'vpn_profile': vpn_profile}
         
         try:
-            ElementCreator(cls)
-            return VPNPolicy(name)
+            return CreatedElement(cls, json)
         except CreateElementFailed as err:
             raise CreatePolicyFailed('VPN Policy create failed. Reason: {}'
                                      .format(err))